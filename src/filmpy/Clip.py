@@ -1,4 +1,8 @@
+import bisect
+import contextlib
 import copy as _copy
+import pickle
+import threading
 from functools import reduce
 from numbers import Real
 from operator import add
@@ -14,6 +18,258 @@ from filmpy.decorators import (
     requires_duration,
     use_clip_fps_by_default,
 )
+from filmpy.profiling import function_name, profile_stage
+from filmpy.tools import pickle_dumps, process_map, thread_map
+
+# frame graph being evaluated in each thread (see FrameGraph)
+_frame_graphs = threading.local()
+
+# keeps the memoized time and frame of the clips consistent between threads
+_memoize_lock = threading.Lock()
+
+# clip unpickled in each process of iter_frames(processes=...)
+_process_clip = None
+
+
+def _load_process_clip(data):
+    """Loads the clip pickled by ``iter_frames`` in a process of its pool."""
+    global _process_clip
+    _process_clip = pickle.loads(data)
+
+
+def _process_frame(task):
+    """Computes the frame ``(t, dtype)`` of the clip of the process, see
+    ``iter_frames``.
+    """
+    t, dtype = task
+    frame = _process_clip.get_frame(t)
+    if (dtype is not None) and (frame.dtype != dtype):
+        frame = frame.astype(dtype)
+    return t, frame
+
+
+class FrameGraph:
+    """Graph of the frames computed to evaluate a frame of a composition.
+
+    While a frame graph is open (``with FrameGraph() as graph:``), each frame
+    requested with ``get_frame`` is a node identified by the ``make_frame``
+    function of the clip and the time of the frame. It is computed once, then
+    returned directly to the next requests of the same node. A clip and its
+    copies (positioned, with a new start...) share their ``make_frame``, so
+    that, for instance, the frame of a source clip pulled by a layer of a
+    composition and again by its mask (see ``mask_color``) is only computed
+    once.
+
+    Opening a graph while another one is open in the same thread returns the
+    open one, so that the frames are shared by the whole evaluation.
+    ``CompositeVideoClip`` opens a graph for each of its frames.
+
+    Attributes
+    ----------
+
+    frames : dict
+      The frames computed, by ``(make_frame, t)`` node.
+
+    edges : set
+      The ``(node, dependency)`` pairs of nodes, where the frame of ``node``
+      has requested the frame of ``dependency``.
+
+    requests : int
+      Number of frames requested, computed or not.
+    """
+
+    def __init__(self):
+        self.frames = {}
+        self.edges = set()
+        self.requests = 0
+        self.stack = []
+        self.outer = None
+
+    @staticmethod
+    def current():
+        """Returns the frame graph open in this thread, or ``None``."""
+        return getattr(_frame_graphs, "graph", None)
+
+    def get_frame(self, clip, t):
+        """Returns the frame of the clip at time ``t``, computing it only if
+        the node hasn't been computed yet in this graph.
+        """
+        node = (clip.make_frame, t)
+        self.requests += 1
+        if self.stack:
+            self.edges.add((self.stack[-1], node))
+        if node not in self.frames:
+            self.stack.append(node)
+            try:
+                self.frames[node] = clip.compute_frame(t)
+            finally:
+                self.stack.pop()
+        return self.frames[node]
+
+    def __enter__(self):
+        self.outer = FrameGraph.current()
+        if self.outer is not None:
+            return self.outer
+        _frame_graphs.graph = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.outer is None:
+            _frame_graphs.graph = None
+            self.stack = []
+
+
+class ClipIndex:
+    """Index of the times at which clips are playing, finding the clips
+    playing at a time in ``O(log N + k)`` operations for ``N`` clips of which
+    ``k`` are playing, instead of testing each clip with ``is_playing``.
+
+    The clips are stored in a centered interval tree. As the clips playing
+    only change at the start and end times of the clips, the result of the
+    last lookup is reused while the times requested stay between the same
+    start and end times, as when the frames are computed in order.
+
+    The index is built from the ``start`` and ``end`` of the clips when it is
+    created, and must be rebuilt if they change.
+
+    Parameters
+    ----------
+
+    clips
+      List of clips. The lookups return indices in this list.
+    """
+
+    def __init__(self, clips):
+        self.starts = [clip.start for clip in clips]
+        self.ends = [np.inf if clip.end is None else clip.end for clip in clips]
+        self.boundaries = sorted(set(self.starts + self.ends))
+        self.tree = self.build_tree(list(range(len(clips))))
+        self.last_lookup = None
+
+    def build_tree(self, indices):
+        """Returns the node ``(center, by_start, by_end, left, right)`` of the
+        tree of the clips of indices ``indices``. The clips playing around the
+        ``center`` time are kept in the node, sorted by start and by
+        decreasing end, and the other clips are in the ``left`` and ``right``
+        nodes, depending on the side of the center where they play.
+        """
+        if not indices:
+            return None
+        endpoints = sorted(
+            time for i in indices for time in (self.starts[i], self.ends[i])
+        )
+        center = endpoints[len(endpoints) // 2]
+        left, right, centered = [], [], []
+        for i in indices:
+            if self.ends[i] < center:
+                left.append(i)
+            elif self.starts[i] > center:
+                right.append(i)
+            else:
+                centered.append(i)
+        return (
+            center,
+            sorted(centered, key=lambda i: self.starts[i]),
+            sorted(centered, key=lambda i: -self.ends[i]),
+            self.build_tree(left),
+            self.build_tree(right),
+        )
+
+    def playing(self, t):
+        """Returns the sorted tuple of the indices of the clips playing at time
+        ``t``, or, if ``t`` is a Numpy array, at some of its times (see
+        ``Clip.is_playing``).
+        """
+        if isinstance(t, np.ndarray):
+            t_min, t_max = t.min(), t.max()
+        else:
+            t_min = t_max = t
+        key = (
+            bisect.bisect_right(self.boundaries, t_min),
+            bisect.bisect_right(self.boundaries, t_max),
+        )
+        last_lookup = self.last_lookup
+        if last_lookup is not None and last_lookup[0] == key:
+            return last_lookup[1]
+
+        candidates = []
+        nodes = [self.tree]
+        while nodes:
+            node = nodes.pop()
+            if node is None:
+                continue
+            center, by_start, by_end, left, right = node
+            if t_max < center:
+                for i in by_start:
+                    if self.starts[i] > t_max:
+                        break
+                    candidates.append(i)
+                nodes.append(left)
+            elif t_min > center:
+                for i in by_end:
+                    if self.ends[i] < t_min:
+                        break
+                    candidates.append(i)
+                nodes.append(right)
+            else:
+                candidates.extend(by_start)
+                nodes.extend((left, right))
+
+        indices = tuple(
+            sorted(
+                i
+                for i in candidates
+                if self.starts[i] <= t_max and self.ends[i] > t_min
+            )
+        )
+        self.last_lookup = (key, indices)
+        return indices
+
+
+class TimeIndex:
+    """Index of consecutive intervals of time, given by their sorted start
+    times ``starts``, finding the interval in which a time falls with a
+    binary search instead of comparing the time to each start.
+
+    The interval of the last lookup and the next one are checked first, so
+    that the times requested in order, as when a clip is played, are found
+    in constant time.
+
+    >>> index = TimeIndex([0, 2, 5])
+    >>> index.index(3)
+    1
+    """
+
+    def __init__(self, starts):
+        self.starts = [float(start) for start in starts]
+        self.last_index = 0
+
+    def index(self, t):
+        """Returns the index of the last start lower than or equal to ``t``
+        (the index of the interval playing at time ``t``). Raises a
+        ``ValueError`` if ``t`` is before the first start.
+        """
+        starts, index = self.starts, self.last_index
+        for i in (index, index + 1):
+            if (
+                i < len(starts)
+                and starts[i] <= t
+                and (i + 1 == len(starts) or t < starts[i + 1])
+            ):
+                self.last_index = i
+                return i
+
+        index = bisect.bisect_right(starts, t) - 1
+        if index < 0:
+            raise ValueError(f"filmpy error: time {t} is before {starts[:1]}.")
+        self.last_index = index
+        return index
+
+    def indices(self, times):
+        """Returns the array of the indices of the intervals playing at the
+        times of the array ``times``, -1 for the times before the first start.
+        """
+        return np.searchsorted(self.starts, times, side="right") - 1
 
 
 class Clip:
@@ -50,6 +306,9 @@ class Clip:
         self.memoized_t = None
         self.memoized_frame = None
 
+        # name of the frames of the clip in render profiles, see RenderProfiler
+        self.profile_name = None
+
     def copy(self):
         """
         Create a shallow copy of the object.
@@ -73,19 +332,38 @@ class Clip:
         Example:
             - get_frame(10) -> frame_object
         """
+        graph = FrameGraph.current()
+        if graph is not None and isinstance(t, Real):
+            return graph.get_frame(self, t)
+        return self.compute_frame(t)
 
-        # Coming soon: smart error handling for debugging at this point
-        if self.memoize:
-            if t == self.memoized_t:
-                return self.memoized_frame
-            else:
+    def compute_frame(self, t):
+        """Computes the frame at time ``t`` with ``make_frame``, or returns the
+        last frame computed if it is at this time and the clip is memoized.
+        Used by ``get_frame``.
+
+        If ``make_frame`` has been marked with ``sequential_access``, it is run
+        while holding its lock, so that a single thread runs it at once.
+
+        The time spent is recorded by the open ``RenderProfiler``, if any, as a
+        stage named ``profile_name`` (the class name of the clip if not set).
+        """
+        lock = getattr(self.make_frame, "frame_lock", None)
+        stage = profile_stage(self.profile_name or type(self).__name__)
+        with stage, lock or contextlib.nullcontext():
+            # Coming soon: smart error handling for debugging at this point
+            if self.memoize:
+                with _memoize_lock:
+                    if t == self.memoized_t:
+                        return self.memoized_frame
                 frame = self.make_frame(t)
-                self.memoized_t = t
-                self.memoized_frame = frame
+                with _memoize_lock:
+                    self.memoized_t = t
+                    self.memoized_frame = frame
                 return frame
-        else:
-            # print(t)
-            return self.make_frame(t)
+            else:
+                # print(t)
+                return self.make_frame(t)
 
     def transform(self, func, apply_to=None, keep_duration=True):
         """General processing of a clip.
@@ -129,6 +407,7 @@ class Clip:
 
         # mf = copy(self.make_frame)
         new_clip = self.with_make_frame(lambda t: func(self.get_frame, t))
+        new_clip.profile_name = function_name(func)
 
         if not keep_duration:
             new_clip.duration = None
@@ -181,11 +460,13 @@ class Clip:
         if apply_to is None:
             apply_to = []
 
-        return self.transform(
+        new_clip = self.transform(
             lambda get_frame, t: get_frame(time_func(t)),
             apply_to,
             keep_duration=keep_duration,
         )
+        new_clip.profile_name = function_name(time_func)
+        return new_clip
 
     def fx(self, func, *args, **kwargs):
         """Returns the result of ``func(self, *args, **kwargs)``, for instance
@@ -357,6 +638,16 @@ class Clip:
         """
         self.memoize = memoize
 
+    @convert_parameter_to_seconds(["t"])
+    def frame_graph(self, t):
+        """Returns the ``FrameGraph`` of the evaluation of the frame at time
+        ``t``, which tells which frames of which clips it requires, and how
+        many requests of a frame already computed were saved.
+        """
+        with FrameGraph() as graph:
+            self.get_frame(t)
+        return graph
+
     @convert_parameter_to_seconds(["t"])
     def is_playing(self, t):
         """If ``t`` is a time, returns true if t is between the start and the end
@@ -487,7 +778,16 @@ class Clip:
 
     @requires_duration
     @use_clip_fps_by_default
-    def iter_frames(self, fps=None, with_times=False, logger=None, dtype=None):
+    def iter_frames(
+        self,
+        fps=None,
+        with_times=False,
+        logger=None,
+        dtype=None,
+        workers=None,
+        ordered=True,
+        processes=None,
+    ):
         """Iterates over all the frames of the clip.
 
         Returns each frame of the clip as a HxWxN Numpy array,
@@ -515,6 +815,33 @@ class Clip:
           Type to cast Numpy array frames. Use ``dtype="uint8"`` when using the
           pictures to write video, images...
 
+        workers : int, optional
+          Number of threads computing the frames in parallel, a few frames
+          ahead of the frame yielded. This speeds up the clips whose frames are
+          computed by functions releasing the GIL (NumPy operations, PIL or
+          OpenCV resizing...). The functions marked with
+          ``decorators.sequential_access``, like the readers of video files,
+          are still run by one thread at once. Up to ``2 * workers`` frames
+          are computed ahead of the frame yielded, so file clips decoding
+          their frames into ``buffers`` (see ``VideoFileClip``) need more
+          than ``2 * workers + 1`` buffers. Default is ``None`` (the frames
+          are computed one by one, when they are yielded).
+
+        ordered : bool, optional
+          With several ``workers``, set it to ``False`` to yield each frame as
+          soon as it is computed, instead of in chronological order (use
+          ``with_times=True`` to know its time then).
+
+        processes : int, optional
+          Number of processes computing the frames in parallel, each one with
+          its own copy of the clip, pickled with ``tools.pickle_dumps``: the
+          files are opened again by each process, and the ``make_frame``
+          lambdas require ``cloudpickle``. Unlike ``workers``, this speeds up
+          the frames computed by pure Python code, at the cost of sending them
+          back to this process. On platforms starting processes with "spawn"
+          (Windows, macOS), the script must be guarded by
+          ``if __name__ == "__main__":``. Default is ``None``.
+
         Examples
         --------
 
@@ -526,16 +853,35 @@ class Clip:
                      for frame in myclip.iter_frames()])
         """
         logger = proglog.default_bar_logger(logger)
-        for frame_index in logger.iter_bar(
-            frame_index=np.arange(0, int(self.duration * fps))
-        ):
+        frame_indices = np.arange(0, int(self.duration * fps))
+
+        def frame_at(frame_index):
             # int is used to ensure that floating point errors are rounded
             # down to the nearest integer
             t = frame_index / fps
 
             frame = self.get_frame(t)
             if (dtype is not None) and (frame.dtype != dtype):
-                frame = frame.astype(dtype)
+                with profile_stage("convert"):
+                    frame = frame.astype(dtype)
+            return t, frame
+
+        if processes is not None and processes > 1:
+            frames = process_map(
+                _process_frame,
+                ((frame_index / fps, dtype) for frame_index in frame_indices),
+                processes,
+                ordered,
+                initializer=_load_process_clip,
+                initargs=(pickle_dumps(self),),
+            )
+        elif workers is not None and workers > 1:
+            frames = thread_map(frame_at, frame_indices, workers, ordered)
+        else:
+            frames = map(frame_at, frame_indices)
+
+        frame_indices = logger.iter_bar(frame_index=frame_indices)
+        for _, (t, frame) in zip(frame_indices, frames):
             if with_times:
                 yield t, frame
             else:
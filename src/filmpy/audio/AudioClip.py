@@ -11,7 +11,7 @@ import numpy as np
 import proglog
 
 from filmpy.audio.io.ffmpeg_audiowriter import ffmpeg_audiowrite
-from filmpy.Clip import Clip
+from filmpy.Clip import Clip, ClipIndex
 from filmpy.decorators import convert_path_to_string, requires_duration
 from filmpy.tools import extensions_dict
 
@@ -324,6 +324,7 @@ class CompositeAudioClip(AudioClip):
 
     def __init__(self, clips):
         self.clips = clips
+        self.clip_index = ClipIndex(clips)
         self.nchannels = max(clip.nchannels for clip in self.clips)
 
         # self.duration is set at AudioClip
@@ -352,12 +353,15 @@ class CompositeAudioClip(AudioClip):
         return (clip.end for clip in self.clips)
 
     def make_frame(self, t):
-        """Renders a frame for the composition for the time ``t``."""
-        played_parts = [clip.is_playing(t) for clip in self.clips]
+        """Renders a frame for the composition for the time ``t``, from the
+        clips playing then, found in ``clip_index``.
+        """
+        playing_clips = [self.clips[index] for index in self.clip_index.playing(t)]
+        played_parts = [clip.is_playing(t) for clip in playing_clips]
 
         sounds = [
             clip.get_frame(t - clip.start) * np.array([part]).T
-            for clip, part in zip(self.clips, played_parts)
+            for clip, part in zip(playing_clips, played_parts)
             if (part is not False)
         ]
 
@@ -174,7 +174,7 @@ class FFMPEG_AudioReader:
         arbitrary frames whenever possible, by moving between adjacent
         frames.
         """
-        if (pos < self.pos) or (pos > (self.pos + 1000000)):
+        if not self.proc or (pos < self.pos) or (pos > (self.pos + 1000000)):
             t = 1.0 * pos / self.fps
             self.initialize(t)
         elif pos > self.pos:
@@ -263,7 +263,10 @@ class FFMPEG_AudioReader:
 
         if self.buffer is not None:
             current_f_end = self.buffer_startframe + self.buffersize
-            if new_bufferstart < current_f_end < new_bufferstart + self.buffersize:
+            if (
+                self.proc
+                and new_bufferstart < current_f_end < new_bufferstart + self.buffersize
+            ):
                 # We already have part of what must be read
                 conserved = current_f_end - new_bufferstart
                 chunksize = self.buffersize - conserved
@@ -288,6 +291,13 @@ class FFMPEG_AudioReader:
                 self.proc.wait()
             self.proc = None
 
+    def __getstate__(self):
+        # the unpickled reader starts its own ffmpeg process when it next
+        # reads outside of its buffer
+        state = self.__dict__.copy()
+        state["proc"] = None
+        return state
+
     def __del__(self):
         # If the garbage collector comes, make sure the subprocess is terminated.
         self.close()
@@ -17,6 +17,7 @@ except ImportError:
 
 FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg-imageio")
 IMAGEMAGICK_BINARY = os.getenv("IMAGEMAGICK_BINARY", "auto-detect")
+FFMPEG_INFOS_CACHE = os.getenv("FFMPEG_INFOS_CACHE")
 
 IS_POSIX_OS = os.name == "posix"
 
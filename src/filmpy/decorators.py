@@ -1,5 +1,6 @@
 import inspect
 import os
+import threading
 
 import decorator
 
@@ -105,6 +106,43 @@ def convert_path_to_string(varnames):
     return preprocess_args(os.fspath, varnames)
 
 
+class FrameLock:
+    """Reentrant lock of the functions marked with ``sequential_access``.
+
+    Unlike ``threading.RLock``, it can be pickled with the clip holding it (a
+    new, released lock is then created), so that clips can be sent to other
+    processes.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+
+    def __enter__(self):
+        return self.lock.__enter__()
+
+    def __exit__(self, *exc_info):
+        return self.lock.__exit__(*exc_info)
+
+    def __getstate__(self):
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+
+def sequential_access(make_frame, lock=None):
+    """Marks the function ``make_frame`` of a clip as a function that several
+    threads must not run at once, because it reads its frames from a file or
+    keeps a state between frames, and returns it. ``Clip.get_frame`` then runs
+    it while holding ``lock`` (a new ``FrameLock`` if not given), so that the
+    frames of the other clips are still computed in parallel by
+    ``iter_frames(workers=...)``. Pass the same lock to the functions sharing
+    the same file reader or state.
+    """
+    make_frame.frame_lock = FrameLock() if lock is None else lock
+    return make_frame
+
+
 @decorator.decorator
 def add_mask_if_none(func, clip, *args, **kwargs):
     """Add a mask to the clip if there is none."""
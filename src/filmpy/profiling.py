@@ -0,0 +1,201 @@
+"""Instrumentation of the renders: time spent in each stage of the frames."""
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+import decorator
+
+# profiler recording the stages of the frames, see RenderProfiler
+_active_profiler = None
+
+_no_stage = contextlib.nullcontext()
+
+
+class RenderProfiler:
+    """Records the time spent in each stage of the frames computed while it is
+    open, in all the threads of the process.
+
+    The stages recorded are:
+
+    - ``"decode"`` and ``"seek"``: reading and seeking frames in video files
+      (waiting for ffmpeg to decode them included).
+    - One stage per clip computing frames, named by the ``profile_name``
+      attribute of the clip. It is the name of the effect or function which
+      made the clip (e.g. ``"resize"``) or the name of its class, and can be
+      set to label the layers of a composition.
+    - ``"blit"``: blitting the frames of the clips of a composition.
+    - ``"convert"``: converting the frames to the type of the output.
+    - ``"encode"``: writing the frames to ffmpeg. Time spent there is time
+      waiting for the encoder (pipe stalls).
+
+    The stages nest: a clip computing its frame from another clip includes
+    the time of the other clip. The ``self_time`` of a stage excludes the
+    stages nested in it, so that the self times add up to the time spent
+    computing the frames.
+
+    The frames rendered in other processes (``workers`` of
+    ``write_videofile``, ``processes`` of ``iter_frames``) are not recorded.
+
+    >>> with RenderProfiler() as profiler:
+    ...     clip.write_videofile("video.mp4")
+    >>> profiler.summary()["fps"]
+    >>> profiler.write_chrome_trace("video_trace.json")
+
+    Parameters
+    ----------
+
+    trace
+      Set it to ``False`` to only record the total time of each stage, and
+      not each of the stages (needed by ``write_chrome_trace``), which takes
+      memory for long renders.
+
+
+    Attributes
+    ----------
+
+    stages
+      Dictionary of the stages recorded, giving for each name the number of
+      times the stage was run (``count``), and the total time spent in it,
+      nested stages included (``time``) or not (``self_time``).
+
+    events
+      List of the ``(name, thread_id, start, duration)`` of the stages
+      recorded, if ``trace`` is ``True``.
+    """
+
+    def __init__(self, trace=True):
+        self.trace = trace
+        self.stages = {}
+        self.events = []
+        self.start_time = None
+        self.end_time = None
+        self.previous_profiler = None
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def __enter__(self):
+        global _active_profiler
+        self.previous_profiler = _active_profiler
+        _active_profiler = self
+        self.start_time = time.perf_counter()
+        self.end_time = None
+        return self
+
+    def __exit__(self, *exc_info):
+        global _active_profiler
+        self.end_time = time.perf_counter()
+        _active_profiler = self.previous_profiler
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Records the time spent in the ``with`` block as a stage ``name``."""
+        stack = self.local.__dict__.setdefault("stack", [])
+        stack.append(0)  # time spent in the stages nested in this one
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            nested_duration = stack.pop()
+            if stack:
+                stack[-1] += duration
+            with self.lock:
+                stage = self.stages.get(name)
+                if stage is None:
+                    stage = self.stages[name] = dict(count=0, time=0, self_time=0)
+                stage["count"] += 1
+                stage["time"] += duration
+                stage["self_time"] += duration - nested_duration
+                if self.trace:
+                    self.events.append((name, threading.get_ident(), start, duration))
+
+    def summary(self):
+        """Returns a dictionary giving the ``duration`` of the render (in
+        seconds, until now if the profiler is still open), the number of
+        ``frames`` written to ffmpeg and the frames per second (``fps``), and
+        the ``stages`` recorded (see the attributes of the class), sorted by
+        decreasing self time.
+        """
+        end_time = time.perf_counter() if self.end_time is None else self.end_time
+        duration = end_time - self.start_time if self.start_time is not None else 0
+        with self.lock:
+            stages = {
+                name: dict(stage)
+                for name, stage in sorted(
+                    self.stages.items(), key=lambda item: -item[1]["self_time"]
+                )
+            }
+        frames = stages.get("encode", {}).get("count", 0)
+        return dict(
+            duration=duration,
+            frames=frames,
+            fps=frames / duration if duration else 0,
+            stages=stages,
+        )
+
+    def write_json(self, filename):
+        """Writes the ``summary`` of the render to a JSON file."""
+        with open(filename, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def write_chrome_trace(self, filename):
+        """Writes the stages recorded to a JSON file in the Trace Event Format,
+        which can be opened in ``chrome://tracing`` or https://ui.perfetto.dev
+        to see the stages of each thread on a timeline.
+        """
+        if not self.trace:
+            raise ValueError(
+                "filmpy error: the stages are only traced by a RenderProfiler "
+                "created with trace=True."
+            )
+        pid = os.getpid()
+        with self.lock:
+            trace_events = [
+                dict(
+                    name=name,
+                    ph="X",
+                    ts=(start - self.start_time) * 1e6,
+                    dur=duration * 1e6,
+                    pid=pid,
+                    tid=thread_id,
+                )
+                for name, thread_id, start, duration in self.events
+            ]
+        with open(filename, "w") as f:
+            json.dump(dict(traceEvents=trace_events, displayTimeUnit="ms"), f)
+
+
+def profile_stage(name):
+    """Returns a context manager recording the time spent in its ``with``
+    block as a stage ``name`` of the open ``RenderProfiler``, if any.
+    """
+    if _active_profiler is None:
+        return _no_stage
+    return _active_profiler.stage(name)
+
+
+def profiled(name):
+    """Decorator recording the time spent in the function as a stage ``name``
+    of the open ``RenderProfiler``, if any.
+    """
+
+    def wrapper(func, *args, **kwargs):
+        if _active_profiler is None:
+            return func(*args, **kwargs)
+        with _active_profiler.stage(name):
+            return func(*args, **kwargs)
+
+    return decorator.decorator(wrapper)
+
+
+def function_name(func):
+    """Returns the name of the function, or of the function in which it is
+    defined for nested functions and lambdas (e.g. ``"resize"`` for the
+    ``filter`` function defined in ``resize``).
+    """
+    name = getattr(func, "__qualname__", None) or type(func).__name__
+    name = name.split(".<locals>", 1)[0]
+    return name.rsplit(".", 1)[-1]
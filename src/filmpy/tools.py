@@ -1,11 +1,23 @@
+import collections
+import concurrent.futures
 import os
+import pickle
 import subprocess as sp
+import sys
 import warnings
 
+import decorator
 import proglog
 
 OS_NAME = os.name
 
+# files of the frames skipped by warn_outside_filmpy: filmpy itself and the
+# wrappers generated for its decorators
+_INTERNAL_FILES = (
+    os.path.dirname(os.path.abspath(__file__)) + os.sep,
+    os.path.abspath(decorator.__file__),
+)
+
 
 def cross_platform_popen_params(popen_params):
     """Adjust subprocess parameters for cross-platform compatibility.
@@ -52,6 +64,139 @@ def subprocess_call(cmd, logger="bar"):
     del proc
 
 
+def thread_map(func, items, workers, ordered=True):
+    """Yields ``func(item)`` for each item of ``items``, computed by a pool of
+    ``workers`` threads.
+    Parameters:
+        - func (callable): The function to apply to each item.
+        - items (iterable): The items, read as the results are consumed.
+        - workers (int): Number of threads. At most ``2 * workers`` items are
+          processed or waiting to be consumed at any time.
+        - ordered (bool, optional): If ``True`` (default), yield the results in
+          the order of the items, otherwise as soon as they are computed.
+    Returns:
+        - generator: The results. An exception raised by ``func`` is raised
+          when its result is reached, and the items not processed yet are then
+          dropped.
+    Example:
+        - list(thread_map(abs, [-1, 2, -3], workers=2)) -> [1, 2, 3]
+    """
+    executor = concurrent.futures.ThreadPoolExecutor(workers)
+    yield from executor_map(executor, func, items, workers, ordered)
+
+
+def process_map(func, items, workers, ordered=True, initializer=None, initargs=()):
+    """Yields ``func(item)`` for each item of ``items``, computed by a pool of
+    ``workers`` processes, like ``thread_map``.
+    Parameters:
+        - func (callable): The function to apply to each item, defined at the
+          top level of a module so that the processes can import it.
+        - items (iterable): The items, pickled to be sent to the processes.
+        - workers (int): Number of processes.
+        - ordered (bool, optional): If ``True`` (default), yield the results in
+          the order of the items, otherwise as soon as they are computed.
+        - initializer (callable, optional): Function called with ``initargs``
+          in each process when it starts, to load the data shared by all the
+          items (see ``pickle_dumps``).
+    Returns:
+        - generator: The results, see ``thread_map``.
+    Example:
+        - list(process_map(abs, [-1, 2, -3], workers=2)) -> [1, 2, 3]
+    """
+    executor = concurrent.futures.ProcessPoolExecutor(
+        workers, initializer=initializer, initargs=initargs
+    )
+    yield from executor_map(executor, func, items, workers, ordered)
+
+
+def executor_map(executor, func, items, workers, ordered=True):
+    """Yields ``func(item)`` for each item of ``items``, submitted to the
+    ``concurrent.futures`` executor ``executor`` running ``workers`` tasks at
+    once, which is shut down once the results are consumed. See ``thread_map``.
+    """
+    pending = collections.deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) < 2 * workers:
+                continue
+            if ordered:
+                yield pending.popleft().result()
+            else:
+                done, _ = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    pending.remove(future)
+                    yield future.result()
+        if ordered:
+            while pending:
+                yield pending.popleft().result()
+        else:
+            for future in concurrent.futures.as_completed(pending):
+                yield future.result()
+    finally:
+        # shutdown(cancel_futures=True) requires Python 3.9
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def pickle_dumps(obj):
+    """Pickles ``obj`` (a clip, for instance) to send it to other processes.
+    The functions defined at the top level of a module are pickled by
+    reference, as usual. When ``obj`` refers to lambdas or nested functions
+    (like the ``make_frame`` of most clips), it is pickled with
+    ``cloudpickle``, which pickles them by value, if it is installed.
+    Parameters:
+        - obj: The object to pickle.
+    Returns:
+        - bytes: The pickled object, to load with ``pickle.loads``.
+    Raises:
+        - pickle.PicklingError: If ``obj`` can't be pickled.
+    Example:
+        - pickle.loads(pickle_dumps(lambda t: 2 * t))(1) -> 2
+    """
+    try:
+        return pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, AttributeError, TypeError) as error:
+        try:
+            import cloudpickle
+        except ImportError:
+            raise pickle.PicklingError(
+                f"{error}. Install cloudpickle to pickle lambdas and nested functions."
+            ) from error
+        try:
+            return cloudpickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, AttributeError, TypeError) as error:
+            raise pickle.PicklingError(str(error)) from error
+
+
+def warn_outside_filmpy(message, category=UserWarning):
+    """Issues a warning attributed to the first calling frame outside filmpy,
+    so that it points at the user code that called filmpy however deep the
+    warning is raised.
+    Parameters:
+        - message (str): The warning message.
+        - category (Warning subclass, optional): The warning category, default
+          is ``UserWarning``.
+    Example:
+        - warn_outside_filmpy("The video is rendered in a single process.")
+    """
+    stacklevel = 2
+    frame = sys._getframe(1)
+    while frame.f_back is not None:
+        filename = frame.f_code.co_filename
+        if not (
+            filename.startswith("<decorator-gen-")
+            or os.path.abspath(filename).startswith(_INTERNAL_FILES)
+        ):
+            break
+        frame = frame.f_back
+        stacklevel += 1
+    warnings.warn(message, category, stacklevel=stacklevel)
+
+
 def convert_to_seconds(time):
     """Convert a time value to seconds.
     Parameters:
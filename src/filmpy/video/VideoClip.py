@@ -26,21 +26,28 @@ from filmpy.decorators import (
     outplace,
     requires_duration,
     requires_fps,
+    sequential_access,
     use_clip_fps_by_default,
 )
+from filmpy.profiling import function_name, profiled
 from filmpy.tools import (
+    convert_to_seconds,
     cross_platform_popen_params,
     extensions_dict,
     find_extension,
     subprocess_call,
+    thread_map,
+)
+from filmpy.video.io.ffmpeg_writer import (
+    ffmpeg_write_images_sequence,
+    ffmpeg_write_video,
 )
-from filmpy.video.io.ffmpeg_writer import ffmpeg_write_video
 from filmpy.video.io.gif_writers import (
     write_gif,
     write_gif_with_image_io,
     write_gif_with_tempfiles,
 )
-from filmpy.video.tools.drawing import blit
+from filmpy.video.tools.drawing import blit, blit_array
 
 
 class VideoClip(Clip):
@@ -102,6 +109,7 @@ class VideoClip(Clip):
         self.audio = None
         self.pos = lambda t: (0, 0)
         self.relative_pos = False
+        self.has_constant_position = True
         self.layer = 0
         if make_frame:
             self.make_frame = make_frame
@@ -158,6 +166,82 @@ class VideoClip(Clip):
 
     copy = __copy__
 
+    def get_frames(self, tt):
+        """Returns the frames of the clip at times ``tt`` as a single array of
+        shape ``(N, h, w, c)`` (``(N, h, w)`` for masks), in the order of ``tt``.
+
+        The times are sorted and deduplicated first, so that each frame is
+        computed once and in chronological order: the frames of file-backed
+        clips are then decoded in a single forward pass, the file being only
+        reopened where skipping frames would take longer. This is much faster
+        than calling ``get_frame`` in a loop with unordered times, e.g. to
+        sample frames at random or to build a grid of thumbnails.
+
+        Parameters
+        ----------
+
+        tt : list
+          Times of the frames, each one expressed in seconds (15.35), in
+          (min, sec), in (hour, min, sec), or as a string: '01:03:05.35'.
+        """
+        tt = np.array([convert_to_seconds(t) for t in tt], dtype=float)
+        times, indices = np.unique(tt, return_inverse=True)
+        if not len(times):
+            return np.empty((0,))
+        return self.make_frames(times)[indices.ravel()]
+
+    def make_frames(self, times):
+        """Returns the frames at the sorted, unique times ``times`` as a single
+        array. Used by ``get_frames``, overridden by the clips which can compute
+        several frames at once more efficiently.
+        """
+        frames = None
+        for index, t in enumerate(times):
+            frame = self.get_frame(t)
+            if frames is None:
+                frames = np.empty((len(times),) + frame.shape, dtype=frame.dtype)
+            # copied right away, as the frame returned may be reused afterwards
+            frames[index] = frame
+        return frames
+
+    def source_segments(self):
+        """Returns the list of ``(filename, start_time, end_time)`` segments of
+        video files whose frames, played one after the other, are exactly the
+        frames of the clip, or ``None`` if the frames of the clip are modified
+        or computed otherwise.
+
+        File clips, their subclips and the chained concatenations of such
+        clips have source segments until they are transformed or given a mask.
+        ``write_videofile(stream_copy=True)`` uses them to copy the encoded
+        frames instead of encoding them again.
+        """
+        file_segments = getattr(self, "file_segments", None)
+        if (
+            file_segments is None
+            or file_segments[0] is not self.make_frame
+            or self.mask is not None
+            or self.duration is None
+        ):
+            return None
+        return cut_segments(file_segments[1], 0, self.duration)
+
+    @convert_parameter_to_seconds(["start_time", "end_time"])
+    def subclip(self, start_time=0, end_time=None):
+        """Returns a clip playing the content of the current clip between times
+        ``start_time`` and ``end_time`` (see ``Clip.subclip``).
+        """
+        new_clip = super().subclip(start_time, end_time)
+        segments = self.source_segments()
+        if segments is not None and new_clip.duration is not None:
+            if start_time < 0:
+                start_time = self.duration + start_time
+            segments = cut_segments(
+                segments, start_time, start_time + new_clip.duration
+            )
+            if segments is not None:
+                new_clip.file_segments = (new_clip.make_frame, segments)
+        return new_clip
+
     # ===============================================================
     # EXPORT OPERATIONS
 
@@ -218,6 +302,13 @@ class VideoClip(Clip):
         ffmpeg_params=None,
         logger="bar",
         pixel_format=None,
+        workers=None,
+        queue_size=0,
+        stream_copy=False,
+        audio_pipe=False,
+        checkpoint_duration=None,
+        frame_threads=None,
+        frame_processes=None,
     ):
         """Write the clip to a videofile.
 
@@ -314,12 +405,79 @@ class VideoClip(Clip):
         pixel_format
           Pixel format for the output video file.
 
+        workers
+          Number of processes rendering the video in parallel. If greater than
+          1, the clip is split in as many consecutive segments, each one
+          rendered and encoded by another process, and the segments are then
+          joined without being encoded again. This speeds up the writing of
+          clips whose frames take time to compute. Each segment starts with a
+          keyframe: pass e.g. ``ffmpeg_params=["-g", "250"]`` to keep the
+          keyframes at regular intervals. The processes are forked when the
+          platform allows it, otherwise (on Windows) the clip is pickled (see
+          the ``processes`` of ``iter_frames``), and the video is rendered in
+          a single process if it can't be.
+
+        queue_size
+          Number of frames queued for a background thread writing them to
+          ffmpeg, so that the next frames are computed while the previous ones
+          are encoded. Default is ``0`` (the frames are written one by one as
+          they are computed).
+
+        stream_copy
+          If ``True`` and the frames of the clip are unmodified frames of video
+          files (e.g. subclips of a ``VideoFileClip``, or their chained
+          concatenation, see ``source_segments``), the encoded frames of the
+          files are copied instead of being decoded and encoded again, when
+          the codec, size and fps of the files are those of the output. Only
+          the frames before the first keyframe and after the last keyframe of
+          each cut are encoded again, so that exporting an extract of a long
+          video takes seconds. The clip is encoded entirely if its frames
+          cannot be copied.
+
+        audio_pipe
+          If ``True``, the audio of the clip is computed while the frames are
+          written, and sent through a pipe to the ffmpeg process encoding the
+          video, which muxes the audio and the video in a single pass, instead
+          of the audio being first written entirely to a temporary audio file
+          (``temp_audiofile`` is then unused). Not available on Windows, with
+          several ``workers``, ``stream_copy`` or ``checkpoint_duration``,
+          where the temporary audio file is still used. Default is ``False``.
+
+        checkpoint_duration
+          Set it to a number of seconds to make the render resumable: the
+          video is then rendered in segments of about this duration, starting
+          with a keyframe (made of whole GOPs if ``ffmpeg_params`` sets
+          ``-g``), which are kept in a ``<filename>.checkpoint`` directory
+          with a manifest listing the segments already written. If the render
+          is interrupted, writing the same clip to the same file with the
+          same parameters again only renders the missing segments. The
+          segments are joined without being encoded again, and the directory
+          is removed, once they are all written. Default is ``None``.
+
+        frame_threads
+          Number of threads computing the frames in parallel, a few frames
+          ahead of the frame being encoded (see the ``workers`` of
+          ``iter_frames``). Unlike ``workers``, the frames are computed in the
+          same process, so it only speeds up the clips whose frames are
+          computed by code releasing the GIL (NumPy, PIL, OpenCV...). Not used
+          when the clip is rendered by several ``workers``.
+
+        frame_processes
+          Number of processes computing the frames in parallel, each one with
+          a pickled copy of the clip (see the ``processes`` of
+          ``iter_frames``), while the frames are encoded by a single ffmpeg
+          process. This speeds up the clips whose frames are computed by pure
+          Python code, without splitting the video in segments like
+          ``workers``. Not used when the clip is rendered by several
+          ``workers``.
+
         Examples
         --------
 
         >>> from filmpy import VideoFileClip
         >>> clip = VideoFileClip("myvideo.mp4").subclip(100,120)
         >>> clip.write_videofile("my_new_video.mp4")
+        >>> clip.write_videofile("my_new_video.mp4", workers=8)
         >>> clip.close()
 
         """
@@ -348,6 +506,16 @@ class VideoClip(Clip):
         make_audio = (
             (audiofile is None) and (audio is True) and (self.audio is not None)
         )
+        pipe_audio = (
+            make_audio
+            and audio_pipe
+            and os.name != "nt"
+            and (workers is None or workers <= 1)
+            and not stream_copy
+            and not checkpoint_duration
+        )
+        if pipe_audio:
+            make_audio = False
 
         if make_audio and temp_audiofile:
             # The audio will be the clip's audio
@@ -359,8 +527,6 @@ class VideoClip(Clip):
                 name + Clip._TEMP_FILES_PREFIX + f"wvf_snd.{audio_ext}",
             )
 
-        # enough cpu for multiprocessing ? USELESS RIGHT NOW, WILL COME AGAIN
-        # enough_cpu = (multiprocessing.cpu_count() > 1)
         logger(message=f"filmpy - Building video {filename}.")
         if make_audio:
             self.audio.write_audiofile(
@@ -387,6 +553,18 @@ class VideoClip(Clip):
             ffmpeg_params=ffmpeg_params,
             logger=logger,
             pixel_format=pixel_format,
+            workers=workers,
+            queue_size=queue_size,
+            stream_copy=stream_copy,
+            audio_clip=self.audio if pipe_audio else None,
+            audio_fps=audio_fps,
+            audio_nbytes=audio_nbytes,
+            audio_codec=audio_codec,
+            audio_bitrate=audio_bitrate,
+            audio_bufsize=audio_bufsize,
+            checkpoint_duration=checkpoint_duration,
+            frame_threads=frame_threads,
+            frame_processes=frame_processes,
         )
 
         if remove_temp and make_audio and os.path.exists(audiofile):
@@ -397,7 +575,13 @@ class VideoClip(Clip):
     @use_clip_fps_by_default
     @convert_masks_to_RGB
     def write_images_sequence(
-        self, name_format, fps=None, with_mask=True, logger="bar"
+        self,
+        name_format,
+        fps=None,
+        with_mask=True,
+        logger="bar",
+        frame_threads=None,
+        program="imageio",
     ):
         """Writes the videoclip to a sequence of image files.
 
@@ -421,6 +605,19 @@ class VideoClip(Clip):
         logger
           Either ``"bar"`` for progress bar or ``None`` or any Proglog logger.
 
+        frame_threads
+          Number of threads computing and saving the frames in parallel (see
+          the ``workers`` of ``iter_frames``).
+
+        program
+          Either ``"imageio"`` (default), which saves each frame to its file,
+          or ``"ffmpeg"``, which pipes all the frames to a single ffmpeg
+          process encoding them to the files one after the other, instead of
+          opening and encoding each file separately (see
+          ``ffmpeg_write_images_sequence``). With ``"ffmpeg"``, the frames
+          must be numbered with ``%d`` (or e.g. ``%04d``) and be PNG, JPEG,
+          BMP or TIFF files.
+
 
         Returns
         -------
@@ -439,13 +636,34 @@ class VideoClip(Clip):
         # Fails on GitHub macos CI
         # logger(message="filmpy - Writing frames %s." % name_format)
 
+        if program == "ffmpeg":
+            return ffmpeg_write_images_sequence(
+                self,
+                name_format,
+                fps,
+                with_mask=with_mask,
+                logger=logger,
+                frame_threads=frame_threads,
+            )
+
         timings = np.arange(0, self.duration, 1.0 / fps)
 
-        filenames = []
-        for i, t in logger.iter_bar(t=list(enumerate(timings))):
+        def save_frame(index_and_time):
+            i, t = index_and_time
             name = name_format % i
-            filenames.append(name)
             self.save_frame(name, t, with_mask=with_mask)
+            return name
+
+        indices_and_times = list(enumerate(timings))
+        names = (
+            thread_map(save_frame, indices_and_times, frame_threads)
+            if frame_threads is not None and frame_threads > 1
+            else map(save_frame, indices_and_times)
+        )
+
+        filenames = []
+        for _, name in zip(logger.iter_bar(t=indices_and_times), names):
+            filenames.append(name)
         # logger(message="filmpy - Done writing frames %s." % name_format)
 
         return filenames
@@ -466,6 +684,7 @@ class VideoClip(Clip):
         tempfiles=False,
         logger="bar",
         pixel_format=None,
+        frame_threads=None,
     ):
         """Write the VideoClip to a GIF file.
 
@@ -511,6 +730,10 @@ class VideoClip(Clip):
           exist, then 'rgba' will be used. This option is only going to
           be accepted if ``program=ffmpeg`` or when ``tempfiles=True``
 
+        frame_threads
+          Number of threads computing the frames in parallel (see the
+          ``workers`` of ``iter_frames``).
+
 
         Notes
         -----
@@ -535,6 +758,7 @@ class VideoClip(Clip):
                 loop=loop,
                 colors=colors,
                 logger=logger,
+                frame_threads=frame_threads,
             )
         elif tempfiles:
             # convert imageio opt variable to something that can be used with
@@ -552,6 +776,7 @@ class VideoClip(Clip):
                 colors=colors,
                 logger=logger,
                 pixel_format=pixel_format,
+                frame_threads=frame_threads,
             )
         else:
             # convert imageio opt variable to something that can be used with
@@ -569,6 +794,7 @@ class VideoClip(Clip):
                 colors=colors,
                 logger=logger,
                 pixel_format=pixel_format,
+                frame_threads=frame_threads,
             )
 
     # -----------------------------------------------------------------
@@ -607,7 +833,11 @@ class VideoClip(Clip):
         another frame,  `image_func(get_frame(t))`.
         """
         apply_to = apply_to or []
-        return self.transform(lambda get_frame, t: image_func(get_frame(t)), apply_to)
+        new_clip = self.transform(
+            lambda get_frame, t: image_func(get_frame(t)), apply_to
+        )
+        new_clip.profile_name = function_name(image_func)
+        return new_clip
 
     def fill_array(self, pre_array, shape=(0, 0)):
         """Adjust the size of a given array to match a specified shape by trimming or padding.
@@ -635,43 +865,73 @@ class VideoClip(Clip):
             post_array = np.hstack((post_array, x_1))
         return post_array
 
-    def blit_on(self, picture, t):
+    @profiled("blit")
+    def blit_on(self, picture, t, frame=None, mask_frame=None):
         """Returns the result of the blit of the clip's frame at time `t`
         on the given `picture`, the position of the clip being given
         by the clip's ``pos`` attribute. Meant for compositing.
+
+        The frame and mask frame of the clip at time `t` can be given as
+        ``frame`` and ``mask_frame`` if they have already been computed.
+
+        ``picture`` is either a PIL image or a ``uint8`` Numpy array. An array
+        is modified in place (see ``blit_array``), only over the region
+        covered by the clip, and returned.
         """
-        wf, hf = picture.size
+        as_array = isinstance(picture, np.ndarray)
+        if as_array:
+            hf, wf = picture.shape[:2]
+        else:
+            wf, hf = picture.size
 
         ct = t - self.start  # clip time
 
         # GET IMAGE AND MASK IF ANY
-        img = self.get_frame(ct).astype("uint8")
-        im_img = Image.fromarray(img)
+        if frame is None:
+            frame = self.get_frame(ct)
+        img = frame if frame.dtype == "uint8" else frame.astype("uint8")
 
+        mask = None
         if self.mask is not None:
-            mask = (self.mask.get_frame(ct) * 255).astype("uint8")
-            im_mask = Image.fromarray(mask).convert("L")
+            if mask_frame is None:
+                mask_frame = self.mask.get_frame(ct)
+            mask = (mask_frame * 255).astype("uint8")
 
-            if im_img.size != im_mask.size:
+            if img.shape[:2] != mask.shape[:2]:
                 bg_size = (
-                    max(im_img.size[0], im_mask.size[0]),
-                    max(im_img.size[1], im_mask.size[1]),
+                    max(img.shape[0], mask.shape[0]),
+                    max(img.shape[1], mask.shape[1]),
                 )
 
-                im_img_bg = Image.new("RGB", bg_size, "black")
-                im_img_bg.paste(im_img, (0, 0))
+                img_bg = np.zeros(bg_size + img.shape[2:], dtype="uint8")
+                img_bg[: img.shape[0], : img.shape[1]] = img
 
-                im_mask_bg = Image.new("L", bg_size, 0)
-                im_mask_bg.paste(im_mask, (0, 0))
+                mask_bg = np.zeros(bg_size, dtype="uint8")
+                mask_bg[: mask.shape[0], : mask.shape[1]] = mask
 
-                im_img, im_mask = im_img_bg, im_mask_bg
+                img, mask = img_bg, mask_bg
 
-        else:
-            im_mask = None
+        if as_array and img.shape[2:] != picture.shape[2:]:
+            # converted like PIL converts the images pasted to another mode
+            mode = Image.fromarray(picture[:1, :1]).mode
+            img = np.array(Image.fromarray(img).convert(mode))
+
+        pos = self.position_at(ct, (wf, hf), img.shape[:2][::-1])
+        if as_array:
+            return blit_array(img, picture, pos, mask=mask)
+        im_mask = None if mask is None else Image.fromarray(mask).convert("L")
+        return blit(Image.fromarray(img), picture, pos, mask=im_mask)
 
-        wi, hi = im_img.size
-        # SET POSITION
-        pos = self.pos(ct)
+    def position_at(self, t, picture_size, size=None):
+        """Returns the ``(x, y)`` position in pixels, as integers, of the top
+        left corner of the clip at time ``t`` (of the clip) when it is blitted
+        on a picture of size ``picture_size``, resolving the relative and
+        the textual positions of the clip (see ``with_position``). ``size`` is
+        the size of the frame of the clip, ``self.size`` by default.
+        """
+        wf, hf = picture_size
+        wi, hi = self.size if size is None else size
+        pos = self.pos(t)
 
         # preprocess short writings of the position
         if isinstance(pos, str):
@@ -699,8 +959,7 @@ class VideoClip(Clip):
             D = {"top": 0, "center": (hf - hi) / 2, "bottom": hf - hi}
             pos[1] = D[pos[1]]
 
-        pos = map(int, pos)
-        return blit(im_img, picture, pos, mask=im_mask)
+        return tuple(map(int, pos))
 
     def add_mask(self):
         """Add a mask VideoClip to the VideoClip.
@@ -786,6 +1045,17 @@ class VideoClip(Clip):
         self.make_frame = mf
         self.size = self.get_frame(0).shape[:2][::-1]
 
+    def with_ffmpeg_filter(self, video_filter, size):
+        """Returns a copy of the clip whose frames are processed by the ffmpeg
+        video filter ``video_filter`` when they are decoded, giving frames of
+        size ``size``, or ``None`` if the clip doesn't support it.
+
+        Only file clips created with ``fx_pushdown=True`` support it (see
+        ``VideoFileClip``). Effects such as ``resize`` or ``crop`` try it first
+        and fall back to processing the frames with NumPy.
+        """
+        return None
+
     @outplace
     def with_audio(self, audioclip):
         """Attach an AudioClip to the VideoClip.
@@ -842,6 +1112,7 @@ class VideoClip(Clip):
 
         """
         self.relative_pos = relative
+        self.has_constant_position = not callable(pos)
         if callable(pos):
             self.pos = pos
         else:
@@ -952,6 +1223,25 @@ class VideoClip(Clip):
         return self.with_mask(mask)
 
 
+def cut_segments(segments, start_time, end_time):
+    """Returns the part between times ``start_time`` and ``end_time`` of the
+    ``(filename, start_time, end_time)`` segments played one after the other,
+    or ``None`` if they don't last until ``end_time``.
+    """
+    cut = []
+    offset = 0
+    for filename, segment_start, segment_end in segments:
+        duration = segment_end - segment_start
+        start = max(start_time - offset, 0)
+        end = min(end_time - offset, duration)
+        if end > start:
+            cut.append((filename, segment_start + start, segment_start + end))
+        offset += duration
+    if end_time - offset > 1e-6:
+        return None
+    return cut
+
+
 class DataVideoClip(VideoClip):
     """
     Class of video clips whose successive frames are functions
@@ -1021,6 +1311,8 @@ class UpdatedVideoClip(VideoClip):
     def __init__(self, world, is_mask=False, duration=None):
         self.world = world
 
+        # the world is updated from one frame to the next
+        @sequential_access
         def make_frame(t):
             while self.world.clip_t < t:
                 world.update()
@@ -1,10 +1,18 @@
 """Main video composition interface of filmpy."""
 
+import itertools
+
 import numpy as np
 from PIL import Image
 
 from filmpy.audio.AudioClip import CompositeAudioClip
-from filmpy.video.VideoClip import ColorClip, VideoClip
+from filmpy.Clip import ClipIndex, FrameGraph
+from filmpy.video.tools.drawing import blit_array
+from filmpy.video.VideoClip import ColorClip, ImageClip, VideoClip
+
+# marks the runs of static layers whose plate hasn't been computed yet (the
+# plate of layers covering nothing is None), see blit_static_layers
+_no_plate = object()
 
 
 class CompositeVideoClip(VideoClip):
@@ -47,12 +55,39 @@ class CompositeVideoClip(VideoClip):
       have the same size as the final clip. If it has no transparency, the final
       clip will have no mask.
 
+    cache_static_layers
+      Set to ``True`` to blit the layers which don't change with time (image,
+      color and text clips at a fixed position, see ``is_static``) only once.
+      The background and the static layers right above it are flattened into
+      a plate which is copied for each frame, and the other consecutive
+      static layers are flattened into a transparent plate blitted at once,
+      over the region they cover. Only the other layers are then blitted for
+      each frame. Where several semi-transparent static layers overlap, the
+      pixels may differ by one level from the ones obtained by blitting the
+      layers one by one. Default is ``False``.
+
+    flatten_composites
+      Set to ``True`` to replace the composite clips of ``clips`` by their own
+      layers, moved and delayed like the composite clip, when this gives the
+      same frames (see ``flattened_layers``). Their frames are then blitted
+      directly on the frames of this clip, instead of being composed on
+      intermediate frames (and masks) first. The ``clips`` attribute of the
+      clip then holds these layers instead of the composite clips. Default is
+      ``False``.
+
     The clip with the highest FPS will be the FPS of the composite clip.
 
     """
 
     def __init__(
-        self, clips, size=None, bg_color=None, use_bgclip=False, is_mask=False
+        self,
+        clips,
+        size=None,
+        bg_color=None,
+        use_bgclip=False,
+        is_mask=False,
+        cache_static_layers=False,
+        flatten_composites=False,
     ):
         if size is None:
             size = clips[0].size
@@ -98,6 +133,24 @@ class CompositeVideoClip(VideoClip):
         if audioclips:
             self.audio = CompositeAudioClip(audioclips)
 
+        # replace the nested compositions by their layers
+        if flatten_composites:
+            layers = []
+            for clip in self.clips:
+                flattened = None
+                if isinstance(clip, CompositeVideoClip):
+                    flattened = clip.flattened_layers(self.bg.size, transparent)
+                layers.extend([clip] if flattened is None else flattened)
+            self.clips = layers
+        self.clip_index = ClipIndex(self.clips)
+
+        # plates of the static layers, see make_frame
+        self.cache_static_layers = cache_static_layers
+        self.static_plates = {}
+        if cache_static_layers:
+            self.static_bg = is_static(self.bg)
+            self.static_clips = [is_static(clip) for clip in self.clips]
+
         # compute mask if necessary
         if transparent:
             maskclips = [
@@ -110,29 +163,264 @@ class CompositeVideoClip(VideoClip):
             ]
 
             self.mask = CompositeVideoClip(
-                maskclips, self.size, is_mask=True, bg_color=0.0
+                maskclips,
+                self.size,
+                is_mask=True,
+                bg_color=0.0,
+                cache_static_layers=cache_static_layers,
+                flatten_composites=flatten_composites,
+            )
+        # mask of the layers, see flattened_layers
+        self.layers_mask = self.mask
+
+    def make_frame(self, t, frames=None):
+        """The clips playing at time `t` are blitted over one another.
+
+        ``frames`` optionally gives the ``(frame, mask_frame)`` of the
+        background and of each clip of ``self.clips`` at time `t`, in this
+        order, when they have already been computed (``(None, None)`` for the
+        clips which are not playing).
+
+        The frames of the clips are computed in a ``FrameGraph``, so that a
+        frame requested by several clips (e.g. by a clip and by its mask) is
+        only computed once. They are blended into a copy of the background
+        frame with Numpy (see ``blit_array``), each one only over the region
+        it covers. With ``cache_static_layers``, the consecutive static layers
+        are blitted from their cached plates (see ``blit_static_layers``).
+        """
+        with FrameGraph():
+            if self.cache_static_layers and self.bg.mask is None:
+                return self.blit_static_layers(t, frames)
+
+            frame, frame_mask = frames[0] if frames else (None, None)
+            if frame is None:
+                frame = self.bg.get_frame(t)
+
+            if self.bg.mask is not None:
+                im = Image.fromarray(frame.astype("uint8"))
+                if frame_mask is None:
+                    frame_mask = self.bg.mask.get_frame(t)
+                im_mask = Image.fromarray(255 * frame_mask).convert("L")
+                im = im.putalpha(im_mask)
+            else:
+                # a new array, on which the clips are blitted in place
+                im = np.array(frame, dtype="uint8")
+
+            if frames is None:
+                for clip in self.playing_clips(t):
+                    im = clip.blit_on(im, t)
+            else:
+                for clip, (frame, mask_frame) in zip(self.clips, frames[1:]):
+                    if frame is not None:
+                        im = clip.blit_on(im, t, frame=frame, mask_frame=mask_frame)
+
+        return im if isinstance(im, np.ndarray) else np.array(im)
+
+    def blit_static_layers(self, t, frames=None):
+        """Returns the frame at time `t` (see ``make_frame``), blitting the
+        runs of consecutive static layers playing at time `t` from plates
+        computed the first time these layers play together.
+        """
+        if frames is None:
+            playing = [
+                (index, self.clips[index], (None, None))
+                for index in self.clip_index.playing(t)
+            ]
+        else:
+            playing = [
+                (index, clip, frames[index + 1])
+                for index, clip in enumerate(self.clips)
+                if frames[index + 1][0] is not None
+            ]
+        runs = [
+            (static, list(run))
+            for static, run in itertools.groupby(
+                playing, key=lambda item: self.static_clips[item[0]]
+            )
+        ]
+
+        if self.static_bg:
+            # the background and the static layers above it are an opaque plate
+            bottom_run = runs.pop(0)[1] if runs and runs[0][0] else []
+            key = ("bottom",) + tuple(index for index, _, _ in bottom_run)
+            plate = self.static_plates.get(key)
+            if plate is None:
+                plate = np.array(self.bg.get_frame(t), dtype="uint8")
+                for _, clip, _ in bottom_run:
+                    plate = clip.blit_on(plate, t)
+                self.cache_plate(key, plate)
+            im = plate.copy()
+        else:
+            frame = frames[0][0] if frames else None
+            if frame is None:
+                frame = self.bg.get_frame(t)
+            im = np.array(frame, dtype="uint8")
+
+        for static, run in runs:
+            if not static or len(run) == 1:
+                for _, clip, (frame, mask_frame) in run:
+                    im = clip.blit_on(im, t, frame=frame, mask_frame=mask_frame)
+                continue
+            key = tuple(index for index, _, _ in run)
+            plate = self.static_plates.get(key, _no_plate)
+            if plate is _no_plate:
+                plate = flatten_layers([clip for _, clip, _ in run], t, im.shape)
+                self.cache_plate(key, plate)
+            if plate is not None:
+                img, mask, pos = plate
+                blit_array(img, im, pos, mask=mask)
+        return im
+
+    def cache_plate(self, key, plate):
+        """Stores the plate of static layers ``key``, keeping the plates of a
+        few combinations of static layers only.
+        """
+        if len(self.static_plates) >= 16:
+            self.static_plates.clear()
+        self.static_plates[key] = plate
+
+    def flattened_layers(self, picture_size, transparent=False):
+        """Returns the layers giving the frames of this clip when they are
+        blitted, in a composition of size ``picture_size``, in place of this
+        clip, or ``None`` if they would give different frames.
+
+        The layers are the clips of this composition (and its background if it
+        is opaque), starting, ending and moving with it. ``transparent``
+        tells if the composition has a mask, made from the masks of its
+        clips. This clip is flattened only if:
+
+        - It has not been transformed and its mask has not been replaced.
+        - The layers don't exceed it, or it covers the whole composition.
+        - Its masks, or the mask of the composition, which are made of
+          frames converted to integers (only 0 or 1), ignore the opacity of
+          their layers: the layers must then have no mask. Two nested
+          transparent compositions are not flattened.
+        - Its start or the start of each layer is 0, so that the times of the
+          frames requested to the layers are the same.
+        """
+        if (
+            not is_composition(self)
+            or (self.mask is None) != (self.layers_mask is None)
+            or (
+                self.mask is not None
+                # the copies of the mask made with the clip share its clips
+                and not (
+                    is_composition(self.mask)
+                    and self.mask.clips is self.layers_mask.clips
+                )
+            )
+            or self.bg.mask is not None
+            or tuple(self.bg.size) != tuple(self.size)
+        ):
+            return None
+        masked = self.mask is not None
+        if masked and transparent:
+            return None
+
+        covers_picture = False
+        if self.has_constant_position:
+            x, y = self.position_at(0, picture_size)
+            covers_picture = (
+                x <= 0
+                and y <= 0
+                and x + self.w >= picture_size[0]
+                and y + self.h >= picture_size[1]
             )
 
-    def make_frame(self, t):
-        """The clips playing at time `t` are blitted over one another."""
-        frame = self.bg.get_frame(t).astype("uint8")
-        im = Image.fromarray(frame)
-
-        if self.bg.mask is not None:
-            frame_mask = self.bg.mask.get_frame(t)
-            im_mask = Image.fromarray(255 * frame_mask).convert("L")
-            im = im.putalpha(im_mask)
-
-        for clip in self.playing_clips(t):
-            im = clip.blit_on(im, t)
-
-        return np.array(im)
+        for clip in self.clips:
+            if clip.start < 0 or (self.start and clip.start):
+                return None
+            if clip.mask is not None and (masked or transparent):
+                return None
+            if masked and clip.relative_pos:
+                # the clips of the mask are not positioned relatively
+                return None
+            if not covers_picture:
+                if not clip.has_constant_position or (
+                    clip.mask is not None and tuple(clip.mask.size) != tuple(clip.size)
+                ):
+                    return None
+                x, y = clip.position_at(0, self.size)
+                if x < 0 or y < 0 or x + clip.w > self.w or y + clip.h > self.h:
+                    return None
+
+        def layer(clip, start, end, clip_position, constant_position):
+            """Returns the clip starting at ``start`` in this composition and
+            positioned by ``clip_position(t)`` in it, moved to the picture.
+            """
+
+            def pos(t):
+                x, y = self.position_at(t + start, picture_size)
+                clip_x, clip_y = clip_position(t)
+                return (x + clip_x, y + clip_y)
+
+            if self.has_constant_position and constant_position:
+                pos = pos(0)
+            new_clip = clip.with_start(self.start + start)
+            if end is not None:
+                new_clip = new_clip.with_end(end)
+            return new_clip.with_position(pos).with_layer(self.layer)
+
+        layers = []
+        if not masked:
+            layers.append(layer(self.bg, 0, self.end, lambda t: (0, 0), True))
+        for clip in self.clips:
+            ends = [self.end]
+            if clip.end is not None:
+                ends.append(self.start + clip.end)
+            ends = [end for end in ends if end is not None]
+            layers.append(
+                layer(
+                    clip,
+                    clip.start,
+                    min(ends) if ends else None,
+                    # bound to the clip
+                    lambda t, clip=clip: clip.position_at(t, self.size),
+                    clip.has_constant_position,
+                )
+            )
+        return layers
+
+    def make_frames(self, times):
+        """Returns the frames at the sorted times ``times``, reading the frames
+        of the background and of each clip with ``get_frames`` first, one clip
+        after the other. Clips sharing the same file reader thus don't make it
+        jump back and forth between their positions. The frames of all the
+        clips are held in memory until the composition is done, in a
+        ``FrameGraph`` sharing the frames requested several times.
+        """
+        if not is_composition(self):
+            # the composition has been transformed (subclip, fx...)
+            return super().make_frames(times)
+
+        with FrameGraph():
+            frames = [[(None, None)] * (len(self.clips) + 1) for t in times]
+            for clip_index, clip in enumerate([self.bg] + self.clips):
+                if clip_index == 0:  # the background is used at any time
+                    indices, clip_times = range(len(times)), times
+                else:
+                    indices = [i for i, t in enumerate(times) if clip.is_playing(t)]
+                    clip_times = [times[i] - clip.start for i in indices]
+                if not len(indices):
+                    continue
+                clip_frames = clip.get_frames(clip_times)
+                mask_frames = (
+                    clip.mask.get_frames(clip_times)
+                    if clip.mask is not None
+                    else [None] * len(indices)
+                )
+                for i, frame, mask_frame in zip(indices, clip_frames, mask_frames):
+                    frames[i][clip_index] = (frame, mask_frame)
+
+            return np.stack(
+                [self.make_frame(t, frames=frames[i]) for i, t in enumerate(times)]
+            )
 
     def playing_clips(self, t=0):
         """Returns a list of the clips in the composite clips that are
-        actually playing at the given time `t`.
+        actually playing at the given time `t`, found in ``clip_index``.
         """
-        return [clip for clip in self.clips if clip.is_playing(t)]
+        return [self.clips[index] for index in self.clip_index.playing(t)]
 
     def close(self):
         """Closes the instance, releasing all the resources."""
@@ -146,6 +434,64 @@ class CompositeVideoClip(VideoClip):
             self.audio = None
 
 
+def is_composition(clip):
+    """Returns ``True`` if the clip is a ``CompositeVideoClip`` whose frames
+    are still the composition of its clips (it hasn't been transformed).
+    """
+    return isinstance(clip, CompositeVideoClip) and (
+        getattr(clip.make_frame, "__func__", None) is CompositeVideoClip.make_frame
+    )
+
+
+def is_static(clip):
+    """Returns ``True`` if the clip shows the same frame, with the same mask,
+    at the same position at any time, like the image clips (``ImageClip``,
+    ``ColorClip``, ``TextClip``) which have not been animated.
+    """
+    return clip.has_constant_position and all(
+        # image clips whose frames have not been replaced
+        isinstance(part, ImageClip) and part.make_frame(0) is part.img
+        for part in (clip, clip.mask)
+        if part is not None
+    )
+
+
+def flatten_layers(clips, t, shape):
+    """Flattens the static clips ``clips``, blitted one over the other on
+    a transparent picture of shape ``shape``, into an image and a mask.
+
+    Returns ``(image, mask, (x, y))``, cropped to the region covered by the
+    clips, whose top left corner is at ``(x, y)``, or ``None`` if the clips
+    cover nothing. The clips are blitted on a black picture and on a white
+    one, the difference between both giving the transparency of the plate.
+    """
+    black = np.zeros(shape, dtype="uint8")
+    white = np.full(shape, 255, dtype="uint8")
+    for clip in clips:
+        black = clip.blit_on(black, t)
+        white = clip.blit_on(white, t)
+
+    transparency = white.astype("int16") - black
+    if transparency.ndim == 3:
+        transparency = transparency.mean(axis=2)
+    mask = np.round(255 - transparency).astype("uint8")
+
+    ys, xs = np.nonzero(mask)
+    if not len(ys):
+        return None
+    y1, y2, x1, x2 = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+    mask = mask[y1:y2, x1:x2]
+    black = black[y1:y2, x1:x2]
+
+    # the black picture holds the colors of the plate multiplied by its opacity
+    opacity = mask.astype(float)
+    if black.ndim == 3:
+        opacity = opacity[:, :, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        image = np.where(opacity > 0, np.round(255.0 * black / opacity), 0)
+    return np.clip(image, 0, 255).astype("uint8"), mask, (x1, y1)
+
+
 def clips_array(array, rows_widths=None, cols_heights=None, bg_color=None):
     """Given a matrix whose rows are clips, creates a CompositeVideoClip where
     all clips are placed side by side horizontally for each clip in each row
@@ -5,6 +5,7 @@ from functools import reduce
 import numpy as np
 
 from filmpy.audio.AudioClip import CompositeAudioClip
+from filmpy.Clip import TimeIndex
 from filmpy.video.compositing.CompositeVideoClip import CompositeVideoClip
 from filmpy.video.VideoClip import ColorClip, VideoClip
 
@@ -34,7 +35,10 @@ def concatenate_videoclips(
       will appear centered. The border will be transparent if mask=True, else it
       will be of the color specified by ``bg_color``.
 
-    The clip with the highest FPS will be the FPS of the result clip.
+    The clip with the highest FPS will be the FPS of the result clip. The
+    start times of the clips, followed by the end of the result, are stored in
+    its ``timings`` attribute, and ``result.timings_index.index(t)`` (see
+    ``TimeIndex``) gives the index of the clip playing at time ``t``.
 
     Parameters
     ----------
@@ -73,10 +77,12 @@ def concatenate_videoclips(
     timings = np.maximum(0, timings + padding * np.arange(len(timings)))
     timings[-1] -= padding  # Last element is the duration of the whole
 
+    timings_index = TimeIndex(timings[:-1])
+
     if method == "chain":
 
         def make_frame(t):
-            i = max([i for i, e in enumerate(timings) if e <= t])
+            i = timings_index.index(t)
             return clips[i].get_frame(t - timings[i])
 
         def get_mask(clip):
@@ -90,6 +96,13 @@ def concatenate_videoclips(
             masks = [get_mask(clip) for clip in clips]
             result.mask = concatenate_videoclips(masks, method="chain", is_mask=True)
             result.clips = clips
+
+        clips_segments = [clip.source_segments() for clip in clips]
+        if padding == 0 and None not in clips_segments:
+            result.file_segments = (
+                make_frame,
+                [segment for segments in clips_segments for segment in segments],
+            )
     elif method == "compose":
         result = CompositeVideoClip(
             [
@@ -107,6 +120,7 @@ def concatenate_videoclips(
         )
 
     result.timings = timings
+    result.timings_index = timings_index
 
     result.start_times = timings[:-1]
     result.start, result.duration, result.end = 0, timings[-1], timings[-1]
@@ -16,6 +16,13 @@ def blackwhite(clip, RGB=None, preserve_luminosity=True):
 
     R, G, B = 1.0 * np.array(RGB) / (sum(RGB) if preserve_luminosity else 1)
 
+    weights = f"{R:.6f}:{G:.6f}:{B:.6f}:0"
+    new_clip = clip.with_ffmpeg_filter(
+        f"colorchannelmixer={weights}:{weights}:{weights}", clip.size
+    )
+    if new_clip is not None:
+        return new_clip
+
     def filter(im):
         im = R * im[:, :, 0] + G * im[:, :, 1] + B * im[:, :, 2]
         return np.dstack(3 * [im]).astype("uint8")
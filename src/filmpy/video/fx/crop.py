@@ -59,6 +59,14 @@ def crop(
     x2 = x2 or clip.size[0]
     y2 = y2 or clip.size[1]
 
+    x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+    if 0 <= x1 < x2 <= clip.size[0] and 0 <= y1 < y2 <= clip.size[1]:
+        new_clip = clip.with_ffmpeg_filter(
+            f"crop={x2 - x1}:{y2 - y1}:{x1}:{y1}", (x2 - x1, y2 - y1)
+        )
+        if new_clip is not None:
+            return new_clip
+
     return clip.image_transform(
         lambda frame: frame[int(y1) : int(y2), int(x1) : int(x2)], apply_to=["mask"]
     )
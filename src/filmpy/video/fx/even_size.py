@@ -10,6 +10,11 @@ def even_size(clip):
     if w_even and h_even:
         return clip
 
+    new_w, new_h = w - w % 2, h - h % 2
+    new_clip = clip.with_ffmpeg_filter(f"crop={new_w}:{new_h}:0:0", (new_w, new_h))
+    if new_clip is not None:
+        return new_clip
+
     if not w_even and not h_even:
 
         def image_filter(a):
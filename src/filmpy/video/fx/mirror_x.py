@@ -1,3 +1,6 @@
 def mirror_x(clip, apply_to="mask"):
     """Flips the clip horizontally (and its mask too, by default)."""
+    new_clip = clip.with_ffmpeg_filter("hflip", clip.size)
+    if new_clip is not None:
+        return new_clip
     return clip.image_transform(lambda img: img[:, ::-1], apply_to=apply_to)
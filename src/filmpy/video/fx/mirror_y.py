@@ -1,3 +1,6 @@
 def mirror_y(clip, apply_to="mask"):
     """Flips the clip vertically (and its mask too, by default)."""
+    new_clip = clip.with_ffmpeg_filter("vflip", clip.size)
+    if new_clip is not None:
+        return new_clip
     return clip.image_transform(lambda img: img[::-1], apply_to=apply_to)
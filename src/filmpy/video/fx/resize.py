@@ -215,6 +215,11 @@ def resize(clip, new_size=None, height=None, width=None, apply_to_mask=True):
         raise ValueError("You must provide either 'new_size' or 'height' or 'width'")
 
     # From here, the resizing is constant (not a function of time), size=newsize
+    new_w, new_h = int(new_size[0]), int(new_size[1])
+    if new_w > 0 and new_h > 0:
+        new_clip = clip.with_ffmpeg_filter(f"scale={new_w}:{new_h}", (new_w, new_h))
+        if new_clip is not None:
+            return new_clip
 
     if clip.is_mask:
 
@@ -37,6 +37,20 @@ def rotate(
             "'resample' argument must be either 'bilinear', 'nearest' or 'bicubic'"
         )
 
+    if not callable(angle) and not center and not translate and not bg_color:
+        degrees = math.degrees(angle) if unit == "rad" else angle
+        # np.rot90 turns the frames counterclockwise, like these filters
+        video_filter = {1: "transpose=2", 2: "hflip,vflip", 3: "transpose=1"}.get(
+            int(degrees // 90 % 4) if degrees % 90 == 0 else None
+        )
+        if video_filter is not None:
+            w, h = clip.size
+            new_clip = clip.with_ffmpeg_filter(
+                video_filter, (w, h) if video_filter == "hflip,vflip" else (h, w)
+            )
+            if new_clip is not None:
+                return new_clip
+
     def simple_rotate_90(frame, k):
         return np.rot90(frame, k)
 
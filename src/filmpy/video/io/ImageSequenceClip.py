@@ -7,6 +7,8 @@ import os
 import numpy as np
 from imageio.v2 import imread
 
+from filmpy.Clip import TimeIndex
+from filmpy.decorators import sequential_access
 from filmpy.video.VideoClip import VideoClip
 
 
@@ -100,20 +102,21 @@ class ImageSequenceClip(VideoClip):
             ]
         else:
             self.images_starts = [0] + list(np.cumsum(durations))
+        self.images_index = TimeIndex(self.images_starts[: len(sequence)])
         self.durations = durations
         self.duration = sum(durations)
         self.end = self.duration
         self.sequence = sequence
 
         def find_image_index(t):
-            return max(
-                [i for i in range(len(self.sequence)) if self.images_starts[i] <= t]
-            )
+            return self.images_index.index(t)
 
         if fromfiles:
             self.last_index = None
             self.last_image = None
 
+            # the last image read is kept between frames
+            @sequential_access
             def make_frame(t):
                 index = find_image_index(t)
 
@@ -128,6 +131,7 @@ class ImageSequenceClip(VideoClip):
                 self.mask.last_index = None
                 self.mask.last_image = None
 
+                @sequential_access
                 def mask_make_frame(t):
                     index = find_image_index(t)
                     if index != self.mask.last_index:
@@ -157,4 +161,22 @@ class ImageSequenceClip(VideoClip):
                 self.mask.size = mask_make_frame(0).shape[:2][::-1]
 
         self.make_frame = make_frame
+        self.images_make_frame = make_frame
         self.size = make_frame(0).shape[:2][::-1]
+
+    def make_frames(self, times):
+        """Returns the frames at the sorted times ``times``, finding all their
+        images at once and reading each image file only once.
+        """
+        if self.make_frame is not self.images_make_frame:
+            # the clip has been transformed (subclip, fx...)
+            return super().make_frames(times)
+
+        indices = self.images_index.indices(times)
+        indices = np.clip(indices, 0, len(self.sequence) - 1)
+        image_indices, frame_indices = np.unique(indices, return_inverse=True)
+        images = [
+            imread(image) if isinstance(image, str) else image
+            for image in (self.sequence[i] for i in image_indices)
+        ]
+        return np.stack([image[:, :, :3] for image in images])[frame_indices.ravel()]
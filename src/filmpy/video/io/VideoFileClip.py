@@ -1,8 +1,12 @@
 """Implements VideoFileClip, a class for video clips creation using video files."""
 
 from filmpy.audio.io.AudioFileClip import AudioFileClip
-from filmpy.decorators import convert_path_to_string
-from filmpy.video.io.ffmpeg_reader import FFMPEG_VideoReader
+from filmpy.decorators import FrameLock, convert_path_to_string, sequential_access
+from filmpy.video.io.ffmpeg_reader import (
+    FFMPEG_ReaderPool,
+    FFMPEG_VideoReader,
+    FrameCache,
+)
 from filmpy.video.VideoClip import VideoClip
 
 
@@ -54,7 +58,69 @@ class VideoFileClip(VideoClip):
     pixel_format
       Optional: Pixel format for the video to read. If is not specified
       'rgb24' will be used as the default format unless ``has_mask`` is set
-      as ``True``, then 'rgba' will be used.
+      as ``True``, then 'rgba' will be used. The frames are returned in the
+      native layout of the format, avoiding conversions when they are not
+      needed: 'gray' and 'gray16le' frames have a ``(h, w)`` shape,
+      'rgb48le' and 'rgba64le' frames have a ``uint16`` dtype, and 'yuv420p'
+      frames are ``(3 * h / 2, w)`` arrays holding the Y, U and V planes one
+      after the other (see ``ffmpeg_reader.yuv420p_planes`` to split them).
+
+    prefetch:
+      Number of frames that a background thread decodes ahead of the current
+      position. Set it to a few frames (e.g. ``8``) to overlap decoding with
+      the processing of the frames when they are read sequentially, as in
+      ``iter_frames`` or ``write_videofile``. Default is ``0`` (no prefetching).
+
+    seek_index:
+      Set to ``True`` to index the keyframes of the file, which makes random
+      access (playing backwards, jumping around the video...) faster. The index
+      is stored next to the video file in a ``.keyframes.json`` sidecar file
+      and reused the next time the file is opened.
+
+    frame_accurate:
+      Set to ``True`` to read the presentation times of all the frames of the
+      file when opening it, so that each time is mapped to the frame actually
+      displayed at that time, and seeks land exactly on it. Use it for
+      variable frame rate files, or files with B-frames whose frames drift
+      otherwise. Default is ``False``.
+
+    frame_cache:
+      Either a number of bytes or a ``FrameCache`` instance. Decoded frames are
+      kept in this least recently used cache, shared by all the clips derived
+      from this one (subclips, positioned copies...), so that a frame used
+      several times in a composition is only decoded once. Pass the same
+      ``FrameCache`` to several clips to share it between them. The cache
+      hits and misses are counted in ``clip.reader.frame_cache.hits`` and
+      ``clip.reader.frame_cache.misses``. Default is ``None`` (no cache).
+
+    buffers:
+      Number of preallocated arrays the frames are decoded into, used in turn,
+      to avoid allocating memory for each new frame. The frames returned are
+      then only valid until ``buffers`` more frames have been decoded (see
+      ``FFMPEG_VideoReader``): set it to ``2`` when each frame is processed
+      before reading the next one, as in ``iter_frames`` loops, and copy the
+      frames that must be kept. Default is ``0`` (a new array for each frame).
+
+    readers:
+      Maximum number of ffmpeg decoders reading the file at the same time, each
+      one at its own position. Use several readers when the file is played at
+      distant times in the same composition (many subclips of one recording
+      concatenated, a delayed copy of the clip...), so that each frame is read
+      by the closest reader instead of restarting ffmpeg. Default is ``1``.
+
+    reader_idle_time:
+      When ``readers`` is greater than 1, number of seconds after which an
+      unused decoder is closed. Default is ``10``.
+
+    fx_pushdown:
+      Set to ``True`` to have ffmpeg apply the effects ``resize`` (to a fixed
+      size), ``crop``, ``even_size``, ``mirror_x``, ``mirror_y``, ``rotate``
+      (by multiples of 90 degrees) and ``blackwhite`` while decoding the file,
+      when they are applied directly to this clip (or to a clip obtained this
+      way). Fewer pixels are then piped to Python, but each of these clips
+      starts its own decoder, and ``resize`` and ``blackwhite`` give slightly
+      different pixel values. Clips with a mask are never processed this way.
+      Default is ``False``.
 
 
     Attributes
@@ -95,20 +161,43 @@ class VideoFileClip(VideoClip):
         audio_nbytes=2,
         fps_source="fps",
         pixel_format=None,
+        prefetch=0,
+        seek_index=False,
+        frame_accurate=False,
+        frame_cache=None,
+        buffers=0,
+        readers=1,
+        reader_idle_time=10,
+        fx_pushdown=False,
     ):
         VideoClip.__init__(self)
 
         # Make a reader
         if not pixel_format:
             pixel_format = "rgba" if has_mask else "rgb24"
-        self.reader = FFMPEG_VideoReader(
-            filename,
+        if frame_cache is not None and not isinstance(frame_cache, FrameCache):
+            frame_cache = FrameCache(max_bytes=frame_cache)
+        reader_params = dict(
             decode_file=decode_file,
             pixel_format=pixel_format,
             target_resolution=target_resolution,
             resize_algo=resize_algorithm,
             fps_source=fps_source,
+            prefetch=prefetch,
+            seek_index=seek_index,
+            frame_accurate=frame_accurate,
+            frame_cache=frame_cache,
+            buffers=buffers,
         )
+        if readers > 1:
+            self.reader = FFMPEG_ReaderPool(
+                filename,
+                max_readers=readers,
+                idle_time=reader_idle_time,
+                **reader_params,
+            )
+        else:
+            self.reader = FFMPEG_VideoReader(filename, **reader_params)
 
         # Make some of the reader's attributes accessible from the clip
         self.duration = self.reader.duration
@@ -119,20 +208,35 @@ class VideoFileClip(VideoClip):
         self.rotation = self.reader.rotation
 
         self.filename = filename
+        self.fx_pushdown = fx_pushdown
 
+        # the reader decodes the frames for one thread at once
+        reader_lock = FrameLock()
         if has_mask:
-            self.make_frame = lambda t: self.reader.get_frame(t)[:, :, :3]
+            self.make_frame = sequential_access(
+                lambda t: self.reader.get_frame(t)[:, :, :3], reader_lock
+            )
 
             def mask_make_frame(t):
                 return self.reader.get_frame(t)[:, :, 3] / 255.0
 
             self.mask = VideoClip(
-                is_mask=True, make_frame=mask_make_frame
+                is_mask=True,
+                make_frame=sequential_access(mask_make_frame, reader_lock),
             ).with_duration(self.duration)
             self.mask.fps = self.fps
 
         else:
-            self.make_frame = lambda t: self.reader.get_frame(t)
+            self.make_frame = sequential_access(
+                lambda t: self.reader.get_frame(t), reader_lock
+            )
+        self.reader_make_frame = self.make_frame
+
+        # frames decoded at the size they are stored at (see source_segments)
+        if not self.rotation and list(self.size) == list(
+            self.reader.infos["video_size"]
+        ):
+            self.file_segments = (self.make_frame, [(filename, 0, self.duration)])
 
         # Make a reader for the audio, if any.
         if audio and self.reader.infos["audio_found"]:
@@ -156,6 +260,26 @@ class VideoFileClip(VideoClip):
         """
         return self.__copy__()
 
+    def with_ffmpeg_filter(self, video_filter, size):
+        """Returns a copy of the clip reading its frames with a new reader
+        which applies the ffmpeg video filter ``video_filter``, or ``None`` if
+        the clip hasn't been created with ``fx_pushdown=True``, has a mask or
+        has been transformed since.
+        """
+        if (
+            not self.fx_pushdown
+            or self.mask is not None
+            or self.make_frame is not self.reader_make_frame
+        ):
+            return None
+
+        new_clip = self.copy()
+        new_clip.reader = self.reader.with_video_filter(video_filter, size)
+        new_clip.size = new_clip.reader.size
+        new_clip.make_frame = sequential_access(lambda t: new_clip.reader.get_frame(t))
+        new_clip.reader_make_frame = new_clip.make_frame
+        return new_clip
+
     def close(self):
         """Close the internal reader."""
         if self.reader:
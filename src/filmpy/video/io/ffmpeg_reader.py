@@ -1,18 +1,301 @@
 """Implements all the functions to read a video or a picture using ffmpeg."""
 
+import bisect
+import copy
+import json
 import os
+import queue
 import re
 import subprocess as sp
+import threading
+import time
 import warnings
+import weakref
+from collections import OrderedDict
 
 import numpy as np
 
-from filmpy.config import FFMPEG_BINARY  # ffmpeg, ffmpeg.exe, etc...
+from filmpy.config import (
+    FFMPEG_BINARY,  # ffmpeg, ffmpeg.exe, etc...
+    FFMPEG_INFOS_CACHE,
+)
+from filmpy.profiling import profiled
 from filmpy.tools import convert_to_seconds, cross_platform_popen_params
 
+# dtype and number of values per pixel of the frames read in these pixel formats.
+# Formats not listed here are read as 8-bit RGB, or RGBA if their name ends
+# with 'a' (see https://github.com/Zulko/filmpy/issues/1070#issuecomment-644457274)
+PIXEL_FORMATS = {
+    "gray": ("uint8", 1),
+    "gray16le": ("<u2", 1),
+    "rgb24": ("uint8", 3),
+    "bgr24": ("uint8", 3),
+    "rgba": ("uint8", 4),
+    "bgra": ("uint8", 4),
+    "rgb48le": ("<u2", 3),
+    "rgba64le": ("<u2", 4),
+    # planar: the full size Y plane followed by the quarter size U and V planes
+    "yuv420p": ("uint8", 1.5),
+}
+
+
+def yuv420p_planes(frame):
+    """Returns the Y, U and V planes of a frame read in the ``yuv420p`` pixel
+    format, as views of shapes ``(h, w)``, ``(h/2, w/2)`` and ``(h/2, w/2)``.
+    """
+    h, w = frame.shape[0] * 2 // 3, frame.shape[1]
+    chroma = frame[h:].reshape(2, h // 2, w // 2)
+    return frame[:h], chroma[0], chroma[1]
+
+
+def read_into_buffer(stream, buffer):
+    """Fills ``buffer`` (a writable NumPy array) with bytes read from
+    ``stream`` and returns a memoryview on the bytes read, which are fewer than
+    the size of the buffer only at the end of the stream.
+    """
+    view = memoryview(buffer).cast("B")
+    nbytes = 0
+    while nbytes < len(view):
+        n = stream.readinto(view[nbytes:])
+        if not n:
+            break
+        nbytes += n
+    return view[:nbytes]
+
+
+class FFMPEG_FramePrefetcher:
+    """Reads raw frames from an ffmpeg pipe in a background thread.
+
+    Up to ``n_frames`` frames are kept decoded ahead of the consumer, so that
+    ffmpeg keeps decoding while the caller processes the previous frame.
+
+    Parameters
+    ----------
+
+    stream
+      Readable binary stream, usually the ``stdout`` of the ffmpeg process.
+
+    nbytes
+      Number of bytes of a single raw frame.
+
+    n_frames
+      Maximum number of frames read ahead.
+
+    buffers
+      Optional list of NumPy arrays of ``nbytes`` bytes, used in turn to read
+      the frames into instead of allocating new bytes for each frame. It must
+      hold more than ``n_frames + 1`` arrays for the frames read to stay valid
+      some time after being returned.
+
+    buffer_index
+      Index of the first array of ``buffers`` to read a frame into.
+    """
+
+    def __init__(self, stream, nbytes, n_frames, buffers=None, buffer_index=0):
+        self.stream = stream
+        self.nbytes = nbytes
+        self.buffers = buffers
+        self.buffer_index = buffer_index
+        self.frames = queue.Queue(maxsize=n_frames)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stopped.is_set():
+            try:
+                if self.buffers:
+                    buffer = self.buffers[self.buffer_index]
+                    self.buffer_index = (self.buffer_index + 1) % len(self.buffers)
+                    s = read_into_buffer(self.stream, buffer)
+                else:
+                    s = self.stream.read(self.nbytes)
+            except (OSError, ValueError):  # the pipe has been closed
+                s = b""
+            while not self.stopped.is_set():
+                try:
+                    self.frames.put(s, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            if len(s) != self.nbytes:
+                # end of the stream, nothing else will come out of the pipe
+                break
+
+    def read(self):
+        """Returns the bytes of the next frame, or the incomplete bytes read
+        at the end of the stream.
+        """
+        while True:
+            try:
+                return self.frames.get(timeout=0.1)
+            except queue.Empty:
+                if not self.thread.is_alive() and self.frames.empty():
+                    return b""
+
+    def stop(self):
+        """Stops the background thread. The pipe must have been closed or its
+        writer terminated before calling this method.
+        """
+        self.stopped.set()
+        self.thread.join()
+
+
+class FrameCache:
+    """Least recently used cache of decoded frames, limited in bytes.
+
+    A single cache can be shared by several readers, the frames being
+    identified by ``(filename, frame_index, size, pixel_format, video_filters)``
+    keys.
+
+    Parameters
+    ----------
+
+    max_bytes
+      Maximum number of bytes of the frames kept in the cache. The least
+      recently used frames are discarded to stay below this limit.
+
+    Attributes
+    ----------
+
+    hits, misses
+      Number of frames found and not found in the cache since its creation
+      or its last ``clear()``.
+    """
+
+    def __init__(self, max_bytes=512 * 1024**2):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.frames = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the frame stored at ``key``, or ``None`` if there is none."""
+        with self.lock:
+            frame = self.frames.get(key)
+            if frame is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.frames.move_to_end(key)
+            return frame
+
+    def put(self, key, frame):
+        """Stores ``frame`` at ``key``, discarding the least recently used
+        frames if the cache exceeds ``max_bytes``.
+        """
+        if frame.nbytes > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.frames:
+                self.nbytes -= self.frames.pop(key).nbytes
+            self.frames[key] = frame
+            self.nbytes += frame.nbytes
+            while self.nbytes > self.max_bytes:
+                _key, old_frame = self.frames.popitem(last=False)
+                self.nbytes -= old_frame.nbytes
+
+    def clear(self):
+        """Removes all the frames from the cache and resets its counters."""
+        with self.lock:
+            self.frames.clear()
+            self.nbytes = self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getstate__(self):
+        # a pickled cache is sent to other processes empty
+        return {"max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+
+# open readers, detached from their ffmpeg processes in forked child processes
+_readers = weakref.WeakSet()
+
+
+def _detach_readers():
+    """Makes the readers inherited by a forked process start their own ffmpeg
+    processes when they are next used, instead of reading from the pipes of the
+    parent process.
+    """
+    for reader in list(_readers):
+        reader.proc = None
+        reader.prefetcher = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_detach_readers)
+
+
+def is_borrowed_frame(frame):
+    """Returns ``True`` if ``frame`` may share memory with the reused buffers of
+    an open reader (see the ``buffers`` of ``FFMPEG_VideoReader``), which are
+    overwritten by the next frames read. Whether the frame is writeable or not
+    does not matter: a view of a buffer made writeable is still overwritten.
+    """
+    for reader in list(_readers):
+        for buffer in reader.frame_buffers or ():
+            if np.may_share_memory(frame, buffer):
+                return True
+    return False
+
+
+def close_readers():
+    """Terminates the ffmpeg processes of the open readers and stops their
+    prefetching threads. The readers start new processes when they are next
+    used.
+
+    Called before forking processes, so that no prefetching thread holds a lock
+    or is reading a pipe when the process is copied. The readers must not be
+    used by other threads meanwhile.
+    """
+    for reader in list(_readers):
+        reader.close(delete_lastread=False)
+
 
 class FFMPEG_VideoReader:
-    """Class for video byte-level reading with ffmpeg."""
+    """Class for video byte-level reading with ffmpeg.
+
+    If ``prefetch`` is greater than 0, a background thread reads up to
+    ``prefetch`` frames ahead of the current position, so that decoding
+    overlaps with the processing of the frames returned.
+
+    If ``seek_index`` is ``True``, the times of the keyframes of the file are
+    indexed (see ``ffmpeg_keyframe_times``). Seeks then reopen the file exactly
+    at the nearest keyframe, and forward jumps only reopen the file when the
+    measured cost of doing so is lower than decoding the skipped frames.
+
+    If ``frame_cache`` is a ``FrameCache``, the frames returned by
+    ``get_frame`` are stored in it and read back from it when requested again,
+    instead of being decoded once more.
+
+    If ``buffers`` is greater than 0, the frames are read from the pipe into
+    ``buffers`` preallocated arrays used in turn, instead of allocating new
+    memory for each frame. The frames returned are then read-only views on
+    these arrays: a frame is only valid until ``buffers`` more frames have been
+    decoded (frames skipped to reach a later time included), after which its
+    content is overwritten. Copy the frames that must be kept longer. With
+    ``buffers=2`` the previous frame stays valid while the next one is read.
+
+    If ``frame_accurate`` is ``True``, the presentation timestamps of all the
+    frames are read first (see ``ffmpeg_frame_times``). Times are then mapped
+    to the frame displayed at that time, even in variable frame rate files,
+    and seeks land exactly on the wanted frame, without decoding the frames
+    before it from a fixed offset. ``n_frames`` is then the number of frames
+    actually found in the file.
+
+    The frames are processed by the ffmpeg filters of ``video_filters`` before
+    being returned, the first one scaling them to ``target_resolution``. See
+    ``with_video_filter`` to add filters.
+    """
+
+    # Cost of reopening the file, in decoded frames, until it has been measured
+    default_reopen_cost = 100
 
     def __init__(
         self,
@@ -25,9 +308,25 @@ class FFMPEG_VideoReader:
         target_resolution=None,
         resize_algo="bicubic",
         fps_source="fps",
+        prefetch=0,
+        seek_index=False,
+        frame_cache=None,
+        buffers=0,
+        frame_accurate=False,
     ):
         self.filename = filename
         self.proc = None
+        self.frame_cache = frame_cache
+        self.buffers = buffers
+        self.frame_buffers = None
+        self.buffer_index = 0
+        self.prefetch = prefetch
+        self.prefetcher = None
+        self.keyframes = None
+        self.frame_times = None
+        self.frame_decode_time = None
+        self.reopen_time = None
+        _readers.add(self)
         infos = ffmpeg_parse_infos(
             filename,
             check_duration=check_duration,
@@ -54,6 +353,7 @@ class FFMPEG_VideoReader:
             else:
                 self.size = target_resolution
         self.resize_algo = resize_algo
+        self.video_filters = ["scale=%d:%d" % tuple(self.size)]
 
         self.duration = infos["video_duration"]
         self.ffmpeg_duration = infos["duration"]
@@ -63,17 +363,31 @@ class FFMPEG_VideoReader:
         self.infos = infos
 
         self.pixel_format = pixel_format
-        self.depth = 4 if pixel_format[-1] == "a" else 3
-        # 'a' represents 'alpha' which means that each pixel has 4 values instead of 3.
-        # See https://github.com/Zulko/filmpy/issues/1070#issuecomment-644457274
+        dtype, self.depth = PIXEL_FORMATS.get(
+            pixel_format, ("uint8", 4 if pixel_format[-1] == "a" else 3)
+        )
+        self.dtype = np.dtype(dtype)
 
         if bufsize is None:
-            w, h = self.size
-            bufsize = self.depth * w * h + 100
+            bufsize = self.frame_nbytes() + 100
 
         self.bufsize = bufsize
+
+        if frame_accurate:
+            self.frame_times = ffmpeg_frame_times(
+                filename, start=infos.get("start") or 0
+            )
+            if self.frame_times:
+                self.n_frames = len(self.frame_times)
+
+        if seek_index and self.n_frames > 1:
+            self.keyframes = ffmpeg_keyframe_times(
+                filename, start=infos.get("start") or 0
+            )
+
         self.initialize()
 
+    @profiled("seek")
     def initialize(self, start_time=0):
         """
         Opens the file, creates the pipe.
@@ -82,8 +396,28 @@ class FFMPEG_VideoReader:
         it pre-reads the first frame).
         """
         self.close(delete_lastread=False)  # if any
-
-        if start_time != 0:
+        started = time.perf_counter()
+
+        index = self.get_frame_number(start_time) if self.frame_times else 0
+        if index > 0:
+            # ffmpeg drops the frames before the seek time: seek between the
+            # previous frame and the wanted one to get this one first
+            seek_time = (self.frame_times[index - 1] + self.frame_times[index]) / 2
+            i_arg = ["-ss", f"{seek_time:.6f}", "-i", self.filename]
+        elif self.frame_times:
+            i_arg = ["-i", self.filename]
+        elif start_time != 0 and self.keyframes:
+            # input seek exactly to the keyframe, then decode up to start_time
+            keyframe_time = self.keyframe_time(start_time)
+            i_arg = [
+                "-ss",
+                f"{keyframe_time:.6f}",
+                "-i",
+                self.filename,
+                "-ss",
+                f"{start_time - keyframe_time:.6f}",
+            ]
+        elif start_time != 0:
             offset = min(1, start_time)
             i_arg = [
                 "-ss",
@@ -99,13 +433,15 @@ class FFMPEG_VideoReader:
         cmd = (
             [FFMPEG_BINARY]
             + i_arg
+            # one raw frame for each frame of the file, none duplicated or dropped
+            + (["-vsync", "passthrough"] if self.frame_times else [])
             + [
                 "-loglevel",
                 "error",
                 "-f",
                 "image2pipe",
                 "-vf",
-                "scale=%d:%d" % tuple(self.size),
+                ",".join(self.video_filters),
                 "-sws_flags",
                 self.resize_algo,
                 "-pix_fmt",
@@ -125,29 +461,73 @@ class FFMPEG_VideoReader:
         )
         self.proc = sp.Popen(cmd, **popen_params)
 
+        if self.buffers and self.frame_buffers is None:
+            # the prefetcher fills up to prefetch + 1 buffers ahead of the reader
+            n_buffers = self.buffers + (self.prefetch + 1 if self.prefetch else 0)
+            self.frame_buffers = [
+                np.empty(self.frame_nbytes(), dtype="uint8") for _i in range(n_buffers)
+            ]
+
+        if self.prefetch:
+            self.prefetcher = FFMPEG_FramePrefetcher(
+                self.proc.stdout,
+                self.frame_nbytes(),
+                self.prefetch,
+                buffers=self.frame_buffers,
+                buffer_index=self.buffer_index,
+            )
+
         # self.pos represents the (0-indexed) index of the frame that is next in line
         # to be read by self.read_frame().
         # Eg when self.pos is 1, the 2nd frame will be read next.
         self.pos = self.get_frame_number(start_time)
         self.lastread = self.read_frame()
 
+        if self.keyframes:
+            # measure how long reopening the file takes, decoding excluded
+            elapsed = time.perf_counter() - started
+            if self.frame_decode_time is not None:
+                keyframe_pos = self.get_frame_number(self.keyframe_time(start_time))
+                decoded_frames = self.pos - keyframe_pos
+                elapsed = max(0, elapsed - decoded_frames * self.frame_decode_time)
+            self.reopen_time = self._average(self.reopen_time, elapsed)
+
+    @profiled("decode")
     def skip_frames(self, n=1):
         """Reads and throws away n frames"""
-        w, h = self.size
+        nbytes = self.frame_nbytes()
+        started = time.perf_counter()
         for _i in range(n):
-            self.proc.stdout.read(self.depth * w * h)
+            self.read_bytes(nbytes)
 
             # self.proc.stdout.flush()
         self.pos += n
 
+        if n > 0:
+            self.frame_decode_time = self._average(
+                self.frame_decode_time, (time.perf_counter() - started) / n
+            )
+
+    def read_bytes(self, nbytes):
+        """Reads the raw bytes of the next frame, from the prefetching thread
+        if there is one, or directly from the ffmpeg pipe otherwise.
+        """
+        if self.prefetcher is not None:
+            return self.prefetcher.read()
+        if self.frame_buffers:
+            buffer = self.frame_buffers[self.buffer_index]
+            self.buffer_index = (self.buffer_index + 1) % len(self.frame_buffers)
+            return read_into_buffer(self.proc.stdout, buffer)
+        return self.proc.stdout.read(nbytes)
+
+    @profiled("decode")
     def read_frame(self):
         """
         Reads the next frame from the file.
         Note that upon (re)initialization, the first frame will already have been read
         and stored in ``self.lastread``.
         """
-        w, h = self.size
-        nbytes = self.depth * w * h
+        nbytes = self.frame_nbytes()
 
         # Check if we've reached the end of the file
         if self.pos >= self.n_frames:
@@ -158,7 +538,7 @@ class FFMPEG_VideoReader:
             )
             return self.last_read
 
-        s = self.proc.stdout.read(nbytes)
+        s = self.read_bytes(nbytes)
 
         if len(s) != nbytes:
             if len(s) == 0:  # We've reached the end of the file
@@ -189,8 +569,9 @@ class FFMPEG_VideoReader:
                     )
                 return self.last_read
 
-        result = np.frombuffer(s, dtype="uint8")
-        result.shape = (h, w, len(s) // (w * h))
+        result = np.frombuffer(s, dtype=self.dtype)
+        result.flags.writeable = False
+        result.shape = self.frame_shape()
         self.last_read = result
         self.pos += 1
 
@@ -204,19 +585,42 @@ class FFMPEG_VideoReader:
         This function tries to avoid fetching arbitrary frames
         whenever possible, by moving between adjacent frames.
         """
+        if self.frame_cache is None:
+            return self.read_frame_at(t)
+
+        frame_number = self.get_frame_number(t)
+        if frame_number >= self.n_frames:
+            # past the end, the last valid frame is returned
+            return self.read_frame_at(t)
+
+        key = (
+            self.filename,
+            frame_number,
+            tuple(self.size),
+            self.pixel_format,
+            tuple(self.video_filters),
+        )
+        frame = self.frame_cache.get(key)
+        if frame is None:
+            frame = self.read_frame_at(t)
+            # frames read into the reused buffers would be overwritten
+            self.frame_cache.put(key, frame.copy() if self.buffers else frame)
+        return frame
+
+    def read_frame_at(self, t):
+        """Decodes the frame at time t, moving the reader position to it."""
         # + 1 so that it represents the frame position that it will be
         # after the frame is read. This makes the later comparisons easier.
         pos = self.get_frame_number(t) + 1
 
         # Initialize proc if it is not open
         if not self.proc:
-            print("Proc not detected")
             self.initialize(t)
             return self.last_read
 
         if pos == self.pos:
             return self.last_read
-        elif (pos < self.pos) or (pos > self.pos + 100):
+        elif (pos < self.pos) or self.reopen_is_faster(pos):
             # We can't just skip forward to `pos` or it would take too long
             self.initialize(t)
             return self.lastread
@@ -226,12 +630,81 @@ class FFMPEG_VideoReader:
             result = self.read_frame()
             return result
 
+    def with_video_filter(self, video_filter, size):
+        """Returns a new reader of the file whose frames are also processed by
+        the ffmpeg video filter ``video_filter`` (e.g. ``"hflip"``), which
+        changes their size to ``size``. This reader is not modified.
+        """
+        reader = copy.copy(self)
+        reader.proc = None
+        reader.prefetcher = None
+        reader.frame_buffers = None
+        reader.buffer_index = 0
+        reader.video_filters = self.video_filters + [video_filter]
+        reader.size = [int(size[0]), int(size[1])]
+        reader.bufsize = reader.frame_nbytes() + 100
+        _readers.add(reader)
+        reader.initialize()
+        return reader
+
+    def frame_shape(self):
+        """Returns the shape of the frames read: ``(h, w, depth)``, ``(h, w)``
+        for the grayscale pixel formats, or ``(3 * h / 2, w)`` for ``yuv420p``
+        (see ``yuv420p_planes``).
+        """
+        w, h = self.size
+        if self.pixel_format == "yuv420p":
+            if w % 2 or h % 2:
+                raise ValueError(
+                    "The yuv420p pixel format requires an even frame size, got "
+                    f"{w}x{h}."
+                )
+            return (h * 3 // 2, w)
+        if self.depth == 1:
+            return (h, w)
+        return (h, w, self.depth)
+
+    def frame_nbytes(self):
+        """Returns the number of bytes of a raw frame."""
+        return int(np.prod(self.frame_shape())) * self.dtype.itemsize
+
+    def reopen_is_faster(self, pos):
+        """Returns ``True`` if reaching the frame position ``pos`` (as used in
+        ``get_frame``) is faster by reopening the file than by skipping frames.
+        """
+        if not self.keyframes:
+            return pos > self.pos + self.default_reopen_cost
+
+        reopen_cost = (
+            self.reopen_time / self.frame_decode_time
+            if self.frame_decode_time and self.reopen_time is not None
+            else self.default_reopen_cost
+        )
+
+        # frames decoded from the nearest keyframe until the wanted one
+        t = self.frame_times[pos - 1] if self.frame_times else (pos - 1) / self.fps
+        keyframe_pos = self.get_frame_number(self.keyframe_time(t))
+        return reopen_cost + (pos - keyframe_pos) < pos - self.pos
+
+    def keyframe_time(self, t):
+        """Returns the time of the last keyframe at or before time ``t``."""
+        index = bisect.bisect_right(self.keyframes, t + 0.00001) - 1
+        return self.keyframes[index] if index >= 0 else 0
+
+    @staticmethod
+    def _average(previous, value):
+        """Exponential moving average used to smooth the measured costs."""
+        return value if previous is None else 0.5 * (previous + value)
+
     def get_frame_number(self, t):
         """Helper method to return the frame number at time ``t``"""
         # I used this horrible '+0.00001' hack because sometimes due to numerical
         # imprecisions a 3.0 can become a 2.99999999... which makes the int()
         # go to the previous integer. This makes the fetching more robust when you
         # are getting the nth frame by writing get_frame(n/fps).
+        if self.frame_times:
+            # last frame displayed at time t
+            return max(0, bisect.bisect_right(self.frame_times, t + 0.00001) - 1)
         return int(self.fps * t + 0.00001)
 
     def close(self, delete_lastread=True):
@@ -239,17 +712,163 @@ class FFMPEG_VideoReader:
         if self.proc:
             if self.proc.poll() is None:
                 self.proc.terminate()
+                if self.prefetcher is not None:
+                    self.prefetcher.stop()
                 self.proc.stdout.close()
                 self.proc.stderr.close()
                 self.proc.wait()
+            elif self.prefetcher is not None:
+                self.prefetcher.stop()
             self.proc = None
+        if self.prefetcher is not None:
+            # keep filling the buffers after the last one used by the prefetcher
+            self.buffer_index = self.prefetcher.buffer_index
+        self.prefetcher = None
         if delete_lastread and hasattr(self, "last_read"):
             del self.last_read
 
+    def __getstate__(self):
+        # the ffmpeg process and the prefetching thread are not pickled: as in
+        # forked processes, the unpickled reader starts its own process when
+        # it is next read
+        state = self.__dict__.copy()
+        state.update(proc=None, prefetcher=None, frame_buffers=None)
+        state.pop("last_read", None)
+        state.pop("lastread", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        _readers.add(self)
+
     def __del__(self):
         self.close()
 
 
+class FFMPEG_ReaderPool:
+    """Pool of ``FFMPEG_VideoReader`` decoding the same file at several positions.
+
+    Each call to ``get_frame`` is routed to the reader which can reach the
+    wanted frame by decoding the fewest frames. When every reader would have to
+    reopen the file, a new reader is started at that time, unless the pool
+    already holds ``max_readers`` readers, in which case the least recently
+    used one is moved there.
+
+    The attributes of the first reader (``fps``, ``size``, ``infos``...) are
+    accessible from the pool, so that it can be used in place of a reader.
+
+    Parameters
+    ----------
+
+    filename
+      Name of the video file.
+
+    max_readers
+      Maximum number of readers (and ffmpeg processes) open at the same time.
+
+    idle_time
+      Readers that have not been used for this number of seconds are closed.
+      The first reader of the pool is never closed this way.
+
+    reader_params
+      Other parameters passed to ``FFMPEG_VideoReader``.
+    """
+
+    def __init__(self, filename, max_readers=4, idle_time=10, **reader_params):
+        self.max_readers = max_readers
+        self.idle_time = idle_time
+        self.readers = [FFMPEG_VideoReader(filename, **reader_params)]
+        self.last_used = [time.monotonic()]
+
+    def __getattr__(self, name):
+        if name == "readers":  # not set yet, or deleted by ``close``
+            raise AttributeError(name)
+        return getattr(self.readers[0], name)
+
+    def get_frame(self, t):
+        """Read a file video frame at time t, using the reader of the pool
+        which is closest to it.
+        """
+        now = time.monotonic()
+        self.evict_idle_readers(now)
+
+        index = self.closest_reader(t)
+        if index is None:
+            if len(self.readers) < self.max_readers:
+                self.readers.append(self.new_reader(t))
+                self.last_used.append(now)
+                index = len(self.readers) - 1
+            else:
+                index = self.last_used.index(min(self.last_used))
+
+        self.last_used[index] = now
+        return self.readers[index].get_frame(t)
+
+    def closest_reader(self, t):
+        """Returns the index of the reader which reaches the frame at time ``t``
+        by decoding the fewest frames, or ``None`` if all of them would have to
+        reopen the file.
+        """
+        best_index, best_distance = None, None
+        for index, reader in enumerate(self.readers):
+            if not reader.proc:
+                continue
+            pos = reader.get_frame_number(t) + 1
+            if pos < reader.pos or reader.reopen_is_faster(pos):
+                continue
+            if best_distance is None or pos - reader.pos < best_distance:
+                best_index, best_distance = index, pos - reader.pos
+        return best_index
+
+    def with_video_filter(self, video_filter, size):
+        """Returns a new pool whose readers also process the frames with the
+        ffmpeg video filter ``video_filter``, see
+        ``FFMPEG_VideoReader.with_video_filter``.
+        """
+        pool = copy.copy(self)
+        pool.readers = [self.readers[0].with_video_filter(video_filter, size)]
+        pool.last_used = [time.monotonic()]
+        return pool
+
+    def new_reader(self, t):
+        """Returns a new reader of the file opened at time ``t``, sharing the
+        already parsed informations of the first reader.
+        """
+        reader = copy.copy(self.readers[0])
+        reader.proc = None
+        reader.prefetcher = None
+        reader.frame_buffers = None
+        reader.initialize(t)
+        return reader
+
+    def evict_idle_readers(self, now):
+        """Closes the readers (but the first one) unused for ``idle_time``."""
+        for index in range(len(self.readers) - 1, 0, -1):
+            if now - self.last_used[index] > self.idle_time:
+                self.readers.pop(index).close()
+                self.last_used.pop(index)
+
+    def close(self):
+        """Closes all the readers of the pool."""
+        for reader in self.readers:
+            reader.close()
+        del self.readers[1:]
+        del self.last_used[1:]
+
+    def __getstate__(self):
+        # only the first reader is pickled, the others are opened again when
+        # they are needed
+        state = self.__dict__.copy()
+        state.update(readers=self.readers[:1], last_used=self.last_used[:1])
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def __len__(self):
+        return len(self.readers)
+
+
 def ffmpeg_read_image(filename, with_mask=True, pixel_format=None):
     """Read an image file (PNG, BMP, JPEG...).
 
@@ -645,6 +1264,9 @@ class FFmpegInfosParser:
         match_bitrate = re.search(r"(\d+) kb/s", line)
         stream_data["bitrate"] = int(match_bitrate.group(1)) if match_bitrate else None
 
+        match_codec = re.search(r" Video: (\w+)", line)
+        stream_data["codec"] = match_codec.group(1) if match_codec else None
+
         # Get the frame rate. Sometimes it's 'tbr', sometimes 'fps', sometimes
         # tbc, and sometimes tbc/2...
         # Current policy: Trust fps first, then tbr unless fps_source is
@@ -680,6 +1302,8 @@ class FFmpegInfosParser:
             global_data["video_size"] = stream_data.get("size")
         if self._current_stream["default"] or "video_bitrate" not in self.result:
             global_data["video_bitrate"] = stream_data.get("bitrate")
+        if self._current_stream["default"] or "video_codec" not in self.result:
+            global_data["video_codec"] = stream_data["codec"]
         if self._current_stream["default"] or "video_fps" not in self.result:
             global_data["video_fps"] = stream_data["fps"]
 
@@ -731,12 +1355,110 @@ class FFmpegInfosParser:
         return (field, value)
 
 
+class FFmpegInfosCache:
+    """Cache of the results of ``ffmpeg_parse_infos``.
+
+    The results are identified by the absolute path, modification time and
+    size of the file parsed, and by the parsing options, so that a file is
+    parsed again after being modified.
+
+    Parameters
+    ----------
+
+    filename
+      Optional name of a file where the results are also stored, one JSON
+      object per line, so that they are reused by other processes. Failing to
+      write in this file is silently ignored.
+
+    Attributes
+    ----------
+
+    hits, misses
+      Number of results found and not found in the cache since its creation
+      or its last ``clear()``.
+    """
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.infos = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if filename and os.path.isfile(filename):
+            self.load()
+
+    @staticmethod
+    def key(filename, **options):
+        """Returns the key of the results of ``ffmpeg_parse_infos(filename,
+        **options)``, or ``None`` if ``filename`` is not a file (e.g. an URL).
+        """
+        try:
+            stat = os.stat(filename)
+        except (OSError, TypeError, ValueError):
+            return None
+        return json.dumps(
+            [os.path.abspath(filename), stat.st_mtime_ns, stat.st_size, options],
+            sort_keys=True,
+        )
+
+    def get(self, key):
+        """Returns a copy of the results stored at ``key``, or ``None``."""
+        with self.lock:
+            infos = self.infos.get(key)
+            if infos is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return copy.deepcopy(infos)
+
+    def put(self, key, infos):
+        """Stores a copy of ``infos`` at ``key``."""
+        infos = copy.deepcopy(infos)
+        with self.lock:
+            self.infos[key] = infos
+            if self.filename:
+                try:
+                    with open(self.filename, "a") as f:
+                        f.write(json.dumps({"key": key, "infos": infos}) + "\n")
+                except (OSError, TypeError, ValueError):
+                    pass
+
+    def load(self):
+        """Reads the results stored in the cache file, the lines that can't be
+        decoded being ignored.
+        """
+        with self.lock, open(self.filename) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    self.infos[entry["key"]] = entry["infos"]
+                except (ValueError, KeyError, TypeError):
+                    continue
+
+    def clear(self):
+        """Removes all the results from the cache (but not from its file) and
+        resets its counters.
+        """
+        with self.lock:
+            self.infos.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self.infos)
+
+
+# Shared by all the calls to ``ffmpeg_parse_infos``, and stored in the file set
+# in the ``FFMPEG_INFOS_CACHE`` environment variable, if any.
+ffmpeg_infos_cache = FFmpegInfosCache(FFMPEG_INFOS_CACHE)
+
+
 def ffmpeg_parse_infos(
     filename,
     check_duration=True,
     fps_source="fps",
     decode_file=False,
     print_infos=False,
+    cache=True,
 ):
     """Get the information of a file using ffmpeg.
 
@@ -750,6 +1472,7 @@ def ffmpeg_parse_infos(
     - ``"video_n_frames"``
     - ``"video_duration"``
     - ``"video_bitrate"``
+    - ``"video_codec"``
     - ``"video_metadata"``
     - ``"audio_found"``
     - ``"audio_fps"``
@@ -779,7 +1502,26 @@ def ffmpeg_parse_infos(
       Indicates if the whole file must be read to retrieve their duration.
       This is needed for some files in order to get the correct duration (see
       https://github.com/Zulko/filmpy/pull/1222).
+
+    cache
+      If ``True``, the results are read from ``ffmpeg_infos_cache`` when the
+      file has already been parsed with the same options, and stored in it
+      otherwise. They are never read from the cache when ``print_infos`` is
+      ``True``.
     """
+    key = None
+    if cache:
+        key = FFmpegInfosCache.key(
+            filename,
+            check_duration=check_duration,
+            fps_source=fps_source,
+            decode_file=decode_file,
+        )
+        if key is not None and not print_infos:
+            infos = ffmpeg_infos_cache.get(key)
+            if infos is not None:
+                return infos
+
     # Open the file in a pipe, read output
     cmd = [FFMPEG_BINARY, "-hide_banner", "-i", filename]
     if decode_file:
@@ -806,7 +1548,7 @@ def ffmpeg_parse_infos(
         print(infos)
 
     try:
-        return FFmpegInfosParser(
+        result = FFmpegInfosParser(
             infos,
             filename,
             fps_source=fps_source,
@@ -819,3 +1561,157 @@ def ffmpeg_parse_infos(
         elif not os.path.exists(filename):
             raise FileNotFoundError(f"'{filename}' not found")
         raise OSError(f"Error passing `ffmpeg -i` command output:\n\n{infos}") from exc
+
+    if key is not None:
+        ffmpeg_infos_cache.put(key, result)
+    return result
+
+
+def ffmpeg_frame_times(filename, start=0, seek_time=None, n_frames=None):
+    """Returns the sorted presentation times (in seconds) of all the frames of
+    the default video stream of a file.
+
+    The file is only demuxed, not decoded, so this is fast even for long files.
+    The frames which are not presented (e.g. cut by an edit list) are ignored.
+
+    Parameters
+    ----------
+
+    filename
+      Name of the video file.
+
+    start
+      Start time of the file, as returned by ``ffmpeg_parse_infos``. The
+      returned times are relative to it, like the times of the clips.
+
+    seek_time
+      If provided, only the frames read from this time are returned, the file
+      being seeked like ``ffmpeg -ss seek_time -i filename -c copy`` does (from
+      the keyframe before ``seek_time``).
+
+    n_frames
+      If provided, only the times of the first ``n_frames`` frames read are
+      returned.
+    """
+    cmd = [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error"]
+    if seek_time is not None:
+        # keeps the times of the file to return the time of the frames seeked
+        cmd.extend(["-copyts", "-ss", f"{seek_time:.6f}"])
+    cmd.extend(["-i", filename, "-map", "0:v:0"])
+    if n_frames is not None:
+        cmd.extend(["-frames:v", str(n_frames)])
+    cmd.extend(["-c", "copy", "-f", "framecrc", "-"])
+    popen_params = cross_platform_popen_params(
+        {
+            "bufsize": 10**5,
+            "stdout": sp.PIPE,
+            "stderr": sp.DEVNULL,
+            "stdin": sp.DEVNULL,
+        }
+    )
+    proc = sp.Popen(cmd, **popen_params)
+    (output, _error) = proc.communicate()
+    output = output.decode("utf8", errors="ignore")
+
+    # lines "stream_index, dts, pts, duration, size, checksum[, F=flags]" with
+    # times in the time base
+    match_time_base = re.search(r"#tb 0: (\d+)/(\d+)", output)
+    if match_time_base is None:
+        return None
+    time_base = int(match_time_base.group(1)) / int(match_time_base.group(2))
+    times = []
+    for line in output.splitlines():
+        if line.startswith("#"):
+            continue
+        fields = line.split(",")
+        try:
+            t = int(fields[2]) * time_base - start
+            flags = int(fields[6].strip()[2:], 16) if len(fields) > 6 else 0
+        except (IndexError, ValueError):
+            continue
+        if t > -0.00001 and not flags & 0x4:  # 0x4: discarded packet
+            times.append(max(0, t))
+    return sorted(times) or None
+
+
+def ffmpeg_keyframe_times(filename, start=0, sidecar=True):
+    """Returns the sorted times (in seconds) of the keyframes of the default
+    video stream of a file.
+
+    Only the keyframes are decoded, which is much faster than decoding the
+    whole file, but can still take a while for long videos. That is why the
+    result is stored by default in a JSON sidecar file named
+    ``<filename>.keyframes.json`` and reused while the video file is unchanged.
+
+    Parameters
+    ----------
+
+    filename
+      Name of the video file.
+
+    start
+      Start time of the file, as returned by ``ffmpeg_parse_infos``. The
+      returned times are relative to it, like the times of the clips.
+
+    sidecar
+      If ``True``, read the keyframe times from the sidecar file when it is up
+      to date, and write them to it otherwise. Failing to write the sidecar file
+      (for example in a read-only folder) is silently ignored.
+    """
+    sidecar_filename = f"{filename}.keyframes.json"
+    stat = os.stat(filename)
+    signature = {"mtime": stat.st_mtime, "size": stat.st_size, "start": start}
+
+    if sidecar and os.path.isfile(sidecar_filename):
+        try:
+            with open(sidecar_filename) as f:
+                index = json.load(f)
+            if index["signature"] == signature:
+                return index["keyframes"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass  # corrupted or outdated, so build the index again
+
+    cmd = [
+        FFMPEG_BINARY,
+        "-hide_banner",
+        "-skip_frame",
+        "nokey",
+        "-i",
+        filename,
+        "-map",
+        "0:v:0",
+        "-vf",
+        "showinfo",
+        "-f",
+        "null",
+        "-",
+    ]
+    popen_params = cross_platform_popen_params(
+        {
+            "bufsize": 10**5,
+            "stdout": sp.DEVNULL,
+            "stderr": sp.PIPE,
+            "stdin": sp.DEVNULL,
+        }
+    )
+    proc = sp.Popen(cmd, **popen_params)
+    (_output, error) = proc.communicate()
+    infos = error.decode("utf8", errors="ignore")
+
+    keyframes = sorted(
+        max(0, float(pts_time) - start)
+        for pts_time in re.findall(
+            r"pts_time:\s*(-?\d+(?:\.\d+)?).*iskey:1", infos
+        )
+    )
+    if not keyframes:
+        return None
+
+    if sidecar:
+        try:
+            with open(sidecar_filename, "w") as f:
+                json.dump({"signature": signature, "keyframes": keyframes}, f)
+        except OSError:
+            pass
+
+    return keyframes
@@ -3,13 +3,59 @@ On the long term this will implement several methods to make videos
 out of VideoClips
 """
 
+import contextlib
+import json
+import multiprocessing
+import os
+import pickle
+import queue
+import re
+import shutil
 import subprocess as sp
+import tempfile
+import threading
 
 import numpy as np
 from proglog import proglog
 
 from filmpy.config import FFMPEG_BINARY
-from filmpy.tools import cross_platform_popen_params
+from filmpy.profiling import profile_stage, profiled
+from filmpy.tools import (
+    cross_platform_popen_params,
+    pickle_dumps,
+    subprocess_call,
+    thread_map,
+    warn_outside_filmpy,
+)
+from filmpy.video.io.ffmpeg_reader import (
+    close_readers,
+    ffmpeg_frame_times,
+    ffmpeg_keyframe_times,
+    ffmpeg_parse_infos,
+    is_borrowed_frame,
+)
+
+# encoders producing streams of these video codecs, for the stream copy
+CODEC_ENCODERS = {
+    "h264": "libx264",
+    "hevc": "libx265",
+    "mpeg4": "mpeg4",
+    "theora": "libtheora",
+    "vp8": "libvpx",
+    "vp9": "libvpx-vp9",
+}
+
+# encoders of the image formats written by ffmpeg_write_images_sequence,
+# whether they keep an alpha channel, and their default parameters (the JPEG
+# quality of ffmpeg is otherwise set by a low video bitrate)
+IMAGE_ENCODERS = {
+    "png": ("png", True, []),
+    "jpg": ("mjpeg", False, ["-qscale:v", "2"]),
+    "jpeg": ("mjpeg", False, ["-qscale:v", "2"]),
+    "bmp": ("bmp", False, []),
+    "tif": ("tiff", True, []),
+    "tiff": ("tiff", True, []),
+}
 
 
 class FFMPEG_VideoWriter:
@@ -72,6 +118,31 @@ class FFMPEG_VideoWriter:
 
     ffmpeg_params : list, optional
       Additional parameters passed to ffmpeg command.
+
+    queue_size : int, optional
+      If greater than 0, ``write_frame`` only puts the frames in a queue of
+      ``queue_size`` frames, and a background thread writes them to ffmpeg
+      without copying them, so that the next frames are computed while ffmpeg
+      encodes the previous ones. The frames must then not be modified after
+      being passed to ``write_frame``. An error of ffmpeg is raised by the
+      next call to ``write_frame`` or by ``close``.
+
+    audio_fps : int, optional
+      If set, ffmpeg also reads raw audio samples at this frame rate from a
+      pipe, written with ``write_audio``, and encodes them in the same pass as
+      the video. Not available on Windows.
+
+    audio_nbytes : int, optional
+      Number of bytes per audio sample written with ``write_audio``.
+
+    audio_nchannels : int, optional
+      Number of audio channels written with ``write_audio``.
+
+    audio_codec : str, optional
+      FFMPEG codec of the audio read from the pipe.
+
+    audio_bitrate : str, optional
+      Bitrate of the audio read from the pipe, like ``"128k"``.
     """
 
     def __init__(
@@ -88,12 +159,19 @@ class FFMPEG_VideoWriter:
         threads=None,
         ffmpeg_params=None,
         pixel_format=None,
+        queue_size=0,
+        audio_fps=None,
+        audio_nbytes=2,
+        audio_nchannels=2,
+        audio_codec=None,
+        audio_bitrate=None,
     ):
         if logfile is None:
             logfile = sp.PIPE
         self.logfile = logfile
         self.filename = filename
         self.codec = codec
+        self.audio_codec = audio_codec
         self.ext = self.filename.split(".")[-1]
         if not pixel_format:  # pragma: no cover
             pixel_format = "rgba" if with_mask else "rgb24"
@@ -118,8 +196,32 @@ class FFMPEG_VideoWriter:
             "-i",
             "-",
         ]
+        pass_fds = ()
+        self.audio_pipe = None
         if audiofile is not None:
             cmd.extend(["-i", audiofile, "-acodec", "copy"])
+        elif audio_fps is not None:
+            audio_read_fd, audio_write_fd = os.pipe()
+            pass_fds = (audio_read_fd,)
+            self.audio_pipe = os.fdopen(audio_write_fd, "wb")
+            cmd.extend(
+                [
+                    "-f",
+                    f"s{8 * audio_nbytes}le",
+                    "-acodec",
+                    f"pcm_s{8 * audio_nbytes}le",
+                    "-ar",
+                    f"{int(audio_fps)}",
+                    "-ac",
+                    f"{int(audio_nchannels)}",
+                    "-i",
+                    f"pipe:{audio_read_fd}",
+                ]
+            )
+            if audio_codec is not None:
+                cmd.extend(["-acodec", audio_codec])
+            if audio_bitrate is not None:
+                cmd.extend(["-ab", audio_bitrate])
         cmd.extend(["-vcodec", codec, "-preset", preset])
         if ffmpeg_params is not None:
             cmd.extend(ffmpeg_params)
@@ -136,74 +238,175 @@ class FFMPEG_VideoWriter:
         popen_params = cross_platform_popen_params(
             {"stdout": sp.DEVNULL, "stderr": logfile, "stdin": sp.PIPE}
         )
+        if pass_fds:
+            popen_params["pass_fds"] = pass_fds
+
+        try:
+            self.proc = sp.Popen(cmd, **popen_params)
+        finally:
+            for fd in pass_fds:
+                os.close(fd)
+
+        self.audio_thread = None
+        self.audio_error = None
+        self.audio_stop = threading.Event()
+        self.frames = None
+        self.write_error = None
+        self.writer_thread = None
+        if queue_size:
+            self.frames = queue.Queue(maxsize=queue_size)
+            self.writer_thread = threading.Thread(target=self._run, daemon=True)
+            self.writer_thread.start()
+
+    def _run(self):
+        """Writes the frames of the queue to ffmpeg until ``None`` is queued."""
+        while True:
+            frame = self.frames.get()
+            if frame is None:
+                break
+            if self.write_error is not None:
+                # keep emptying the queue so that write_frame never blocks
+                continue
+            try:
+                self.proc.stdin.write(memoryview(frame))
+            except OSError as err:
+                self.write_error = err
+
+    def write_audio(self, chunks):
+        """Starts a background thread writing the audio ``chunks``, arrays of
+        quantized samples as yielded by ``AudioClip.iter_chunks``, to the audio
+        pipe of ffmpeg (see ``audio_fps``), while the frames are written.
+        """
+        self.audio_thread = threading.Thread(
+            target=self._run_audio, args=(chunks,), daemon=True
+        )
+        self.audio_thread.start()
 
-        self.proc = sp.Popen(cmd, **popen_params)
+    def _run_audio(self, chunks):
+        """Writes the audio chunks to the audio pipe, then closes it."""
+        try:
+            for chunk in chunks:
+                if self.audio_stop.is_set():
+                    break
+                self.audio_pipe.write(chunk.tobytes())
+        except Exception as err:
+            self.audio_error = err
+        finally:
+            with contextlib.suppress(OSError):
+                self.audio_pipe.close()
 
+    @profiled("encode")
     def write_frame(self, img_array):
         """Writes one frame in the file."""
+        if self.frames is not None:
+            if self.write_error is not None:
+                err, self.write_error = self.write_error, None
+                self.raise_write_error(err)
+            self.frames.put(np.ascontiguousarray(img_array))
+            return
+
         try:
             self.proc.stdin.write(img_array.tobytes())
         except OSError as err:
-            _, ffmpeg_error = self.proc.communicate()
-            if ffmpeg_error is not None:
-                ffmpeg_error = ffmpeg_error.decode()
-            else:
-                # The error was redirected to a logfile with `write_logfile=True`,
-                # so read the error from that file instead
-                self.logfile.seek(0)
-                ffmpeg_error = self.logfile.read()
-
-            error = (
-                f"{err}\n\nfilmpy error: FFMPEG encountered the following error while "
-                f"writing file {self.filename}:\n\n {ffmpeg_error}"
+            self.raise_write_error(err)
+
+    def raise_write_error(self, err):
+        """Raises an error explaining why ffmpeg failed, after the error
+        ``err`` occurred while writing a frame to its pipe.
+        """
+        _, ffmpeg_error = self.proc.communicate()
+        if ffmpeg_error is not None:
+            ffmpeg_error = ffmpeg_error.decode()
+        else:
+            # The error was redirected to a logfile with `write_logfile=True`,
+            # so read the error from that file instead
+            self.logfile.seek(0)
+            ffmpeg_error = self.logfile.read()
+
+        error = (
+            f"{err}\n\nfilmpy error: FFMPEG encountered the following error while "
+            f"writing file {self.filename}:\n\n {ffmpeg_error}"
+        )
+
+        if self.audio_codec and f"Unknown encoder '{self.audio_codec}'" in (
+            ffmpeg_error
+        ):
+            error += (
+                "\n\nThe video export failed because FFMPEG didn't find the "
+                f"specified codec for audio encoding {self.audio_codec}. "
+                "Please install this codec or change the audio codec when "
+                "calling write_videofile.\nFor instance for mp3:\n"
+                "   >>> write_videofile('myvid.mp4', audio_codec='libmp3lame')"
             )
 
-            if "Unknown encoder" in ffmpeg_error:
-                error += (
-                    "\n\nThe video export failed because FFMPEG didn't find the "
-                    f"specified codec for video encoding {self.codec}. "
-                    "Please install this codec or change the codec when calling "
-                    "write_videofile.\nFor instance:\n"
-                    "  >>> clip.write_videofile('myvid.webm', codec='libvpx')"
-                )
+        elif "Unknown encoder" in ffmpeg_error:
+            error += (
+                "\n\nThe video export failed because FFMPEG didn't find the "
+                f"specified codec for video encoding {self.codec}. "
+                "Please install this codec or change the codec when calling "
+                "write_videofile.\nFor instance:\n"
+                "  >>> clip.write_videofile('myvid.webm', codec='libvpx')"
+            )
 
-            elif "incorrect codec parameters ?" in ffmpeg_error:
-                error += (
-                    "\n\nThe video export failed, possibly because the codec "
-                    f"specified for the video {self.codec} is not compatible with "
-                    f"the given extension {self.ext}.\n"
-                    "Please specify a valid 'codec' argument in write_videofile.\n"
-                    "This would be 'libx264' or 'mpeg4' for mp4, "
-                    "'libtheora' for ogv, 'libvpx for webm.\n"
-                    "Another possible reason is that the audio codec was not "
-                    "compatible with the video codec. For instance, the video "
-                    "extensions 'ogv' and 'webm' only allow 'libvorbis' (default) as a"
-                    "video codec."
-                )
+        elif "incorrect codec parameters ?" in ffmpeg_error:
+            error += (
+                "\n\nThe video export failed, possibly because the codec "
+                f"specified for the video {self.codec} is not compatible with "
+                f"the given extension {self.ext}.\n"
+                "Please specify a valid 'codec' argument in write_videofile.\n"
+                "This would be 'libx264' or 'mpeg4' for mp4, "
+                "'libtheora' for ogv, 'libvpx for webm.\n"
+                "Another possible reason is that the audio codec was not "
+                "compatible with the video codec. For instance, the video "
+                "extensions 'ogv' and 'webm' only allow 'libvorbis' (default) as a"
+                "video codec."
+            )
 
-            elif "bitrate not specified" in ffmpeg_error:
-                error += (
-                    "\n\nThe video export failed, possibly because the bitrate "
-                    "specified was too high or too low for the video codec."
-                )
+        elif "bitrate not specified" in ffmpeg_error:
+            error += (
+                "\n\nThe video export failed, possibly because the bitrate "
+                "specified was too high or too low for the video codec."
+            )
 
-            elif "Invalid encoder type" in ffmpeg_error:
-                error += (
-                    "\n\nThe video export failed because the codec "
-                    "or file extension you provided is not suitable for video"
-                )
+        elif "Invalid encoder type" in ffmpeg_error:
+            error += (
+                "\n\nThe video export failed because the codec "
+                "or file extension you provided is not suitable for video"
+            )
 
-            raise OSError(error)
+        raise OSError(error)
 
     def close(self):
         """Closes the writer, terminating the subprocess if is still alive."""
+        if self.writer_thread is not None:
+            self.frames.put(None)
+            self.writer_thread.join()
+            self.writer_thread = None
+        err, self.write_error = self.write_error, None
         if self.proc:
-            self.proc.stdin.close()
-            if self.proc.stderr is not None:
-                self.proc.stderr.close()
-            self.proc.wait()
+            try:
+                if err is not None:
+                    self.raise_write_error(err)
+            finally:
+                self.proc.stdin.close()
+                if self.audio_thread is not None:
+                    self.audio_thread.join()
+                    self.audio_thread = None
+                elif self.audio_pipe is not None:
+                    self.audio_pipe.close()
+                if self.proc.stderr is not None:
+                    self.proc.stderr.close()
+                self.proc.wait()
 
-            self.proc = None
+                self.proc = None
+            err, self.audio_error = self.audio_error, None
+            if err is not None and not self.audio_stop.is_set():
+                if not isinstance(err, OSError):
+                    raise err
+                raise OSError(
+                    f"{err}\n\nfilmpy error: FFMPEG stopped reading the audio "
+                    f"while writing file {self.filename}."
+                )
 
     # Support the Context Manager protocol, to ensure that resources are cleaned up.
 
@@ -211,6 +414,9 @@ class FFMPEG_VideoWriter:
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            # stop computing the audio, and keep the error being raised
+            self.audio_stop.set()
         self.close()
 
 
@@ -228,16 +434,83 @@ def ffmpeg_write_video(
     ffmpeg_params=None,
     logger="bar",
     pixel_format=None,
+    workers=None,
+    queue_size=0,
+    stream_copy=False,
+    audio_clip=None,
+    audio_fps=44100,
+    audio_nbytes=4,
+    audio_codec=None,
+    audio_bitrate=None,
+    audio_bufsize=2000,
+    checkpoint_duration=None,
+    frame_threads=None,
+    frame_processes=None,
 ):
     """Write the clip to a videofile. See VideoClip.write_videofile for details
     on the parameters.
+
+    If ``audio_clip`` is set, it is encoded in the same ffmpeg process as the
+    video, which reads its samples from a pipe (see ``FFMPEG_VideoWriter``).
+    Stream copy, checkpoints and rendering with several workers require an
+    ``audiofile`` instead.
     """
     logger = proglog.default_bar_logger(logger)
 
-    logfile = open(filename + ".log", "w+") if write_logfile else None
-    logger(message=f"filmpy - Writing video {filename}\n")
     if not pixel_format:
         pixel_format = "rgba" if with_mask else "rgb24"
+    segments = clip.source_segments() if stream_copy and not with_mask else None
+    if audio_clip is not None:
+        segments = workers = checkpoint_duration = None
+    if segments and ffmpeg_write_video_stream_copy(
+        clip,
+        segments,
+        filename,
+        fps,
+        codec=codec,
+        bitrate=bitrate,
+        preset=preset,
+        write_logfile=write_logfile,
+        audiofile=audiofile,
+        threads=threads,
+        ffmpeg_params=ffmpeg_params,
+        logger=logger,
+        pixel_format=pixel_format,
+    ):
+        return
+    if (workers is not None and workers > 1) or checkpoint_duration:
+        return ffmpeg_write_video_segments(
+            clip,
+            filename,
+            fps,
+            workers or 1,
+            codec=codec,
+            bitrate=bitrate,
+            preset=preset,
+            with_mask=with_mask,
+            write_logfile=write_logfile,
+            audiofile=audiofile,
+            threads=threads,
+            ffmpeg_params=ffmpeg_params,
+            logger=logger,
+            pixel_format=pixel_format,
+            queue_size=queue_size,
+            segment_duration=checkpoint_duration,
+            checkpoint_dir=(f"{filename}.checkpoint" if checkpoint_duration else None),
+        )
+
+    audio_params = {}
+    if audio_clip is not None:
+        audio_params = dict(
+            audio_fps=audio_fps,
+            audio_nbytes=audio_nbytes,
+            audio_nchannels=audio_clip.nchannels,
+            audio_codec=audio_codec,
+            audio_bitrate=audio_bitrate,
+        )
+
+    logfile = open(filename + ".log", "w+") if write_logfile else None
+    logger(message=f"filmpy - Writing video {filename}\n")
     with FFMPEG_VideoWriter(
         filename,
         clip.size,
@@ -250,15 +523,30 @@ def ffmpeg_write_video(
         threads=threads,
         ffmpeg_params=ffmpeg_params,
         pixel_format=pixel_format,
+        queue_size=queue_size,
+        **audio_params,
     ) as writer:
+        if audio_clip is not None:
+            writer.write_audio(
+                audio_clip.iter_chunks(
+                    chunksize=audio_bufsize,
+                    quantize=True,
+                    nbytes=audio_nbytes,
+                    fps=audio_fps,
+                )
+            )
         for t, frame in clip.iter_frames(
-            logger=logger, with_times=True, fps=fps, dtype="uint8"
+            logger=logger,
+            with_times=True,
+            fps=fps,
+            dtype="uint8",
+            workers=frame_threads,
+            processes=frame_processes,
         ):
             if with_mask:
-                mask = 255 * clip.mask.get_frame(t)
-                if mask.dtype != "uint8":
-                    mask = mask.astype("uint8")
-                frame = np.dstack([frame, mask])
+                frame = add_mask_to_frame(frame, clip.mask.get_frame(t))
+            elif queue_size:
+                frame = keepable_frame(frame)
 
             writer.write_frame(frame)
 
@@ -267,6 +555,554 @@ def ffmpeg_write_video(
     logger(message="filmpy - Done !")
 
 
+def keepable_frame(frame):
+    """Returns the frame, or a copy of it if it may be overwritten by the
+    reader which decoded it (see ``ffmpeg_reader.is_borrowed_frame``).
+    """
+    if is_borrowed_frame(frame):
+        return frame.copy()
+    return frame
+
+
+@profiled("convert")
+def add_mask_to_frame(frame, mask):
+    """Returns the RGBA frame made of an RGB frame and a mask frame."""
+    mask = 255 * mask
+    if mask.dtype != "uint8":
+        mask = mask.astype("uint8")
+    return np.dstack([frame, mask])
+
+
+# clip rendered by the processes started by ffmpeg_write_video_segments
+_segments_clip = None
+
+
+def _write_video_segment(task):
+    """Writes a segment of ``_segments_clip`` (see ``write_video_frames``).
+    Run in the processes started by ``ffmpeg_write_video_segments``.
+    """
+    return write_video_frames(_segments_clip, *task)
+
+
+def _load_segments_clip(data):
+    """Loads the clip pickled by ``segments_pool`` in a process of its pool."""
+    global _segments_clip
+    _segments_clip = pickle.loads(data)
+
+
+def segments_pool(clip, processes):
+    """Returns a pool of ``processes`` processes rendering the segments of
+    ``clip`` with ``_write_video_segment``, or ``None`` if the clip can't be
+    sent to other processes.
+
+    The processes are forked with the clip in memory when the platform
+    supports it. Otherwise the clip is pickled (see ``tools.pickle_dumps``)
+    and loaded by each process when it starts.
+
+    The video readers are closed before forking (see ``close_readers``), so
+    that their prefetching threads are stopped. Other threads still running
+    in the process, like the queue threads of the writers of other renders
+    (see ``FFMPEG_VideoWriter``), are not copied by the fork while the locks
+    they hold are: the forked processes must not use these writers.
+    """
+    global _segments_clip
+    if "fork" in multiprocessing.get_all_start_methods():
+        _segments_clip = clip
+        close_readers()
+        return multiprocessing.get_context("fork").Pool(processes)
+    try:
+        data = pickle_dumps(clip)
+    except pickle.PicklingError as error:
+        warn_outside_filmpy(
+            "Rendering with several workers requires the 'fork' start method "
+            "of processes, which is not available on this platform, or a clip "
+            f"that can be pickled ({error}). The video is rendered in a "
+            "single process."
+        )
+        return None
+    return multiprocessing.Pool(
+        processes, initializer=_load_segments_clip, initargs=(data,)
+    )
+
+
+def write_video_frames(
+    clip, filename, start, end, fps, with_mask, log_filename, params
+):
+    """Writes the frames ``start`` to ``end`` (excluded) of the clip to a video
+    file, with the ``FFMPEG_VideoWriter`` parameters ``params``, and returns the
+    name of the file.
+    """
+    with (
+        open(log_filename, "w+") if log_filename else contextlib.nullcontext()
+    ) as logfile, FFMPEG_VideoWriter(
+        filename, clip.size, fps, logfile=logfile, **params
+    ) as writer:
+        for frame_index in range(start, end):
+            t = frame_index / fps
+            frame = clip.get_frame(t)
+            if frame.dtype != "uint8":
+                frame = frame.astype("uint8")
+            if with_mask:
+                frame = add_mask_to_frame(frame, clip.mask.get_frame(t))
+            elif params.get("queue_size"):
+                frame = keepable_frame(frame)
+            writer.write_frame(frame)
+    return filename
+
+
+def ffmpeg_write_video_segments(
+    clip,
+    filename,
+    fps,
+    workers,
+    codec="libx264",
+    bitrate=None,
+    preset="medium",
+    with_mask=False,
+    write_logfile=False,
+    audiofile=None,
+    threads=None,
+    ffmpeg_params=None,
+    logger="bar",
+    pixel_format=None,
+    queue_size=0,
+    segment_duration=None,
+    checkpoint_dir=None,
+):
+    """Writes the clip to a videofile by rendering ``workers`` consecutive
+    segments of the clip in parallel, each one in a process (see
+    ``segments_pool``) encoding it to its own file, then joining the segments
+    with the ffmpeg concat demuxer, without encoding them again. With 1
+    worker, or if the clip can't be sent to other processes, the segments are
+    rendered one after the other in the current process.
+
+    Each segment starts with a keyframe. If ``ffmpeg_params`` sets the GOP
+    size (``-g``), the segments are made of whole GOPs, so that the keyframes
+    are where they would be in a video rendered at once.
+
+    If ``segment_duration`` is set, the clip is cut into segments of about
+    this duration (in seconds) instead of ``workers`` segments.
+
+    If ``checkpoint_dir`` is set, the segments are written in this directory,
+    along with a ``manifest.json`` file listing the segments already written,
+    so that an interrupted render is resumed from the segments still missing
+    by writing the same clip with the same parameters again. The directory is
+    removed once the video is written.
+
+    See VideoClip.write_videofile for details on the other parameters.
+    """
+    global _segments_clip
+    logger = proglog.default_bar_logger(logger)
+
+    n_frames = int(clip.duration * fps)
+    gop_size = 1
+    if ffmpeg_params is not None and "-g" in ffmpeg_params[:-1]:
+        gop_size = max(1, int(ffmpeg_params[ffmpeg_params.index("-g") + 1]))
+    n_gops = -(-n_frames // gop_size)
+    if segment_duration is None:
+        n_segments = max(1, min(workers, n_gops))
+        bounds = [
+            min(n_frames, gop_size * (n_gops * i // n_segments))
+            for i in range(n_segments + 1)
+        ]
+    else:
+        segment_gops = max(1, round(segment_duration * fps / gop_size))
+        bounds = [gop_size * gop for gop in range(0, max(1, n_gops), segment_gops)] + [
+            n_frames
+        ]
+        n_segments = len(bounds) - 1
+
+    logger(message=f"filmpy - Writing video {filename} in {n_segments} segments\n")
+    if checkpoint_dir is None:
+        segments_dir = tempfile.TemporaryDirectory(
+            dir=os.path.dirname(os.path.abspath(filename))
+        )
+    else:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        segments_dir = contextlib.nullcontext(checkpoint_dir)
+    with segments_dir as temp_dir:
+        params = dict(
+            codec=codec,
+            preset=preset,
+            bitrate=bitrate,
+            threads=threads,
+            ffmpeg_params=ffmpeg_params,
+            pixel_format=pixel_format,
+            queue_size=queue_size,
+        )
+        manifest_filename = os.path.join(temp_dir, "manifest.json")
+        signature = dict(
+            size=list(clip.size),
+            fps=fps,
+            bounds=bounds,
+            with_mask=with_mask,
+            codec=codec,
+            preset=preset,
+            bitrate=bitrate,
+            pixel_format=pixel_format,
+            ffmpeg_params=ffmpeg_params and list(ffmpeg_params),
+        )
+        written = set()
+        if checkpoint_dir is not None:
+            written = read_render_manifest(manifest_filename, signature)
+            if written:
+                logger(
+                    message=f"filmpy - Resuming the render of {filename}: "
+                    f"{len(written)} of {n_segments} segments already written\n"
+                )
+
+        segment_filenames = []
+        tasks = []
+        for i, (start, end) in enumerate(zip(bounds, bounds[1:])):
+            # Matroska takes any codec, and its timestamps are kept exactly
+            # by the concat demuxer, unlike those of MP4 files
+            segment_filename = os.path.join(temp_dir, f"segment{i:04d}.mkv")
+            segment_filenames.append(segment_filename)
+            if i in written:
+                continue
+            log_filename = f"{filename}.segment{i:04d}.log" if write_logfile else None
+            tasks.append(
+                (segment_filename, start, end, fps, with_mask, log_filename, params)
+            )
+
+        logger(segment__total=n_segments, segment__index=len(written))
+        pool = None
+        if workers > 1 and len(tasks) > 1:
+            pool = segments_pool(clip, min(workers, len(tasks)))
+        if pool is not None:
+            try:
+                with pool:
+                    for segment_filename in pool.imap_unordered(
+                        _write_video_segment, tasks
+                    ):
+                        written.add(segment_filenames.index(segment_filename))
+                        if checkpoint_dir is not None:
+                            write_render_manifest(manifest_filename, signature, written)
+                        logger(segment__index=len(written))
+            finally:
+                _segments_clip = None
+        else:
+            for task in tasks:
+                segment_filename = write_video_frames(clip, *task)
+                written.add(segment_filenames.index(segment_filename))
+                if checkpoint_dir is not None:
+                    write_render_manifest(manifest_filename, signature, written)
+                logger(segment__index=len(written))
+
+        logger(message=f"filmpy - Joining the segments of {filename}\n")
+        concat_filename = os.path.join(temp_dir, "segments.txt")
+        with open(concat_filename, "w") as f:
+            for segment_filename in segment_filenames:
+                escaped_filename = segment_filename.replace("'", "'\\''")
+                f.write(f"file '{escaped_filename}'\n")
+        ffmpeg_concat_video_segments(
+            concat_filename, filename, fps, audiofile=audiofile
+        )
+
+    if checkpoint_dir is not None:
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    logger(message="filmpy - Done !")
+
+
+def read_render_manifest(manifest_filename, signature):
+    """Returns the set of the indices of the segments already written by an
+    interrupted render, according to its manifest file, or an empty set if
+    there is no manifest or if it was written for another ``signature`` (a
+    different clip size, fps, codec...).
+    """
+    try:
+        with open(manifest_filename) as f:
+            manifest = json.load(f)
+        if manifest["signature"] == signature:
+            return set(manifest["written"])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass  # missing, corrupted or outdated, so render everything again
+    return set()
+
+
+def write_render_manifest(manifest_filename, signature, written):
+    """Writes the manifest file listing the segments already written, replacing
+    the previous one at once so that an interruption never leaves it partial.
+    """
+    temp_filename = manifest_filename + ".tmp"
+    with open(temp_filename, "w") as f:
+        json.dump({"signature": signature, "written": sorted(written)}, f)
+    os.replace(temp_filename, manifest_filename)
+
+
+def stream_copy_parts(segments, size, fps, codec):
+    """Splits the ``(filename, start_time, end_time)`` source segments of a
+    clip into parts whose encoded frames are copied from the files, made of
+    whole groups of pictures, and parts around them whose frames are encoded
+    again. Returns ``None`` if the frames of the files cannot be copied to a
+    video of size ``size`` encoded at ``fps`` with ``codec``.
+
+    The parts are ``("copy", filename, keyframe_time, n_frames)`` tuples for
+    the frames copied, and ``("encode", start, end)`` tuples for the frames
+    ``start`` to ``end`` (excluded) of the clip encoded again.
+    """
+    parts = []
+    clip_index = 0
+    for filename, start_time, end_time in segments:
+        infos = ffmpeg_parse_infos(filename)
+        first, last = start_time * fps, end_time * fps
+        if (
+            CODEC_ENCODERS.get(infos.get("video_codec")) != codec
+            or list(infos["video_size"]) != list(size)
+            or abs(infos["video_fps"] - fps) > 1e-3
+            or abs(first - round(first)) > 1e-3
+            or abs(last - round(last)) > 1e-3
+        ):
+            return None
+        first, last = round(first), round(last)
+
+        # no sidecar file written next to the media of the user
+        keyframe_times = ffmpeg_keyframe_times(
+            filename, start=infos.get("start") or 0, sidecar=False
+        )
+        keyframes = {round(t * fps): t for t in keyframe_times or []}
+        inner_keyframes = [n for n in keyframes if first <= n <= last]
+        if len(inner_keyframes) < 2:
+            parts.append(("encode", clip_index, clip_index + last - first))
+        else:
+            copy_first, copy_last = min(inner_keyframes), max(inner_keyframes)
+            if copy_first > first:
+                parts.append(("encode", clip_index, clip_index + copy_first - first))
+            parts.append(
+                ("copy", filename, keyframes[copy_first], copy_last - copy_first)
+            )
+            if last > copy_last:
+                parts.append(
+                    (
+                        "encode",
+                        clip_index + copy_last - first,
+                        clip_index + last - first,
+                    )
+                )
+        clip_index += last - first
+    return parts
+
+
+def copy_seek_time(keyframe_time, fps):
+    """Returns the time to seek to copy the frames of a file from the keyframe
+    at ``keyframe_time``, a quarter of frame after it, so that the keyframe
+    time being rounded doesn't make ffmpeg start from the previous keyframe.
+    """
+    return keyframe_time + 0.25 / fps
+
+
+def ffmpeg_write_video_stream_copy(
+    clip,
+    segments,
+    filename,
+    fps,
+    codec="libx264",
+    bitrate=None,
+    preset="medium",
+    write_logfile=False,
+    audiofile=None,
+    threads=None,
+    ffmpeg_params=None,
+    logger="bar",
+    pixel_format=None,
+):
+    """Writes a clip whose frames are the unmodified frames of the source
+    segments ``segments`` (see ``VideoClip.source_segments``) by copying the
+    encoded groups of pictures of the files which lie entirely in the segments,
+    and encoding again only the frames before and after them.
+
+    Returns ``False``, without writing the file, if the frames cannot be copied
+    (different codec, size or frame rate, or cuts not on frames), or if the
+    copied and encoded parts cannot be joined into a valid stream. The clip
+    must then be encoded entirely.
+    """
+    logger = proglog.default_bar_logger(logger)
+
+    parts = stream_copy_parts(segments, clip.size, fps, codec)
+    if parts is None or not any(part[0] == "copy" for part in parts):
+        return False
+    n_frames = int(clip.duration * fps)
+    if n_frames != sum(
+        part[3] if part[0] == "copy" else part[2] - part[1] for part in parts
+    ):
+        return False
+
+    # the copies must start at the keyframes, not at the ones before them
+    for part in parts:
+        if part[0] == "copy":
+            _, source, keyframe_time, _ = part
+            copied_times = ffmpeg_frame_times(
+                source,
+                start=ffmpeg_parse_infos(source).get("start") or 0,
+                seek_time=copy_seek_time(keyframe_time, fps),
+                n_frames=1,
+            )
+            if copied_times is None or abs(copied_times[0] - keyframe_time) > (
+                0.5 / fps
+            ):
+                return False
+
+    logger(message=f"filmpy - Writing video {filename} with stream copy\n")
+    params = dict(
+        codec=codec,
+        preset=preset,
+        bitrate=bitrate,
+        threads=threads,
+        ffmpeg_params=ffmpeg_params,
+        pixel_format=pixel_format,
+    )
+    with tempfile.TemporaryDirectory(
+        dir=os.path.dirname(os.path.abspath(filename))
+    ) as temp_dir:
+        concat_filename = os.path.join(temp_dir, "parts.txt")
+        with open(concat_filename, "w") as f:
+            for i, part in enumerate(logger.iter_bar(part=parts)):
+                part_filename = os.path.join(temp_dir, f"part{i:04d}.mkv")
+                if part[0] == "copy":
+                    _, source, keyframe_time, part_frames = part
+                    cmd = [
+                        FFMPEG_BINARY,
+                        "-y",
+                        "-loglevel",
+                        "error",
+                        "-ss",
+                        f"{copy_seek_time(keyframe_time, fps):.6f}",
+                        "-i",
+                        source,
+                        "-map",
+                        "0:v:0",
+                        "-frames:v",
+                        str(part_frames),
+                        "-c",
+                        "copy",
+                        part_filename,
+                    ]
+                    subprocess_call(cmd, logger=None)
+                else:
+                    _, start, end = part
+                    log_filename = (
+                        f"{filename}.part{i:04d}.log" if write_logfile else None
+                    )
+                    write_video_frames(
+                        clip,
+                        part_filename,
+                        start,
+                        end,
+                        fps,
+                        False,
+                        log_filename,
+                        params,
+                    )
+                escaped_filename = part_filename.replace("'", "'\\''")
+                f.write(f"file '{escaped_filename}'\n")
+        ffmpeg_concat_video_segments(
+            concat_filename, filename, fps, audiofile=audiofile
+        )
+
+    # the parts cannot be joined if their frames are reordered differently
+    times = ffmpeg_frame_times(filename)
+    if (
+        times is None
+        or len(times) != n_frames
+        or any(abs(t - index / fps) > 0.5 / fps for index, t in enumerate(times))
+    ):
+        os.remove(filename)
+        logger(message="filmpy - Stream copy failed, encoding the whole video\n")
+        return False
+
+    logger(message="filmpy - Done !")
+    return True
+
+
+def ffmpeg_concat_video_segments(concat_filename, filename, fps, audiofile=None):
+    """Joins the video files listed in ``concat_filename`` (in the format of
+    the ffmpeg concat demuxer) into ``filename`` without encoding them again,
+    adding the audio of ``audiofile`` if provided.
+    """
+    cmd = [
+        FFMPEG_BINARY,
+        "-y",
+        "-loglevel",
+        "error",
+        "-f",
+        "concat",
+        "-safe",
+        "0",
+        "-i",
+        concat_filename,
+    ]
+    if audiofile is not None:
+        cmd.extend(["-i", audiofile, "-map", "0:v", "-map", "1:a"])
+    cmd.extend(["-c", "copy", "-r", f"{fps:.2f}", filename])
+    subprocess_call(cmd, logger=None)
+
+
+def ffmpeg_write_images_sequence(
+    clip,
+    name_format,
+    fps,
+    with_mask=True,
+    logger="bar",
+    frame_threads=None,
+    ffmpeg_params=None,
+):
+    """Writes the frames of the clip to the image files ``name_format % i``
+    with a single ffmpeg process, whose image2 muxer encodes the frames piped
+    to it one after the other, and returns the list of the files written.
+
+    ``name_format`` must number the frames with ``%d`` (or e.g. ``%04d``),
+    and have one of the extensions of ``IMAGE_ENCODERS``. The mask of the
+    clip is only written as an alpha channel in PNG and TIFF files.
+    ``ffmpeg_params`` are passed to ffmpeg after the default parameters of the
+    encoder (e.g. ``["-qscale:v", "5"]`` for a lower JPEG quality). See
+    VideoClip.write_images_sequence for details on the other parameters.
+    """
+    logger = proglog.default_bar_logger(logger)
+    ext = os.path.splitext(name_format)[1][1:].lower()
+    if ext not in IMAGE_ENCODERS:
+        raise ValueError(
+            f"filmpy error: ffmpeg can't write the images {name_format}, "
+            f"the extension must be one of {', '.join(IMAGE_ENCODERS)}."
+        )
+    if len(re.findall(r"%0?\d*d", name_format)) != 1:
+        raise ValueError(
+            f"filmpy error: the images {name_format} must be numbered with "
+            "a single '%d' or '%0Nd' pattern to be written by ffmpeg."
+        )
+    codec, keeps_alpha, codec_params = IMAGE_ENCODERS[ext]
+    with_mask = with_mask and keeps_alpha and clip.mask is not None
+
+    timings = np.arange(0, clip.duration, 1.0 / fps)
+
+    def frame_at(t):
+        frame = clip.get_frame(t)
+        if frame.dtype != "uint8":
+            with profile_stage("convert"):
+                frame = frame.astype("uint8")
+        if with_mask:
+            frame = add_mask_to_frame(frame, clip.mask.get_frame(t))
+        return frame
+
+    frames = (
+        thread_map(frame_at, timings, frame_threads)
+        if frame_threads is not None and frame_threads > 1
+        else map(frame_at, timings)
+    )
+
+    with FFMPEG_VideoWriter(
+        name_format,
+        clip.size,
+        fps,
+        codec=codec,
+        ffmpeg_params=["-start_number", "0"] + codec_params + (ffmpeg_params or []),
+        pixel_format="rgba" if with_mask else "rgb24",
+    ) as writer:
+        for _, frame in zip(logger.iter_bar(t=timings), frames):
+            writer.write_frame(frame)
+
+    return [name_format % i for i in range(len(timings))]
+
+
 def ffmpeg_write_image(filename, image, logfile=False, pixel_format=None):
     """Writes an image (HxWx3 or HxWx4 numpy array) to a file, using ffmpeg.
 
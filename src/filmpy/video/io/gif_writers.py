@@ -8,7 +8,7 @@ import proglog
 
 from filmpy.config import FFMPEG_BINARY, IMAGEMAGICK_BINARY
 from filmpy.decorators import requires_duration, use_clip_fps_by_default
-from filmpy.tools import cross_platform_popen_params, subprocess_call
+from filmpy.tools import cross_platform_popen_params, subprocess_call, thread_map
 from filmpy.video.fx.loop import loop as loop_fx
 
 try:
@@ -33,6 +33,7 @@ def write_gif_with_tempfiles(
     colors=None,
     pixel_format=None,
     logger="bar",
+    frame_threads=None,
 ):
     """Write the VideoClip to a GIF file.
 
@@ -89,6 +90,10 @@ def write_gif_with_tempfiles(
 
     logger : str, optional
       Either ``"bar"`` for progress bar or ``None`` or any Proglog logger.
+
+    frame_threads : int, optional
+      Number of threads computing the frames in parallel (see the ``workers``
+      of ``Clip.iter_frames``).
     """
     logger = proglog.default_bar_logger(logger)
     file_root, _ext = os.path.splitext(filename)
@@ -99,10 +104,20 @@ def write_gif_with_tempfiles(
     logger(message=f"filmpy - Building file {filename}\n")
     logger(message="filmpy - - Generating GIF frames")
 
-    for i, t in logger.iter_bar(t=list(enumerate(tt))):
+    def save_frame(index_and_time):
+        i, t = index_and_time
         name = "%s_GIFTEMP%04d.png" % (file_root, i + 1)
-        tempfiles.append(name)
         clip.save_frame(name, t, with_mask=True)
+        return name
+
+    indices_and_times = list(enumerate(tt))
+    names = (
+        thread_map(save_frame, indices_and_times, frame_threads)
+        if frame_threads is not None and frame_threads > 1
+        else map(save_frame, indices_and_times)
+    )
+    for _, name in zip(logger.iter_bar(t=indices_and_times), names):
+        tempfiles.append(name)
 
     delay = int(100.0 / fps)
 
@@ -199,6 +214,7 @@ def write_gif(
     colors=None,
     pixel_format=None,
     logger="bar",
+    frame_threads=None,
 ):
     """Write the VideoClip to a GIF file, without temporary files.
 
@@ -258,6 +274,10 @@ def write_gif(
     logger : str, optional
       Either ``"bar"`` for progress bar or ``None`` or any Proglog logger.
 
+    frame_threads : int, optional
+      Number of threads computing the frames in parallel (see the ``workers``
+      of ``Clip.iter_frames``).
+
 
     Examples
     --------
@@ -385,7 +405,11 @@ def write_gif(
     logger(message="filmpy - - Generating GIF frames.")
     try:
         for t, frame in clip.iter_frames(
-            fps=fps, logger=logger, with_times=True, dtype="uint8"
+            fps=fps,
+            logger=logger,
+            with_times=True,
+            dtype="uint8",
+            workers=frame_threads,
         ):
             if with_mask:
                 mask = 255 * clip.mask.get_frame(t)
@@ -419,7 +443,14 @@ def write_gif(
 
 
 def write_gif_with_image_io(
-    clip, filename, fps=None, opt=0, loop=0, colors=None, logger="bar"
+    clip,
+    filename,
+    fps=None,
+    opt=0,
+    loop=0,
+    colors=None,
+    logger="bar",
+    frame_threads=None,
 ):
     """Writes the gif with the Python library ImageIO (calls FreeImage)."""
     if colors is None:
@@ -442,5 +473,7 @@ def write_gif_with_image_io(
     )
     logger(message=f"filmpy - Building file {filename} with imageio.")
 
-    for frame in clip.iter_frames(fps=fps, logger=logger, dtype="uint8"):
+    for frame in clip.iter_frames(
+        fps=fps, logger=logger, dtype="uint8", workers=frame_threads
+    ):
         writer.append_data(frame)
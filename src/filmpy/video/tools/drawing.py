@@ -20,6 +20,46 @@ def blit(im1, im2, pos=None, mask=None):
     return im2
 
 
+def blit_array(im1, im2, pos=None, mask=None):
+    """Blit an image array over another, in place.
+
+    Blits the ``uint8`` array ``im1`` on the ``uint8`` array ``im2`` at
+    position ``pos=(x,y)``, using the ``uint8`` array ``mask`` (of the height
+    and width of ``im1``, 255 being opaque) if provided, and returns ``im2``.
+    Only the region of ``im2`` covered by ``im1`` is modified. The pixels are
+    blended with integer operations giving the same values as ``blit`` with
+    PIL images, without converting the arrays.
+    """
+    x, y = (0, 0) if pos is None else tuple(pos)
+    h1, w1 = im1.shape[:2]
+    h2, w2 = im2.shape[:2]
+
+    # region of im2 covered by im1
+    x1, y1 = max(0, -x), max(0, -y)
+    x2, y2 = max(0, x), max(0, y)
+    width, height = min(w1 - x1, w2 - x2), min(h1 - y1, h2 - y2)
+    if width <= 0 or height <= 0:
+        return im2
+    src = im1[y1 : y1 + height, x1 : x1 + width]
+    dst = im2[y2 : y2 + height, x2 : x2 + width]
+
+    if mask is None:
+        dst[...] = src
+        return im2
+
+    alpha = mask[y1 : y1 + height, x1 : x1 + width].astype("uint16")
+    if dst.ndim == 3:
+        alpha = alpha[:, :, None]
+    # (src * alpha + dst * (255 - alpha)) / 255, rounded, in 16 bits integers
+    blended = src * alpha
+    blended += dst * (255 - alpha)
+    blended += 128
+    blended += blended >> 8
+    blended >>= 8
+    dst[...] = blended
+    return im2
+
+
 def color_gradient(
     size,
     p1,
@@ -1,12 +1,16 @@
 """Clip tests."""
 
 import copy
+import os
+import threading
+import time
 
 import numpy as np
 import pytest
 
-from filmpy.Clip import Clip
-from filmpy.video.VideoClip import BitmapClip, ColorClip
+from filmpy.Clip import Clip, ClipIndex, TimeIndex
+from filmpy.decorators import sequential_access
+from filmpy.video.VideoClip import BitmapClip, ColorClip, VideoClip
 
 
 def test_clip_equality():
@@ -237,6 +241,50 @@ def test_clip_cutout(start_time, end_time, expected_frames):
     assert new_clip == BitmapClip(expected_frames, fps=1)
 
 
+def test_clip_index():
+    rng = np.random.default_rng(0)
+    clips = []
+    for start, duration in zip(rng.uniform(0, 50, 300), rng.uniform(0, 3, 300)):
+        clips.append(ColorClip((2, 2), duration=duration).with_start(start))
+    clips += [
+        ColorClip((2, 2)).with_start(10),  # no end
+        ColorClip((2, 2), duration=0).with_start(20),
+        ColorClip((2, 2), duration=2).with_start(30),
+        ColorClip((2, 2), duration=2).with_start(32),
+    ]
+    index = ClipIndex(clips)
+
+    times = list(rng.uniform(-1, 55, 200)) + [0, 10, 20, 30, 31.5, 32, 34]
+    for t in sorted(times) + times:
+        expected = tuple(i for i, clip in enumerate(clips) if clip.is_playing(t))
+        assert index.playing(t) == expected
+    # the last lookup is reused between the same start and end times
+    index = ClipIndex(clips[-2:])
+    assert index.playing(32.5) is index.playing(33.9) == (1,)
+    assert index.playing(31) == (0,)
+
+    index = ClipIndex(clips)
+    for t_min in rng.uniform(-1, 55, 50):
+        t = np.linspace(t_min, t_min + 0.1, 10)
+        expected = tuple(
+            i for i, clip in enumerate(clips) if clip.is_playing(t) is not False
+        )
+        assert index.playing(t) == expected
+    assert ClipIndex([]).playing(1) == ()
+
+
+def test_time_index():
+    starts = [0, 1, 1, 2.5, 4]
+    index = TimeIndex(starts)
+    times = [0, 0.5, 1, 2, 2.5, 3, 4, 10, 3, 0.2, 1.5]
+    for t in times:
+        assert index.index(t) == max(i for i, start in enumerate(starts) if start <= t)
+    expected = [-1, 0, 0, 2, 2, 3, 3, 4, 4, 3, 0, 2]
+    assert list(index.indices(np.array([-1, *times]))) == expected
+    with pytest.raises(ValueError, match="before"):
+        index.index(-0.5)
+
+
 def test_clip_memoize():
     clip = BitmapClip([["RR", "RR"], ["GG", "GG"], ["BB", "BB"]], fps=1)
 
@@ -254,5 +302,68 @@ def test_clip_memoize():
     assert isinstance(memoize_clip.get_frame(1), np.ndarray)
 
 
+def test_clip_iter_frames_processes():
+    pytest.importorskip("cloudpickle")
+    parent = os.getpid()
+    pids = np.zeros((2, 2, 1))
+
+    def make_frame(t):
+        # records the process which computed the frame
+        return np.dstack([np.full((2, 2), int(t * 10)), pids + os.getpid()])
+
+    clip = VideoClip(make_frame, duration=2).with_fps(10)
+    frames = list(clip.iter_frames(processes=3, dtype="uint32"))
+    assert [frame[0, 0, 0] for frame in frames] == list(range(20))
+    assert all(frame.dtype == "uint32" for frame in frames)
+    assert parent not in {frame[0, 0, 1] for frame in frames}
+
+    unordered = clip.iter_frames(processes=3, ordered=False, with_times=True)
+    assert sorted(t for t, frame in unordered) == [i / 10 for i in range(20)]
+
+
+def test_clip_iter_frames_workers():
+    running = []
+    overlaps = []
+
+    @sequential_access
+    def read_frame(t):
+        running.append(t)
+        overlaps.append(len(running) > 1)
+        time.sleep(0.001)
+        running.remove(t)
+        return np.full((2, 2, 3), int(t * 10), dtype="uint8")
+
+    source = VideoClip(read_frame, duration=2).with_fps(10)
+    threads = set()
+
+    def transform(frame):
+        threads.add(threading.get_ident())
+        time.sleep(0.005)  # like NumPy or PIL code releasing the GIL
+        return 2 * frame
+
+    clip = source.image_transform(transform)
+    expected_frames = list(clip.iter_frames())
+
+    overlaps.clear()
+    threads.clear()
+    frames = list(clip.iter_frames(workers=4))
+    assert len(threads) > 1
+    # the frames are read by one thread at once
+    assert not any(overlaps)
+    assert all(np.array_equal(f1, f2) for f1, f2 in zip(frames, expected_frames))
+    assert len(frames) == len(expected_frames) == 20
+
+    unordered = sorted(clip.iter_frames(workers=4, ordered=False, with_times=True))
+    assert [t for t, frame in unordered] == [i / 10 for i in range(20)]
+
+    def failing_transform(frame):
+        if frame[0, 0, 0] == 12:
+            raise ValueError("frame 12")
+        return frame
+
+    with pytest.raises(ValueError, match="frame 12"):
+        list(source.image_transform(failing_transform).iter_frames(workers=4))
+
+
 if __name__ == "__main__":
     pytest.main()
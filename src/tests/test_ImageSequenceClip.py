@@ -2,6 +2,7 @@
 
 import os
 
+import numpy as np
 import pytest
 
 from filmpy.video.io.ImageSequenceClip import ImageSequenceClip
@@ -24,6 +25,21 @@ def test_1(util):
         )
 
 
+def test_get_frames():
+    images = ["media/python_logo.png", "media/python_logo_upside_down.png"]
+    with ImageSequenceClip(images, durations=[1, 2]) as clip:
+        tt = [2.5, 0, 1, 0.5, 2.99]
+        frames = clip.get_frames(tt)
+        for t, frame in zip(tt, frames):
+            assert np.array_equal(frame, clip.get_frame(t))
+        assert np.array_equal(clip.subclip(1).get_frames([0, 2]), frames[[2, 0]])
+
+    with ImageSequenceClip(images, fps=2) as clip:
+        frames = clip.get_frames([0.9, 0.1, 0.5])
+        assert np.array_equal(frames[1], clip.get_frame(0))
+        assert np.array_equal(frames[0], clip.get_frame(0.5))
+
+
 def test_2():
     images = []
     durations = []
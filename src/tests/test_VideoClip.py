@@ -12,6 +12,7 @@ from filmpy.audio.AudioClip import AudioClip
 from filmpy.audio.io.AudioFileClip import AudioFileClip
 from filmpy.tools import convert_to_seconds
 from filmpy.video.compositing.CompositeVideoClip import CompositeVideoClip
+from filmpy.video.compositing.concatenate import concatenate_videoclips
 from filmpy.video.fx.mask_color import mask_color
 from filmpy.video.fx.multiply_speed import multiply_speed
 from filmpy.video.io.VideoFileClip import VideoFileClip
@@ -64,12 +65,13 @@ def test_check_codec(util, video):
         )
 
 
-def test_write_frame_errors(util, video):
+@pytest.mark.parametrize("queue_size", (0, 4), ids=("queue_size=0", "queue_size=4"))
+def test_write_frame_errors(util, video, queue_size):
     """Checks error cases return helpful messages."""
     clip = video()
     location = os.path.join(util.TMP_DIR, "unlogged-write.mp4")
     with pytest.raises(IOError) as e:
-        clip.write_videofile(location, codec="nonexistent-codec")
+        clip.write_videofile(location, codec="nonexistent-codec", queue_size=queue_size)
     assert (
         "The video export failed because FFMPEG didn't find the specified"
         " codec for video encoding nonexistent-codec" in str(e.value)
@@ -112,6 +114,26 @@ def test_write_videofiles_with_temp_audiofile_path(util):
     assert any(file.startswith("temp_audiofile_path") for file in contents_of_temp_dir)
 
 
+@pytest.mark.skipif(os.name == "nt", reason="audio pipes require POSIX")
+def test_write_videofile_audio_pipe(util):
+    clip = VideoFileClip("media/big_buck_bunny_432_433.webm").subclip(0.2, 0.5)
+    location = os.path.join(util.TMP_DIR, "audio_pipe.webm")
+    temp_location = os.path.join(util.TMP_DIR, "audio_pipe_temp")
+    if not os.path.exists(temp_location):
+        os.mkdir(temp_location)
+    clip.write_videofile(
+        location, audio_pipe=True, temp_audiofile_path=temp_location, logger=None
+    )
+    # no temporary audio file written
+    assert os.listdir(temp_location) == []
+
+    final_clip = VideoFileClip(location)
+    assert final_clip.audio is not None
+    assert abs(final_clip.audio.duration - clip.duration) < 0.05
+    final_clip.close()
+    clip.close()
+
+
 @pytest.mark.parametrize("mask_color", (0, 0.5, 0.8, 1))
 @pytest.mark.parametrize(
     "with_mask",
@@ -179,6 +201,59 @@ def test_write_image_sequence(util, video):
         assert os.path.isfile(location)
 
 
+def test_write_image_sequence_frame_threads(util):
+    clip = VideoClip(
+        lambda t: np.full((4, 6, 3), int(t * 100), dtype="uint8"), duration=0.5
+    ).with_fps(10)
+    locations = clip.write_images_sequence(
+        os.path.join(util.TMP_DIR, "threads_frame%02d.png"),
+        logger=None,
+        frame_threads=3,
+    )
+    assert len(locations) == 5
+    for i, location in enumerate(locations):
+        assert location.endswith(f"threads_frame{i:02d}.png")
+        assert np.array_equal(np.array(Image.open(location)), clip.get_frame(i / 10))
+
+
+def test_write_image_sequence_ffmpeg(util):
+    clip = VideoClip(
+        lambda t: np.full((4, 6, 3), int(t * 100), dtype="uint8"), duration=0.5
+    ).with_fps(10)
+    clip.mask = VideoClip(
+        lambda t: np.full((4, 6), 0.5), is_mask=True, duration=0.5
+    ).with_fps(10)
+
+    locations = clip.write_images_sequence(
+        os.path.join(util.TMP_DIR, "ffmpeg_frame%02d.png"),
+        logger=None,
+        program="ffmpeg",
+    )
+    assert locations == [
+        os.path.join(util.TMP_DIR, f"ffmpeg_frame{i:02d}.png") for i in range(5)
+    ]
+    for i, location in enumerate(locations):
+        image = np.array(Image.open(location))
+        assert np.array_equal(image[:, :, :3], clip.get_frame(i / 10))
+        assert (image[:, :, 3] == 127).all()
+
+    locations = clip.write_images_sequence(
+        os.path.join(util.TMP_DIR, "ffmpeg_frame%d.jpg"),
+        logger=None,
+        program="ffmpeg",
+        frame_threads=2,
+    )
+    for i, location in enumerate(locations):
+        image = np.array(Image.open(location))
+        assert image.shape == (4, 6, 3)
+        assert abs(image.astype(int) - clip.get_frame(i / 10)).max() < 3
+
+    with pytest.raises(ValueError, match="extension"):
+        clip.write_images_sequence("frame%02d.gif", logger=None, program="ffmpeg")
+    with pytest.raises(ValueError, match="numbered"):
+        clip.write_images_sequence("frame.png", logger=None, program="ffmpeg")
+
+
 def test_write_gif_imageio(util, video):
     clip = video(start_time=0.2, end_time=0.8)
     location = os.path.join(util.TMP_DIR, "imageio_gif.gif")
@@ -303,6 +378,20 @@ def test_setopacity(util, video):
     assert os.path.isfile(location)
 
 
+def test_get_frames():
+    clip = VideoFileClip("media/big_buck_bunny_0_30.webm").subclip(10, 20)
+    tt = [5, 1, "00:00:05", 9.5, 1 + 1 / 24, 0]
+    frames = clip.get_frames(tt)
+    assert frames.shape == (6, 720, 1280, 3)
+    for t, frame in zip(tt, frames):
+        assert np.array_equal(frame, clip.get_frame(t))
+    assert clip.get_frames([]).shape == (0,)
+    clip.close()
+
+    mask_clip = ColorClip((3, 2), color=0.5, is_mask=True, duration=1)
+    assert mask_clip.get_frames([0.5, 0]).shape == (2, 2, 3)
+
+
 def test_with_layer():
     bottom_clip = BitmapClip([["ABC"], ["BCA"], ["CAB"]], fps=1).with_layer(1)
     top_clip = BitmapClip([["DEF"], ["EFD"]], fps=1).with_layer(2)
@@ -385,6 +474,34 @@ def test_copied_videoclip_write_videofile(util):
     assert copied_clip.duration == copied_clip_from_file.duration
 
 
+def test_source_segments():
+    filename = "media/big_buck_bunny_0_30.webm"
+    clip = VideoFileClip(filename)
+    assert clip.source_segments() == [(filename, 0, 30)]
+
+    subclip = clip.subclip(2, 5).subclip(1, -1)
+    assert subclip.source_segments() == [(filename, 3, 4)]
+    assert clip.subclip(-3).source_segments() == [(filename, 27, 30)]
+    assert subclip.with_duration(0.5).source_segments() == [(filename, 3, 3.5)]
+
+    concatenation = concatenate_videoclips([clip.subclip(1, 2), clip.subclip(5, 7)])
+    assert concatenation.source_segments() == [(filename, 1, 2), (filename, 5, 7)]
+    assert concatenation.subclip(0.5, 2).source_segments() == [
+        (filename, 1.5, 2),
+        (filename, 5, 6),
+    ]
+
+    # modified frames
+    assert subclip.image_transform(lambda frame: frame).source_segments() is None
+    mask = ColorClip(clip.size, 1, is_mask=True)
+    assert subclip.with_mask(mask).source_segments() is None
+    color_clip = ColorClip(clip.size, (0, 0, 0), duration=1)
+    assert concatenate_videoclips([subclip, color_clip]).source_segments() is None
+    resized_clip = VideoFileClip(filename, target_resolution=(None, 360))
+    assert resized_clip.source_segments() is None
+    assert BitmapClip([["R"]], fps=1).source_segments() is None
+
+
 @pytest.mark.parametrize(
     "copy_func",
     (
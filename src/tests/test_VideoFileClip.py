@@ -3,9 +3,12 @@
 import copy
 import os
 
+import numpy as np
 import pytest
 
+from filmpy.video import fx as vfx
 from filmpy.video.compositing.CompositeVideoClip import clips_array
+from filmpy.video.io.ffmpeg_reader import FrameCache
 from filmpy.video.io.VideoFileClip import VideoFileClip
 from filmpy.video.VideoClip import ColorClip
 
@@ -83,5 +86,92 @@ def test_videofileclip_safe_deepcopy(monkeypatch):
     assert copy.deepcopy(clip) == "foo"
 
 
+def test_videofileclip_frame_cache():
+    clip = VideoFileClip("media/big_buck_bunny_0_30.webm", frame_cache=10**9)
+    cache = clip.reader.frame_cache
+    assert isinstance(cache, FrameCache)
+
+    # two copies of the clip playing the same frames with a 5 seconds delay
+    first, second = clip.subclip(0, 1), clip.subclip(5, 6).with_position((10, 10))
+    cache.clear()  # the first frames are read when the subclips are created
+    for t in np.arange(0, 1, 1 / 24):
+        first.get_frame(t)
+        second.get_frame(t)
+    assert cache.hits == 0
+    assert cache.misses == 48
+
+    for t in np.arange(0, 1, 1 / 24):
+        frame = second.get_frame(t)
+        assert np.array_equal(frame, clip.get_frame(t + 5))
+    assert cache.hits == 48
+    assert cache.misses == 48
+
+    # the cache is shared with other clips reading the same frames
+    other_clip = VideoFileClip("media/big_buck_bunny_0_30.webm", frame_cache=cache)
+    other_clip.get_frame(0)
+    assert cache.hits == 49
+    other_clip.close()
+    clip.close()
+
+
+def test_frame_cache_max_bytes():
+    frame = np.zeros((10, 10, 3), dtype="uint8")
+    cache = FrameCache(max_bytes=frame.nbytes * 2)
+    cache.put("a", frame)
+    cache.put("b", frame)
+    assert cache.get("a") is frame  # "b" becomes the least recently used
+    cache.put("c", frame)
+    assert len(cache) == 2
+    assert cache.nbytes == frame.nbytes * 2
+    assert cache.get("b") is None
+    assert cache.get("a") is frame
+    assert cache.get("c") is frame
+    assert (cache.hits, cache.misses) == (3, 1)
+
+    cache.clear()
+    assert len(cache) == cache.nbytes == cache.hits == cache.misses == 0
+
+
+@pytest.mark.parametrize(
+    ("fx_name", "args", "tolerance"),
+    (
+        ("crop", dict(x1=10, y1=20, width=100, height=50), 0),
+        ("even_size", {}, 0),
+        ("mirror_x", {}, 0),
+        ("mirror_y", {}, 0),
+        ("rotate", dict(angle=90), 0),
+        ("rotate", dict(angle=180), 0),
+        ("rotate", dict(angle=-90), 0),
+        ("blackwhite", {}, 1),
+        ("resize", dict(new_size=0.5), 3),
+    ),
+)
+def test_videofileclip_fx_pushdown(fx_name, args, tolerance):
+    fx = getattr(vfx, fx_name)
+    # odd dimensions, so that even_size has something to do
+    size = (201, 151)
+    clip = VideoFileClip("media/chaplin.mp4", target_resolution=size).subclip(0, 1)
+    pushdown_clip = VideoFileClip(
+        "media/chaplin.mp4", target_resolution=size, fx_pushdown=True
+    )
+
+    expected_clip = fx(clip, **args)
+    new_clip = fx(pushdown_clip, **args).subclip(0, 1)
+    assert new_clip.reader is not pushdown_clip.reader
+    assert new_clip.size == expected_clip.size
+
+    frame = new_clip.get_frame(0.5)
+    expected_frame = expected_clip.get_frame(0.5)
+    assert frame.shape == expected_frame.shape
+    diff = np.abs(frame.astype(int) - expected_frame.astype(int))
+    assert diff.mean() <= tolerance
+
+    # the effects applied after a transformation are processed with NumPy
+    assert fx(new_clip, **args).reader is new_clip.reader
+
+    for c in (clip, pushdown_clip, new_clip):
+        c.close()
+
+
 if __name__ == "__main__":
     pytest.main()
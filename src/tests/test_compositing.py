@@ -4,15 +4,19 @@ import os
 
 import numpy as np
 import pytest
+from PIL import Image
 
 from filmpy.video.compositing.CompositeVideoClip import (
     CompositeVideoClip,
     clips_array,
+    is_static,
 )
 from filmpy.video.compositing.concatenate import concatenate_videoclips
 from filmpy.video.compositing.transitions import slide_in, slide_out
+from filmpy.video.fx.mask_color import mask_color
 from filmpy.video.fx.resize import resize
-from filmpy.video.VideoClip import BitmapClip, ColorClip
+from filmpy.video.tools.drawing import blit, blit_array
+from filmpy.video.VideoClip import BitmapClip, ColorClip, ImageClip, VideoClip
 
 
 class ClipPixelTest:
@@ -50,6 +54,59 @@ def test_clips_array(util):
         )
 
 
+def test_composite_get_frames():
+    bottom_clip = BitmapClip([["ABC"], ["BCA"], ["CAB"]], fps=1)
+    top_clip = BitmapClip([["DE"], ["EF"]], fps=1).with_start(1).with_position((1, 0))
+    composite_clip = CompositeVideoClip([bottom_clip, top_clip], bg_color=(0, 0, 0))
+
+    tt = [2, 0, 1, 2.5, 0]
+    frames = composite_clip.get_frames(tt)
+    for t, frame in zip(tt, frames):
+        assert np.array_equal(frame, composite_clip.get_frame(t))
+
+    # transformed compositions read their frames one by one
+    subclip = composite_clip.subclip(1, 3)
+    assert np.array_equal(subclip.get_frames([1, 0]), composite_clip.get_frames([2, 1]))
+
+
+def test_composite_frame_graph():
+    computed_times = []
+
+    def make_frame(t):
+        computed_times.append(t)
+        frame = np.zeros((2, 4, 3), dtype="uint8")
+        frame[:, : int(t) + 1] = 255
+        return frame
+
+    source = VideoClip(make_frame, duration=3).with_fps(1)
+    # the layer and its mask both pull the frames of the source
+    layer = source.fx(mask_color, color=(0, 0, 0)).with_position((1, 0))
+    composite_clip = CompositeVideoClip([source, layer], bg_color=(0, 0, 255))
+
+    computed_times.clear()
+    frame = composite_clip.get_frame(1)
+    assert computed_times == [1]
+    assert np.array_equal(frame[0], [[255] * 3] * 3 + [[0, 0, 0]])
+
+    graph = composite_clip.frame_graph(1)
+    source_node = (source.make_frame, 1)
+    # the source frame is requested by the source, the layer and the mask
+    assert graph.requests == len(graph.frames) + 2
+    assert source_node in {dependency for node, dependency in graph.edges}
+    assert graph.frames[source_node] is graph.frames[(layer.make_frame, 1)]
+
+    computed_times.clear()
+    frames = composite_clip.get_frames([0, 1, 2])
+    assert computed_times == [0, 1, 2]
+    assert np.array_equal(frames[1], frame)
+
+    # without composition, the frames are computed at each request
+    computed_times.clear()
+    layer.get_frame(1)
+    layer.mask.get_frame(1)
+    assert computed_times == [1, 1]
+
+
 def test_clips_array_duration(util):
     filename = os.path.join(util.TMP_DIR, "test_clips_array.mp4")
 
@@ -81,6 +138,20 @@ def test_concatenate_self(util):
     assert concatenated == target
 
 
+def test_concatenate_timings_index():
+    clips = [
+        ColorClip((2, 2), color=(i, 0, 0), duration=0.1 * (1 + i % 3))
+        for i in range(200)
+    ]
+    clip = concatenate_videoclips(clips)
+    assert clip.duration == pytest.approx(sum(c.duration for c in clips))
+
+    for t in [0, 0.05, 0.1, 0.25, 19.95, 5.0, 0.25, 12.3]:
+        i = max(i for i, start in enumerate(clip.timings) if start <= t)
+        assert clip.timings_index.index(t) == i
+        assert clip.get_frame(t)[0, 0, 0] == i
+
+
 def test_concatenate_floating_point(util):
     """
     >>> print("{0:.20f}".format(1.12))
@@ -135,6 +206,146 @@ def test_blit_with_opacity():
     bt.expect_color_at(2.5, (0x00, 0x00, 0xFF))
 
 
+@pytest.mark.parametrize("channels", (3, None))
+def test_blit_array_matches_pil(channels):
+    rng = np.random.default_rng(0)
+    shape = (20, 30) if channels is None else (20, 30, channels)
+    picture = rng.integers(0, 256, shape, dtype="uint8")
+    image = rng.integers(0, 256, (8, 12) + shape[2:], dtype="uint8")
+    mask = rng.integers(0, 256, (8, 12), dtype="uint8")
+
+    for pos in [(0, 0), (5, 3), (-4, -2), (25, 15), (40, 0)]:
+        for image_mask in (None, mask):
+            expected = blit(
+                Image.fromarray(image),
+                Image.fromarray(picture),
+                pos,
+                mask=None if image_mask is None else Image.fromarray(image_mask),
+            )
+            result = picture.copy()
+            assert blit_array(image, result, pos, mask=image_mask) is result
+            assert np.array_equal(result, np.array(expected))
+
+
+def test_composite_blit_on_array():
+    background = ColorClip((12, 10), color=(10, 200, 30), duration=1)
+    layer = (
+        VideoClip(
+            lambda t: np.arange(6 * 8 * 3, dtype="uint8").reshape((6, 8, 3)),
+            duration=1,
+        )
+        .with_opacity(0.3)
+        .with_position(("right", 7))
+    )
+    composite = CompositeVideoClip([background, layer])
+    frame = composite.get_frame(0.5)
+    assert frame.dtype == "uint8"
+
+    expected = layer.blit_on(
+        Image.fromarray(background.get_frame(0.5).astype("uint8")), 0.5
+    )
+    assert np.array_equal(frame, np.array(expected))
+    # the background frame is not modified by the blits
+    assert np.array_equal(background.get_frame(0), [[[10, 200, 30]] * 12] * 10)
+
+
+def test_composite_cache_static_layers():
+    rng = np.random.default_rng(0)
+
+    def image(size, opacity=None, pos=(0, 0)):
+        w, h = size
+        clip = ImageClip(rng.integers(0, 256, (h, w, 3), dtype="uint8"), duration=2)
+        if opacity is not None:
+            clip = clip.with_opacity(opacity)
+        return clip.with_position(pos)
+
+    moving = VideoClip(
+        lambda t: np.full((10, 12, 3), int(100 * t), dtype="uint8"), duration=2
+    )
+    clips = [
+        image((20, 15)),
+        image((10, 10), pos=(5, 5)),
+        image((10, 10), 0.5, pos=(15, 10)),
+        moving.with_position(lambda t: (int(10 * t), 3)),
+        image((8, 8), pos=(2, 20)),
+        image((8, 8), 0.7, pos=(20, 20)),
+        image((8, 8), 0.4, pos=(24, 22)).with_start(1),
+        image((6, 6), 0.3, pos=(30, 2)).with_layer(1),
+    ]
+    assert [is_static(clip) for clip in clips] == [True] * 3 + [False] + [True] * 4
+
+    composite = CompositeVideoClip(clips, size=(40, 30))
+    cached = CompositeVideoClip(clips, size=(40, 30), cache_static_layers=True)
+    for t in [0, 0.5, 1.2, 1.5]:
+        frame, cached_frame = composite.get_frame(t), cached.get_frame(t)
+        # the semi-transparent static layers overlap at (24-27, 22-27) only
+        difference = np.abs(frame.astype(int) - cached_frame)
+        assert difference.max() <= 1
+        difference[22:28, 24:28] = 0
+        assert not difference.any()
+    # a plate for the layers playing before and after the start of one
+    assert len(cached.static_plates) == 3
+
+    frames = cached.get_frames([0.5, 1.2])
+    assert np.array_equal(frames[1], cached.get_frame(1.2))
+
+
+def test_composite_flatten_composites():
+    rng = np.random.default_rng(0)
+
+    def image(size, duration=3):
+        w, h = size
+        return ImageClip(rng.integers(0, 256, (h, w, 3), dtype="uint8"), duration=duration)
+
+    moving = VideoClip(
+        lambda t: np.full((6, 8, 3), int(80 * t), dtype="uint8"), duration=3
+    )
+    grid = clips_array([[image((8, 6)), image((8, 6))], [moving, image((8, 6))]])
+    slides = CompositeVideoClip(
+        [slide_in(image((30, 20), 2), 1, "left")], size=(30, 20)
+    ).with_start(0.5)
+    sequence = concatenate_videoclips(
+        [image((8, 8), 1), moving.subclip(0, 1.5), image((4, 4), 1)],
+        method="compose",
+        bg_color=(0, 0, 200),
+    ).with_position(("right", "bottom"))
+    opaque = CompositeVideoClip(
+        [image((10, 10)).with_opacity(0.4), moving.with_position((2, 2))],
+        size=(12, 12),
+        bg_color=(50, 60, 70),
+    ).with_position(lambda t: (int(5 * t), 4))
+    overflowing = CompositeVideoClip(
+        [moving.with_position((8, 0))], size=(10, 10), bg_color=(1, 2, 3)
+    )
+    clips = [image((30, 20)), grid, slides, sequence, opaque, overflowing]
+
+    nested = CompositeVideoClip(clips, use_bgclip=True)
+    flat = CompositeVideoClip(clips, use_bgclip=True, flatten_composites=True)
+    assert nested.clips == clips[1:]
+    assert flat.duration == nested.duration
+    # only the overflowing composition is kept
+    composites = [clip for clip in flat.clips if isinstance(clip, CompositeVideoClip)]
+    assert len(composites) == 1 and composites[0] is overflowing
+    assert len(flat.clips) == 4 + 1 + (1 + 3) + (1 + 2) + 1
+
+    for t in [0, 0.4, 0.5, 0.9, 1.2, 1.5, 2.1, 2.5, 2.99]:
+        assert np.array_equal(flat.get_frame(t), nested.get_frame(t))
+    times = [0.2, 0.7, 1.9]
+    assert np.array_equal(flat.get_frames(times), nested.get_frames(times))
+
+    # two transparent compositions are not flattened, their masks differ
+    transparent = CompositeVideoClip(
+        [grid.with_position((3, 3))], size=(20, 20), flatten_composites=True
+    )
+    assert transparent.clips[0].clips is grid.clips
+    assert np.array_equal(
+        transparent.mask.get_frame(1),
+        CompositeVideoClip(
+            [grid.with_position((3, 3))], size=(20, 20)
+        ).mask.get_frame(1),
+    )
+
+
 def test_slide_in():
     duration = 0.1
     size = (10, 1)
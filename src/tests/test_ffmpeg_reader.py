@@ -1,6 +1,8 @@
 """FFmpeg reader tests meant to be run with pytest."""
 
 import os
+import pickle
+import shutil
 import subprocess
 import time
 
@@ -8,12 +10,21 @@ import numpy as np
 import pytest
 
 from filmpy.audio.AudioClip import AudioClip
+from filmpy.audio.io.readers import FFMPEG_AudioReader
 from filmpy.config import FFMPEG_BINARY
 from filmpy.video.compositing.CompositeVideoClip import clips_array
 from filmpy.video.io.ffmpeg_reader import (
+    FFMPEG_ReaderPool,
     FFMPEG_VideoReader,
+    FFmpegInfosCache,
     FFmpegInfosParser,
+    FrameCache,
+    close_readers,
+    ffmpeg_frame_times,
+    ffmpeg_infos_cache,
+    ffmpeg_keyframe_times,
     ffmpeg_parse_infos,
+    yuv420p_planes,
 )
 from filmpy.video.io.VideoFileClip import VideoFileClip
 from filmpy.video.VideoClip import BitmapClip, ColorClip
@@ -46,6 +57,40 @@ def test_ffmpeg_parse_infos():
     assert d["video_bitrate"]
 
 
+def test_ffmpeg_parse_infos_cache(util):
+    filename = os.path.join(util.TMP_DIR, "ffmpeg_parse_infos_cache.gif")
+    shutil.copy("media/pigs_in_a_polka.gif", filename)
+    ffmpeg_infos_cache.clear()
+
+    d = ffmpeg_parse_infos(filename)
+    d["video_size"][0] = 0  # the cached results can't be altered
+    assert ffmpeg_parse_infos(filename)["video_size"] == [314, 273]
+    assert (ffmpeg_infos_cache.hits, ffmpeg_infos_cache.misses) == (1, 1)
+
+    # other options, a modified file or no cache parse the file again
+    ffmpeg_parse_infos(filename, decode_file=True)
+    ffmpeg_parse_infos(filename, cache=False)
+    os.utime(filename, (0, 0))
+    ffmpeg_parse_infos(filename)
+    assert (ffmpeg_infos_cache.hits, ffmpeg_infos_cache.misses) == (1, 3)
+
+    # persistent store, reused by other caches
+    cache_filename = os.path.join(util.TMP_DIR, "ffmpeg_parse_infos_cache.jsonl")
+    if os.path.isfile(cache_filename):
+        os.remove(cache_filename)
+    cache = FFmpegInfosCache(cache_filename)
+    key = FFmpegInfosCache.key(filename, decode_file=False)
+    cache.put(key, ffmpeg_parse_infos(filename))
+    with open(cache_filename, "a") as f:
+        f.write("corrupted line\n")
+    assert FFmpegInfosCache(cache_filename).get(key) == cache.get(key)
+    assert FFmpegInfosCache.key("https://example.com/video.mp4") is None
+
+    ffmpeg_infos_cache.clear()
+    os.remove(cache_filename)
+    os.remove(filename)
+
+
 def test_ffmpeg_parse_infos_video_nframes():
     d = ffmpeg_parse_infos("media/big_buck_bunny_0_30.webm")
     assert d["video_n_frames"] == 720
@@ -677,6 +722,289 @@ def test_seeking_beyond_file_end():
     assert reader.pos == reader.n_frames  # The position should be at the last frame
 
 
+def test_prefetch_frames_equal():
+    reader = FFMPEG_VideoReader("media/big_buck_bunny_0_30.webm")
+    prefetch_reader = FFMPEG_VideoReader("media/big_buck_bunny_0_30.webm", prefetch=8)
+    assert prefetch_reader.prefetcher is not None
+
+    # sequential reads, small skips, backward and large forward seeks
+    for t in list(np.arange(0, 2, 1 / 24)) + [3, 3.5, 1, 20, 20 + 1 / 24]:
+        assert np.array_equal(reader.get_frame(t), prefetch_reader.get_frame(t))
+        assert reader.pos == prefetch_reader.pos
+
+    prefetch_reader.close()
+    assert prefetch_reader.prefetcher is None
+    assert prefetch_reader.proc is None
+
+
+def test_prefetch_end_of_file():
+    reader = FFMPEG_VideoReader("media/test_video.mp4", prefetch=2)
+    frame_4 = reader.get_frame(4)
+    assert np.array_equal(frame_4, [[[255, 255, 255]]])
+
+    with pytest.warns(UserWarning, match="Attempting to read past the end of the file"):
+        end_of_file_frame = reader.get_frame(5)
+    assert np.array_equal(frame_4, end_of_file_frame)
+    reader.close()
+
+
+@pytest.mark.parametrize("prefetch", (0, 4), ids=("prefetch=0", "prefetch=4"))
+def test_buffered_frames_equal(prefetch):
+    reader = FFMPEG_VideoReader("media/big_buck_bunny_0_30.webm")
+    buffered_reader = FFMPEG_VideoReader(
+        "media/big_buck_bunny_0_30.webm", buffers=2, prefetch=prefetch
+    )
+    assert len(buffered_reader.frame_buffers) == (2 + prefetch + 1 if prefetch else 2)
+
+    # sequential reads, a forward skip, a backward seek and a sequential read
+    times = list(np.arange(0, 1, 1 / 24)) + [3, 1, 1 + 1 / 24]
+    previous_t, previous_frame = None, None
+    for t in times:
+        frame = buffered_reader.get_frame(t)
+        assert not frame.flags.writeable
+        assert not frame.flags.owndata
+        assert np.array_equal(frame, reader.get_frame(t))
+        if previous_t is not None and abs(t - previous_t - 1 / 24) < 0.001:
+            # double buffering: the previous frame is still valid
+            assert np.array_equal(previous_frame, reader.get_frame(previous_t))
+        previous_t, previous_frame = t, frame
+
+    buffered_reader.close()
+    reader.close()
+
+
+@pytest.mark.parametrize(
+    ("pixel_format", "shape", "dtype"),
+    (
+        ("gray", (720, 1280), "uint8"),
+        ("gray16le", (720, 1280), "uint16"),
+        ("rgb48le", (720, 1280, 3), "uint16"),
+        ("yuv420p", (1080, 1280), "uint8"),
+    ),
+)
+@pytest.mark.parametrize("buffers", (0, 2), ids=("buffers=0", "buffers=2"))
+def test_native_pixel_formats(pixel_format, shape, dtype, buffers):
+    filename = "media/big_buck_bunny_0_30.webm"
+    rgb_frame = FFMPEG_VideoReader(filename).get_frame(1)
+    reader = FFMPEG_VideoReader(filename, pixel_format=pixel_format, buffers=buffers)
+    frames = [reader.get_frame(t) for t in (0, 1, 1 + 1 / 24)]
+    assert all(frame.shape == shape and frame.dtype == dtype for frame in frames)
+    frame = reader.get_frame(1)
+
+    if pixel_format == "rgb48le":
+        assert np.abs(frame / 257 - rgb_frame).max() <= 3
+    elif pixel_format == "yuv420p":
+        y, u, v = yuv420p_planes(frame)
+        assert y.shape == (720, 1280) and u.shape == v.shape == (360, 640)
+        gray = FFMPEG_VideoReader(filename, pixel_format="gray").get_frame(1)
+        # limited range luma
+        assert np.abs(y - (16 + gray / 255 * 219)).max() <= 2
+    else:
+        # ITU-R BT.601 luma of the RGB frame
+        luma = rgb_frame @ [0.299, 0.587, 0.114]
+        if pixel_format == "gray16le":
+            luma = luma * 257
+        assert np.abs(frame - luma).mean() < 0.02 * frame.max()
+    reader.close()
+
+    clip = VideoFileClip(filename, pixel_format=pixel_format)
+    assert clip.get_frame(1).shape == shape
+    clip.close()
+
+
+def test_yuv420p_odd_size():
+    with pytest.raises(ValueError, match="even frame size"):
+        FFMPEG_VideoReader(
+            "media/big_buck_bunny_0_30.webm",
+            pixel_format="yuv420p",
+            target_resolution=(201, 151),
+        )
+
+
+def test_ffmpeg_keyframe_times(util):
+    filename = os.path.join(util.TMP_DIR, "ffmpeg_keyframe_times.webm")
+    shutil.copy("media/big_buck_bunny_0_30.webm", filename)
+    sidecar_filename = filename + ".keyframes.json"
+    if os.path.isfile(sidecar_filename):
+        os.remove(sidecar_filename)
+
+    keyframes = ffmpeg_keyframe_times(filename)
+    assert keyframes == sorted(keyframes)
+    assert len(keyframes) > 1
+    assert keyframes[0] < 0.01
+    assert keyframes[-1] < 30
+    assert os.path.isfile(sidecar_filename)
+
+    # the sidecar file is used when it is up to date
+    reader = FFMPEG_VideoReader(filename, seek_index=True)
+    assert reader.keyframes == keyframes
+    reader.close()
+
+    # and ignored when the video file changes
+    os.utime(filename, (0, 0))
+    assert ffmpeg_keyframe_times(filename) == keyframes
+    os.remove(sidecar_filename)
+    os.remove(filename)
+
+
+def test_seek_index_frames_equal(util):
+    filename = os.path.join(util.TMP_DIR, "seek_index_frames_equal.webm")
+    shutil.copy("media/big_buck_bunny_0_30.webm", filename)
+
+    sequential_reader = FFMPEG_VideoReader(filename)
+    indexed_reader = FFMPEG_VideoReader(filename, seek_index=True)
+    assert indexed_reader.keyframes
+
+    times = [25, 11.5, 0, 12, 29.5, 6, 6 + 1 / 24, 11.128, 1]
+    frames = {}
+    for t in np.arange(0, 30, 1 / 24):
+        frame_number = sequential_reader.get_frame_number(t)
+        if frame_number in [sequential_reader.get_frame_number(t) for t in times]:
+            frames[frame_number] = sequential_reader.get_frame(t)
+
+    for t in times:
+        frame = indexed_reader.get_frame(t)
+        assert indexed_reader.pos == indexed_reader.get_frame_number(t) + 1
+        assert np.array_equal(frame, frames[indexed_reader.get_frame_number(t)])
+
+    assert indexed_reader.frame_decode_time is not None
+    assert indexed_reader.reopen_time is not None
+    indexed_reader.close()
+    sequential_reader.close()
+    os.remove(filename + ".keyframes.json")
+    os.remove(filename)
+
+
+def test_reader_pool_interleaved_positions():
+    reader = FFMPEG_VideoReader("media/big_buck_bunny_0_30.webm")
+    pool = FFMPEG_ReaderPool(
+        "media/big_buck_bunny_0_30.webm", max_readers=2, idle_time=60
+    )
+    assert pool.fps == reader.fps
+    assert pool.size == reader.size
+
+    # two distant playheads, each one keeps its own reader
+    for t in np.arange(0, 1, 1 / 24):
+        for offset in [0, 20]:
+            frame = pool.get_frame(t + offset)
+            assert np.array_equal(frame, reader.get_frame(t + offset))
+    assert len(pool) == 2
+    assert sorted(r.pos for r in pool.readers) == [24, 20 * 24 + 24]
+
+    # a third playhead reuses the least recently used reader
+    pool.get_frame(10)
+    assert len(pool) == 2
+    assert sorted(r.pos for r in pool.readers) == [10 * 24 + 1, 20 * 24 + 24]
+
+    # unused readers are closed
+    pool.idle_time = 0
+    time.sleep(0.01)
+    pool.get_frame(10 + 1 / 24)
+    assert len(pool) == 1
+
+    pool.close()
+    reader.close()
+
+
+def test_pickle_readers():
+    reader = FFMPEG_VideoReader(
+        "media/big_buck_bunny_0_30.webm", prefetch=2, frame_cache=FrameCache()
+    )
+    pool = FFMPEG_ReaderPool("media/big_buck_bunny_0_30.webm", max_readers=2)
+    pool.get_frame(10)
+    audio_reader = FFMPEG_AudioReader("media/big_buck_bunny_0_30.webm", 20000)
+    reader.get_frame(0.5)
+    audio_reader.get_frame(np.arange(2, 2.2, 1 / 44100))
+
+    # the processes are not pickled, the readers start their own when read
+    new_reader, new_pool, new_audio_reader = pickle.loads(
+        pickle.dumps((reader, pool, audio_reader))
+    )
+    assert new_reader.proc is None and new_reader.prefetcher is None
+    assert len(new_reader.frame_cache) == 0
+    assert len(new_pool) == 1 and new_pool.readers[0].proc is None
+    assert new_audio_reader.proc is None
+    for t in (0.5, 1, 12):
+        assert np.array_equal(new_reader.get_frame(t), reader.get_frame(t))
+        assert np.array_equal(new_pool.get_frame(t), reader.get_frame(t))
+    # read from the buffer, then from the file opened again
+    for start in (2, 0.5):
+        tt = np.arange(start, start + 0.2, 1 / 44100)
+        assert np.array_equal(
+            new_audio_reader.get_frame(tt), audio_reader.get_frame(tt)
+        )
+    for obj in (reader, new_reader, pool, new_pool, audio_reader, new_audio_reader):
+        obj.close()
+
+
+def test_close_readers():
+    reader = FFMPEG_VideoReader("media/big_buck_bunny_0_30.webm", prefetch=2)
+    frame = reader.get_frame(1).copy()
+    assert reader.prefetcher is not None
+
+    # as before forking processes, the readers start again when read
+    close_readers()
+    assert reader.proc is None and reader.prefetcher is None
+    new_reader = FFMPEG_VideoReader("media/big_buck_bunny_0_30.webm")
+    assert np.array_equal(reader.get_frame(1), frame)
+    assert np.array_equal(reader.get_frame(2), new_reader.get_frame(2))
+    assert reader.prefetcher is not None
+    reader.close()
+    new_reader.close()
+
+
+def test_frame_accurate_seek_variable_frame_rate(util):
+    # 10 frames at 10 fps, then 10 frames at 5 fps, brighter and brighter
+    filename = os.path.join(util.TMP_DIR, "frame_accurate_seek.mp4")
+    cmd = [
+        FFMPEG_BINARY,
+        "-y",
+        "-loglevel",
+        "error",
+        "-f",
+        "lavfi",
+        "-i",
+        "color=black:size=32x32:rate=10:duration=2",
+        "-vf",
+        "geq=lum='16+N*12':cb=128:cr=128,settb=1/100,"
+        "setpts='if(lt(N,10),N*10,100+(N-10)*20)'",
+        "-vsync",
+        "passthrough",
+        "-g",
+        "4",
+        "-pix_fmt",
+        "yuv420p",
+        filename,
+    ]
+    subprocess.run(cmd, check=True)
+
+    # the last frame is cut by the edit list of the MP4 file
+    expected_times = [i / 10 for i in range(10)] + [1 + i / 5 for i in range(9)]
+    assert np.allclose(ffmpeg_frame_times(filename), expected_times)
+
+    reader = FFMPEG_VideoReader(filename, frame_accurate=True)
+    assert reader.n_frames == 19
+    frames = [reader.get_frame(t).copy() for t in expected_times]
+    assert np.all(np.diff([frame.mean() for frame in frames]) > 5)
+
+    for t, index in [(1.5, 12), (0.35, 3), (2.9, 18), (1.05, 10), (0, 0), (2.1, 15)]:
+        assert reader.get_frame_number(t) == index
+        assert np.array_equal(reader.get_frame(t), frames[index])
+        assert reader.pos == index + 1
+    reader.close()
+
+    # frame 15 is a keyframe, at 2s: reopening the file decodes no other frame
+    reader = FFMPEG_VideoReader(filename, frame_accurate=True, seek_index=True)
+    assert reader.keyframe_time(reader.frame_times[15]) == pytest.approx(2)
+    reader.frame_decode_time, reader.default_reopen_cost = None, 0
+    reader.pos = 13
+    assert reader.reopen_is_faster(16)
+    reader.pos = 15
+    assert not reader.reopen_is_faster(16)
+    reader.close()
+    os.remove(filename)
+
+
 def test_release_of_file_via_close(util):
     # Create a random video file.
     red = ColorClip((256, 200), color=(255, 0, 0))
@@ -1,18 +1,33 @@
 """FFmpeg writer tests of filmpy."""
 
 import contextlib
+import json
 import multiprocessing
 import os
+import pickle
+import shutil
+import subprocess
 
+import numpy as np
 import pytest
 from PIL import Image
 
+from filmpy.audio.AudioClip import AudioArrayClip
+from filmpy.config import FFMPEG_BINARY
 from filmpy.video.compositing.concatenate import concatenate_videoclips
-from filmpy.video.io.ffmpeg_writer import ffmpeg_write_image, ffmpeg_write_video
+from filmpy.video.io import ffmpeg_writer
+from filmpy.video.io.ffmpeg_reader import FFMPEG_VideoReader, ffmpeg_frame_times
+from filmpy.video.io.ffmpeg_writer import (
+    FFMPEG_VideoWriter,
+    ffmpeg_write_image,
+    ffmpeg_write_video,
+    keepable_frame,
+    stream_copy_parts,
+)
 from filmpy.video.io.gif_writers import write_gif
 from filmpy.video.io.VideoFileClip import VideoFileClip
 from filmpy.video.tools.drawing import color_gradient
-from filmpy.video.VideoClip import BitmapClip, ColorClip
+from filmpy.video.VideoClip import BitmapClip, ColorClip, VideoClip
 
 
 @pytest.mark.parametrize(
@@ -108,6 +123,298 @@ def test_ffmpeg_write_video(
         assert os.path.isfile(logfile_name)
 
 
+def test_ffmpeg_videowriter_queue_size(util):
+    filename = os.path.join(util.TMP_DIR, "filmpy_ffmpeg_videowriter_queue.avi")
+    clip = BitmapClip([["RG"], ["GB"], ["BW"], ["WO"]], fps=10)
+
+    writer = FFMPEG_VideoWriter(filename, clip.size, 10, codec="png", queue_size=2)
+    with writer:
+        assert writer.writer_thread.is_alive()
+        for frame in clip.iter_frames(dtype="uint8"):
+            writer.write_frame(frame)
+    assert writer.writer_thread is None
+
+    final_clip = VideoFileClip(filename)
+    for t in (0, 0.1, 0.2, 0.3):
+        assert np.array_equal(final_clip.get_frame(t), clip.get_frame(t))
+    final_clip.close()
+
+
+@pytest.mark.skipif(os.name == "nt", reason="audio pipes require POSIX")
+def test_ffmpeg_videowriter_audio_pipe(util):
+    filename = os.path.join(util.TMP_DIR, "filmpy_ffmpeg_videowriter_audio.mkv")
+    clip = BitmapClip([["RG"], ["GB"], ["BW"], ["WO"]], fps=10)
+    samples = np.linspace(-0.5, 0.5, 2 * 8820).reshape((8820, 2))
+    audio = AudioArrayClip(samples, fps=22050)
+
+    writer = FFMPEG_VideoWriter(
+        filename,
+        clip.size,
+        10,
+        codec="png",
+        audio_fps=22050,
+        audio_codec="pcm_s16le",
+    )
+    with writer:
+        writer.write_audio(
+            audio.iter_chunks(chunksize=1000, quantize=True, nbytes=2, fps=22050)
+        )
+        for frame in clip.iter_frames(dtype="uint8"):
+            writer.write_frame(frame)
+    assert writer.audio_thread is None
+
+    final_clip = VideoFileClip(filename, audio_fps=22050)
+    for t in (0, 0.1, 0.2, 0.3):
+        assert np.array_equal(final_clip.get_frame(t), clip.get_frame(t))
+    assert np.allclose(final_clip.audio.to_soundarray(), samples, atol=1e-4)
+    final_clip.close()
+
+
+@pytest.mark.parametrize("buffers", (0, 2), ids=("buffers=0", "buffers=2"))
+def test_ffmpeg_write_video_queue_size(util, buffers):
+    filename = os.path.join(util.TMP_DIR, "filmpy_ffmpeg_write_video_queue.avi")
+    # frames read into reused buffers must be copied before being queued
+    clip = VideoFileClip("media/chaplin.mp4", buffers=buffers).subclip(0, 0.4)
+
+    ffmpeg_write_video(clip, filename, clip.fps, codec="png", logger=None, queue_size=4)
+
+    final_clip = VideoFileClip(filename)
+    for t in (0, 0.12, 0.2, 0.36):
+        assert np.array_equal(final_clip.get_frame(t), clip.get_frame(t))
+    final_clip.close()
+    clip.close()
+
+
+def test_keepable_frame():
+    reader = FFMPEG_VideoReader("media/chaplin.mp4", buffers=2)
+    frame = reader.get_frame(0)
+    assert keepable_frame(frame) is not frame
+    # a view of a reused buffer made writeable is still overwritten
+    view = frame[10:20]
+    view.setflags(write=True)
+    kept = keepable_frame(view)
+    assert kept is not view and np.array_equal(kept, view)
+    assert not np.shares_memory(kept, frame)
+
+    unbuffered_reader = FFMPEG_VideoReader("media/chaplin.mp4")
+    frame = unbuffered_reader.get_frame(0)
+    assert keepable_frame(frame) is frame
+    frame = 255 - frame
+    assert keepable_frame(frame) is frame
+    reader.close()
+    unbuffered_reader.close()
+
+
+@pytest.mark.parametrize(
+    ("workers", "ffmpeg_params"),
+    ((1, None), (3, None), (4, ["-g", "2"]), (20, None)),
+    ids=("workers=1", "workers=3", "workers=4-gop=2", "workers=20"),
+)
+def test_ffmpeg_write_video_workers(util, workers, ffmpeg_params):
+    filename = os.path.join(util.TMP_DIR, "filmpy_ffmpeg_write_video_workers.mp4")
+    colors = ["R", "G", "B", "W", "O", "R", "G"]
+    # transformed by a lambda, so that the clip cannot be pickled
+    clip = BitmapClip([[color] for color in colors], fps=10).image_transform(
+        lambda frame: frame
+    )
+
+    ffmpeg_write_video(
+        clip,
+        filename,
+        10,
+        logger=None,
+        workers=workers,
+        ffmpeg_params=ffmpeg_params,
+    )
+
+    final_clip = VideoFileClip(filename)
+    assert final_clip.n_frames == len(ffmpeg_frame_times(filename)) == len(colors)
+    for i, frame in enumerate(final_clip.iter_frames()):
+        assert abs(frame[0, 0].astype(int) - clip.get_frame(i / 10)[0, 0]).max() < 3
+    final_clip.close()
+
+
+@pytest.mark.parametrize("workers", (1, 3), ids=("workers=1", "workers=3"))
+def test_ffmpeg_write_video_workers_file_clip(util, workers):
+    filename = os.path.join(util.TMP_DIR, f"filmpy_write_video_workers{workers}.mp4")
+    clip = VideoFileClip("media/chaplin.mp4").subclip(0, 1.5)
+    clip = clip.image_transform(lambda frame: 255 - frame)
+
+    clip.write_videofile(filename, logger=None, workers=workers)
+
+    final_clip = VideoFileClip(filename)
+    assert len(ffmpeg_frame_times(filename)) == int(clip.duration * clip.fps)
+    assert final_clip.audio is not None
+    for t in (0, 0.5, 1, 1.4):
+        diff = final_clip.get_frame(t).astype(int) - clip.get_frame(t)
+        assert abs(diff).mean() < 3
+    final_clip.close()
+    clip.close()
+
+
+def test_ffmpeg_write_video_workers_without_fork(util, monkeypatch):
+    pytest.importorskip("cloudpickle")
+    # the clip is pickled for the processes, as on Windows
+    monkeypatch.setattr(multiprocessing, "get_all_start_methods", lambda: ["spawn"])
+    filename = os.path.join(util.TMP_DIR, "filmpy_write_video_without_fork.mp4")
+    clip = VideoFileClip("media/chaplin.mp4").subclip(0, 1)
+    clip = clip.image_transform(lambda frame: 255 - frame)
+
+    clip.write_videofile(filename, logger=None, workers=2, audio=False)
+
+    final_clip = VideoFileClip(filename)
+    assert len(ffmpeg_frame_times(filename)) == int(clip.duration * clip.fps)
+    for t in (0, 0.5, 0.9):
+        diff = final_clip.get_frame(t).astype(int) - clip.get_frame(t)
+        assert abs(diff).mean() < 3
+    final_clip.close()
+    clip.close()
+
+
+def test_ffmpeg_write_video_workers_unpicklable_clip(util, monkeypatch):
+    monkeypatch.setattr(multiprocessing, "get_all_start_methods", lambda: ["spawn"])
+
+    def pickle_dumps(obj):
+        raise pickle.PicklingError("unpicklable clip")
+
+    monkeypatch.setattr(ffmpeg_writer, "pickle_dumps", pickle_dumps)
+    filename = os.path.join(util.TMP_DIR, "filmpy_write_video_unpicklable.mp4")
+    clip = BitmapClip([["R"], ["G"], ["B"], ["W"]], fps=10)
+
+    # rendered in a single process, with a warning pointing at this call
+    with pytest.warns(UserWarning, match="single process") as record:
+        clip.write_videofile(filename, logger=None, workers=2, audio=False)
+    assert record[0].filename == __file__
+    assert len(ffmpeg_frame_times(filename)) == 4
+
+
+def test_ffmpeg_write_video_frame_processes(util):
+    pytest.importorskip("cloudpickle")
+    filename = os.path.join(util.TMP_DIR, "filmpy_write_video_processes.mp4")
+    colors = ["R", "G", "B", "W", "O", "R", "G"]
+    clip = BitmapClip([[color] for color in colors], fps=10).image_transform(
+        lambda frame: frame
+    )
+
+    ffmpeg_write_video(clip, filename, 10, logger=None, frame_processes=3)
+
+    final_clip = VideoFileClip(filename)
+    assert final_clip.n_frames == len(colors)
+    for i, frame in enumerate(final_clip.iter_frames()):
+        assert abs(frame[0, 0].astype(int) - clip.get_frame(i / 10)[0, 0]).max() < 3
+    final_clip.close()
+
+
+@pytest.mark.parametrize("workers", (1, 3), ids=("workers=1", "workers=3"))
+def test_ffmpeg_write_video_checkpoint(util, workers):
+    filename = os.path.join(util.TMP_DIR, f"filmpy_write_video_checkpoint{workers}.avi")
+    checkpoint_dir = f"{filename}.checkpoint"
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    computed_frames = []
+    interrupted = False
+
+    def make_frame(t):
+        frame_index = round(t * 10)
+        if interrupted and frame_index == 12:
+            raise RuntimeError("render interrupted")
+        computed_frames.append(frame_index)
+        return np.full((16, 16, 3), 12 * frame_index, dtype="uint8")
+
+    clip = VideoClip(make_frame, duration=2).with_fps(10)
+
+    interrupted = True
+    with pytest.raises(RuntimeError):
+        clip.write_videofile(
+            filename, codec="png", logger=None, workers=workers, checkpoint_duration=0.5
+        )
+    with open(os.path.join(checkpoint_dir, "manifest.json")) as f:
+        written = json.load(f)["written"]
+    assert 2 not in written
+
+    interrupted = False
+    computed_frames.clear()
+    clip.write_videofile(
+        filename, codec="png", logger=None, workers=workers, checkpoint_duration=0.5
+    )
+    assert not os.path.exists(checkpoint_dir)
+    if workers == 1:
+        # the segments of frames 0-4 and 5-9 were not rendered again
+        assert written == [0, 1]
+        assert computed_frames == list(range(10, 20))
+
+    final_clip = VideoFileClip(filename)
+    assert len(ffmpeg_frame_times(filename)) == 20
+    for frame_index in range(20):
+        frame = final_clip.get_frame(frame_index / 10)
+        assert np.array_equal(frame, clip.get_frame(frame_index / 10))
+    final_clip.close()
+
+
+@pytest.mark.parametrize("codec", ("libx264", "mpeg4"))
+def test_ffmpeg_write_video_stream_copy(util, codec, monkeypatch):
+    # keyframes every second, at 25 fps
+    source = os.path.join(util.TMP_DIR, "filmpy_stream_copy_source.mp4")
+    cmd = [
+        FFMPEG_BINARY,
+        "-y",
+        "-loglevel",
+        "error",
+        "-f",
+        "lavfi",
+        "-i",
+        "testsrc2=size=64x48:rate=25:duration=6",
+        "-g",
+        "25",
+        "-pix_fmt",
+        "yuv420p",
+        source,
+    ]
+    subprocess.run(cmd, check=True)
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(f"{source}.keyframes.json")
+    filename = os.path.join(util.TMP_DIR, "filmpy_stream_copy.mp4")
+
+    clip = VideoFileClip(source)
+    clip = concatenate_videoclips([clip.subclip(0.4, 2.4), clip.subclip(3, 5.48)])
+    parts = stream_copy_parts(clip.source_segments(), clip.size, 25, codec)
+    if codec == "mpeg4":
+        assert parts is None
+    else:
+        assert parts == [
+            ("encode", 0, 15),
+            ("copy", source, 1.0, 25),
+            ("encode", 40, 50),
+            ("copy", source, 3.0, 50),
+            ("encode", 100, 112),
+        ]
+
+        # the frames are encoded if the keyframes cannot be read
+        with monkeypatch.context() as context:
+            context.setattr(
+                ffmpeg_writer, "ffmpeg_keyframe_times", lambda *args, **kwargs: None
+            )
+            assert stream_copy_parts(clip.source_segments(), clip.size, 25, codec) == [
+                ("encode", 0, 50),
+                ("encode", 50, 112),
+            ]
+
+    ffmpeg_write_video(clip, filename, 25, codec=codec, logger=None, stream_copy=True)
+
+    # no keyframes index is written next to the source
+    assert not os.path.exists(f"{source}.keyframes.json")
+    assert len(ffmpeg_frame_times(filename)) == 112
+    final_clip = VideoFileClip(filename)
+    for index in range(112):
+        frame = final_clip.get_frame(index / 25)
+        expected_frame = clip.get_frame(index / 25)
+        if codec == "libx264" and (15 <= index < 40 or 50 <= index < 100):
+            # copied frames, identical
+            assert np.array_equal(frame, expected_frame)
+        else:
+            assert abs(frame.astype(int) - expected_frame).mean() < 10
+    final_clip.close()
+
+
 @pytest.mark.parametrize(
     ("size", "logfile", "pixel_format", "expected_result"),
     (
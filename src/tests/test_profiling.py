@@ -0,0 +1,102 @@
+"""Render profiling tests meant to be run with pytest."""
+
+import json
+import os
+import time
+
+import numpy as np
+import pytest
+
+from filmpy.profiling import RenderProfiler, function_name, profile_stage
+from filmpy.video.io.VideoFileClip import VideoFileClip
+from filmpy.video.VideoClip import VideoClip
+
+
+def brighten(frame):
+    time.sleep(0.001)
+    return 2 * frame
+
+
+def make_filter():
+    def image_filter(frame):
+        return frame
+
+    return image_filter
+
+
+def test_function_name():
+    assert function_name(brighten) == "brighten"
+    assert function_name(make_filter()) == "make_filter"
+    assert function_name(lambda x: x) == "test_function_name"
+    assert function_name(np.flipud) == "flipud"
+    assert function_name(VideoClip.with_fps) == "with_fps"
+
+
+def test_render_profiler_stages():
+    def slow_frame(t):
+        time.sleep(0.002)
+        return np.full((4, 4, 3), 1.0)
+
+    clip = VideoClip(slow_frame, duration=1).with_fps(10).image_transform(brighten)
+    clip.profile_name = "layer"
+
+    with profile_stage("ignored"):
+        pass
+    with RenderProfiler() as profiler:
+        frames = list(clip.iter_frames(dtype="uint8", workers=2))
+    assert len(frames) == 10
+
+    summary = profiler.summary()
+    stages = summary["stages"]
+    assert set(stages) == {"layer", "VideoClip", "convert"}
+    assert all(stage["count"] == 10 for stage in stages.values())
+    # the source clip is nested in the transformed one
+    assert stages["layer"]["time"] >= stages["VideoClip"]["time"] >= 0.02
+    assert stages["layer"]["self_time"] == pytest.approx(
+        stages["layer"]["time"] - stages["VideoClip"]["time"], abs=1e-3
+    )
+    assert summary["frames"] == 0
+    assert summary["duration"] >= stages["layer"]["time"] / 2
+
+    # the clips made by transformations are named after the function
+    assert clip.image_transform(make_filter()).profile_name == "make_filter"
+    assert clip.time_transform(lambda t: 2 * t).profile_name == (
+        "test_render_profiler_stages"
+    )
+
+
+def test_render_profiler_write_videofile(util):
+    filename = os.path.join(util.TMP_DIR, "profiled_video.mp4")
+    clip = VideoFileClip("media/big_buck_bunny_432_433.webm").subclip(0, 0.5)
+
+    with RenderProfiler() as profiler:
+        clip.image_transform(lambda frame: 255 - frame).write_videofile(
+            filename, logger=None, audio=False
+        )
+
+    summary = profiler.summary()
+    assert summary["frames"] == 12
+    assert summary["fps"] == pytest.approx(12 / summary["duration"])
+    assert {"decode", "encode", "test_render_profiler_write_videofile"} <= set(
+        summary["stages"]
+    )
+
+    json_filename = os.path.join(util.TMP_DIR, "profiled_video.json")
+    profiler.write_json(json_filename)
+    with open(json_filename) as f:
+        assert json.load(f)["frames"] == 12
+
+    trace_filename = os.path.join(util.TMP_DIR, "profiled_video_trace.json")
+    profiler.write_chrome_trace(trace_filename)
+    with open(trace_filename) as f:
+        events = json.load(f)["traceEvents"]
+    assert len(events) == len(profiler.events)
+    assert {event["name"] for event in events} == set(summary["stages"])
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in events)
+
+    with RenderProfiler(trace=False) as profiler:
+        clip.get_frame(0)
+    assert profiler.stages and not profiler.events
+    with pytest.raises(ValueError, match="trace"):
+        profiler.write_chrome_trace(trace_filename)
+    clip.close()
@@ -5,8 +5,10 @@ import filecmp
 import importlib
 import io
 import os
+import pickle
 import shutil
 import sys
+import threading
 
 import pytest
 
@@ -57,6 +59,47 @@ def test_cvsecs(given, expected):
     assert tools.convert_to_seconds(given) == expected
 
 
+@pytest.mark.parametrize("ordered", (True, False))
+def test_thread_map(ordered):
+    results = list(tools.thread_map(lambda x: x**2, range(50), 4, ordered=ordered))
+    if ordered:
+        assert results == [x**2 for x in range(50)]
+    else:
+        assert sorted(results) == [x**2 for x in range(50)]
+
+    # the items are read as the results are consumed
+    items = iter(range(50))
+    results = tools.thread_map(lambda x: x, items, 4)
+    assert next(results) == 0
+    assert next(items) == 8
+    results.close()
+
+
+@pytest.mark.parametrize("ordered", (True, False))
+def test_process_map(ordered):
+    results = list(tools.process_map(abs, range(-20, 0), 2, ordered=ordered))
+    if ordered:
+        assert results == list(range(20, 0, -1))
+    else:
+        assert sorted(results) == list(range(1, 21))
+
+
+def test_pickle_dumps():
+    assert pickle.loads(tools.pickle_dumps([abs, 1])) == [abs, 1]
+
+    pytest.importorskip("cloudpickle")
+    offset = 2
+    assert pickle.loads(tools.pickle_dumps(lambda t: t + offset))(1) == 3
+    with pytest.raises(pickle.PicklingError):
+        tools.pickle_dumps(threading.Lock())
+
+
+def test_warn_outside_filmpy():
+    with pytest.warns(UserWarning, match="message") as record:
+        tools.warn_outside_filmpy("message")
+    assert record[0].filename == __file__
+
+
 @pytest.mark.skipif(not shutil.which("echo"), reason="not in Unix")
 @pytest.mark.parametrize("command", ("echo", "jbdshfuygvhbsdvfghew"))
 def test_subprocess_call(command):